@@ -0,0 +1,55 @@
+"""
+Cost of compiling querysets into Prisma statements, with and without the
+plan cache, and of serializing the statements into request bodies.
+
+    PYTHONPATH=. python benchmarks/bench_compiler.py
+"""
+from common import Results, best_of, setup_django
+
+
+def querysets():
+    from django.db.models import Q
+    from testapp.models import Pet, User
+
+    return {
+        "pk lookup": User.objects.filter(id=1),
+        "select_related + filters": Pet.objects.select_related("owner")
+        .filter(owner__name__icontains="a", name__startswith="r")
+        .order_by("-id")[:10],
+        "or + exclude across relations": User.objects.filter(Q(name="a") | Q(pets__name="rex")).exclude(
+            email__endswith="@example.com"
+        ),
+        "values_list": Pet.objects.filter(id__in=list(range(100))).values_list("id", "name"),
+    }
+
+
+def run(results: Results):
+    from django.db import connection
+    from django.db.models.sql import InsertQuery
+    from testapp.models import User
+
+    plan_cache = connection.plan_cache
+    for name, qs in querysets().items():
+        query = qs.query
+
+        def compile_statement():
+            return query.chain().get_compiler(connection=connection).executable()
+
+        connection.plan_cache = None
+        results.add(f"compile {name}", best_of(compile_statement, number=1000))
+        connection.plan_cache = plan_cache
+        compile_statement()
+        results.add(f"compile {name} (plan cached)", best_of(compile_statement, number=1000))
+        statement = compile_statement()
+        results.add(f"serialize {name}", best_of(lambda: statement.body, number=1000))
+
+    users = [User(email=f"{i}@example.com", name=f"user {i}") for i in range(1000)]
+    query = InsertQuery(User)
+    query.insert_values([f for f in User._meta.concrete_fields if f.name != "id"], users)
+    (statement,) = query.get_compiler(connection=connection).executable()
+    results.add("serialize createMany 1k rows", best_of(lambda: statement.body, number=10), per=1000)
+
+
+if __name__ == "__main__":
+    setup_django()
+    run(Results())
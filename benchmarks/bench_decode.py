@@ -0,0 +1,104 @@
+"""
+Per-row cost of turning an Accelerate response body into Django rows.
+
+    PYTHONPATH=. python benchmarks/bench_decode.py [rows]
+"""
+import datetime
+import decimal
+import json
+import sys
+
+from common import SCHEMA_PATH, Results, best_of
+
+from django_prisma import decoding
+from django_prisma.base import Cursor, unpack
+from django_prisma.compiler import SelectStatement
+from django_prisma.converters import Converters
+from django_prisma.psl_parser import parse_prisma_schema
+from django_prisma.schema import Schema
+
+
+def make_body(rows: int) -> bytes:
+    data = [
+        {"id": i, "name": f"pet {i}", "ownerId": i % 100, "owner": {"id": i % 100, "email": f"{i % 100}@example.com"}}
+        for i in range(rows)
+    ]
+    return json.dumps({"data": {"findManyPet": data}}).encode()
+
+
+def make_typed_body(rows: int) -> bytes:
+    # Event rows as the JSON protocol sends them: typed values are tagged
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    data = [
+        {
+            "id": {"$type": "BigInt", "value": str(i)},
+            "at": {"$type": "DateTime", "value": (start + datetime.timedelta(seconds=i)).isoformat()[:19] + ".000Z"},
+            "amount": {"$type": "Decimal", "value": f"{i % 1000}.50"},
+            "level": "LOW",
+        }
+        for i in range(rows)
+    ]
+    return json.dumps({"data": {"findManyEvent": data}}).encode()
+
+
+TAGGED = {"BigInt": int, "Decimal": decimal.Decimal, "DateTime": datetime.datetime.fromisoformat}
+
+
+def per_cell(rows: list[tuple]) -> list[tuple]:
+    # What converting every value on its own, by its $type, would cost
+    return [
+        tuple(TAGGED[v["$type"]](v["value"]) if isinstance(v, dict) else v for v in row)
+        for row in rows
+    ]
+
+
+class CannedResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+
+class CannedTransport:
+    # Answers every query with the same body, so only decoding is measured
+    def __init__(self, content: bytes):
+        self.response = CannedResponse(content)
+
+    def post(self, url, content, headers=None, timeout=None):
+        return self.response
+
+
+def run(results: Results, rows: int):
+    body = make_body(rows)
+    flat = SelectStatement("Pet", [("id",), ("name",), ("ownerId",)], {}, None, "id")
+    joined = SelectStatement(
+        "Pet", [("id",), ("name",), ("ownerId",), ("owner", "id"), ("owner", "email")], {}, None, "id"
+    )
+    parsers = [("json", json.loads)]
+    if decoding.orjson is not None:
+        parsers.append(("orjson", decoding.orjson.loads))
+
+    for parser_name, loads in parsers:
+        results.add(f"parse {parser_name} {rows} rows", best_of(lambda: loads(body)), per=rows)
+    result = decoding.loads(body)["data"]["findManyPet"]
+    for name, st in [("flat", flat), ("joined", joined)]:
+        results.add(f"rows {name} {rows} rows", best_of(lambda: unpack(st, result)), per=rows)
+    cursor = Cursor(CannedTransport(body), Schema(b"", "bench"))
+    results.add(f"Cursor.execute {rows} rows", best_of(lambda: cursor.execute(joined)), per=rows)
+
+    with open(SCHEMA_PATH) as fd:
+        types = Converters(parse_prisma_schema(fd.read()), use_tz=True)
+    columns = ["id", "at", "amount", "level"]
+    typed = SelectStatement("Event", [(c,) for c in columns], {}, None, "id")
+    typed.converters = [types.column("Event", c) for c in columns]
+    untyped = SelectStatement("Event", [(c,) for c in columns], {}, None, "id")
+    result = decoding.loads(make_typed_body(rows))["data"]["findManyEvent"]
+    results.add(f"rows typed {rows} rows", best_of(lambda: unpack(typed, result)), per=rows)
+    results.add(f"rows typed per cell {rows} rows", best_of(lambda: per_cell(unpack(untyped, result)[0])), per=rows)
+
+
+if __name__ == "__main__":
+    results = Results()
+    for rows in [int(arg) for arg in sys.argv[1:]] or [1_000, 50_000]:
+        run(results, rows)
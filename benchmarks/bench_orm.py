@@ -0,0 +1,52 @@
+"""
+End-to-end ORM queries against the local fake Accelerate: compile, HTTP
+round trip, decode and model instantiation, at 1, 1k and 100k rows.
+
+    PYTHONPATH=. python benchmarks/bench_orm.py
+"""
+from common import Results, best_of, setup_django
+
+USERS = 1_000
+PETS = 100_000
+SIZES = (1, 1_000, 100_000)
+
+
+def load(server):
+    # Straight into SQLite: the fixture should not depend on the code under test
+    db = server.fake.db
+    db.executemany(
+        'INSERT INTO "User" (id, email, name) VALUES (?, ?, ?)',
+        ((i, f"{i}@example.com", f"user {i}") for i in range(1, USERS + 1)),
+    )
+    db.executemany(
+        'INSERT INTO "Pet" (id, name, ownerId) VALUES (?, ?, ?)',
+        ((i, f"pet {i}", i % USERS + 1) for i in range(1, PETS + 1)),
+    )
+
+
+def run(results: Results, server):
+    from testapp.models import Pet, User
+
+    load(server)
+    for n in SIZES:
+        repeat = 3 if n >= 100_000 else 20
+        results.add(f"orm all() {n} rows", best_of(lambda: list(Pet.objects.all()[:n]), repeat), per=n)
+        results.add(
+            f"orm select_related() {n} rows",
+            best_of(lambda: list(Pet.objects.select_related("owner")[:n]), repeat),
+            per=n,
+        )
+        results.add(
+            f"orm values_list() {n} rows",
+            best_of(lambda: list(Pet.objects.values_list("id", "name")[:n]), repeat),
+            per=n,
+        )
+    results.add("orm count()", best_of(Pet.objects.count))
+    results.add(
+        "orm prefetch_related() 100 users",
+        best_of(lambda: [list(u.pets.all()) for u in User.objects.prefetch_related("pets")[:100]]),
+    )
+
+
+if __name__ == "__main__":
+    run(Results(), setup_django())
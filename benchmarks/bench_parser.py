@@ -0,0 +1,65 @@
+"""
+Cost of turning a large schema.prisma into PSL: building the parser, a full
+parse, and the in-process and on-disk memoized lookups.
+
+    PYTHONPATH=. python benchmarks/bench_parser.py [models]
+"""
+import sys
+import tempfile
+
+from common import Results, best_of
+from lark import Lark
+
+from django_prisma import psl_parser
+from django_prisma.psl_parser import PSLTransformer, grammar, parse_prisma_schema
+
+
+def make_schema(models: int) -> str:
+    # Every model but the first points at the previous one, which points back
+    blocks = []
+    for i in range(models):
+        lines = [
+            "  id        Int     @id @default(autoincrement())",
+            "  email     String  @unique",
+            "  name      String?",
+            "  title     String",
+            "  rank      Int",
+            "  notes     String?",
+        ]
+        if i:
+            lines.append("  parentId  Int")
+            lines.append(f"  parent    Model{i - 1} @relation(fields: [parentId], references: [id])")
+        if i + 1 < models:
+            lines.append(f"  children  Model{i + 1}[]")
+        lines.append("  @@unique([name, title])")
+        blocks.append(f"model Model{i} {{\n" + "\n".join(lines) + "\n}\n")
+    return "\n".join(blocks)
+
+
+def run(results: Results, models: int):
+    text = make_schema(models)
+    results.add(
+        "parser build, no lark cache",
+        best_of(lambda: Lark(grammar, parser="lalr", transformer=PSLTransformer())),
+    )
+
+    def memoized():
+        psl_parser._parsed.clear()
+        parse_prisma_schema(text, cache_dir)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+
+        def build():
+            psl_parser.get_parser.cache_clear()
+            psl_parser.get_parser(cache_dir)
+
+        build()
+        results.add("parser build, lark cache", best_of(build))
+        results.add(f"parse {models} models", best_of(lambda: psl_parser._parse(text)), per=models)
+        parse_prisma_schema(text, cache_dir)
+        results.add(f"parse {models} models, on disk", best_of(memoized), per=models)
+    results.add(f"parse {models} models, in process", best_of(lambda: parse_prisma_schema(text)), per=models)
+
+
+if __name__ == "__main__":
+    run(Results(), int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,79 @@
+import gc
+import json
+import os
+import sys
+import time
+
+from typing import Callable
+
+from fake_accelerate import FakeAccelerateServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_PATH = os.path.join(ROOT, "tests", "schema.prisma")
+
+
+def setup_django(**options) -> FakeAccelerateServer:
+    # The test app's User/Pet models, talking to a fake Accelerate
+    import django
+    from django.conf import settings
+
+    with open(SCHEMA_PATH) as fd:
+        server = FakeAccelerateServer(fd.read()).__enter__()
+    sys.path.insert(0, os.path.join(ROOT, "tests"))
+    options["ENDPOINT"] = server.url
+    settings.configure(
+        DATABASES={
+            "default": {"ENGINE": "django_prisma", "TOKEN": "bench", "SCHEMA_PATH": SCHEMA_PATH, "OPTIONS": options}
+        },
+        INSTALLED_APPS=["testapp"],
+        USE_TZ=True,
+    )
+    django.setup()
+    return server
+
+
+def best_of(fn: Callable[[], object], repeat: int = 5, number: int = 1) -> float:
+    # Fastest of `repeat` runs, per call; the minimum is the least noisy
+    # estimate of what the code itself costs
+    best = float("inf")
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            best = min(best, (time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return best
+
+
+class Results:
+    """
+    Named timings in seconds. Saved as JSON so that runs on two commits can
+    be compared with `python benchmarks/run.py --compare before.json`.
+    """
+
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+
+    def add(self, name: str, seconds: float, per: int = 1):
+        self.timings[name] = seconds
+        unit, scale = ("ms", 1e3) if seconds >= 1e-3 else ("µs", 1e6)
+        line = f"{name:<56} {seconds * scale:10.2f} {unit}"
+        if per > 1:
+            line += f"  ({seconds / per * 1e9:8.1f} ns/row)"
+        print(line)
+
+    def save(self, path: str):
+        with open(path, "w") as fd:
+            json.dump(self.timings, fd, indent=2, sort_keys=True)
+
+    def compare(self, path: str):
+        with open(path) as fd:
+            before = json.load(fd)
+        for name, seconds in self.timings.items():
+            if name in before:
+                print(f"{name:<56} {seconds / before[name]:6.2f}x")
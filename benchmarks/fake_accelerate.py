@@ -0,0 +1,776 @@
+"""
+A local stand-in for Accelerate: an HTTP server that accepts schema uploads
+and answers Prisma JSON protocol queries from an in-memory SQLite database.
+Point a connection at it with OPTIONS["ENDPOINT"].
+
+    PYTHONPATH=. python benchmarks/fake_accelerate.py tests/schema.prisma [port]
+"""
+import gzip
+import json
+import sqlite3
+import sys
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django_prisma.psl_parser import parse_prisma_schema
+from django_prisma.psl_types import (
+    AttributeDefaultAutoinc,
+    AttributePK,
+    AttributeRelation,
+    AttributeUnique,
+    BigInt,
+    Bytes,
+    DateTime,
+    Decimal,
+    Json,
+    PSLModel,
+    UserDefinedType,
+)
+
+# Scalars the JSON protocol sends back as {"$type": ..., "value": ...}
+TAGGED = {DateTime: "DateTime", BigInt: "BigInt", Decimal: "Decimal", Bytes: "Bytes", Json: "Json"}
+
+
+class PrismaError(Exception):
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class Relation:
+    def __init__(self, name, target, to_many, local, remote):
+        self.name = name
+        self.target = target
+        self.to_many = to_many
+        # columns on this model / on the target model
+        self.local = local
+        self.remote = remote
+
+
+class ModelInfo:
+    def __init__(self, model: PSLModel):
+        self.name = model.name
+        self.scalars = []
+        self.pk = None
+        self.autoinc = set()
+        self.unique = set()
+        self.relations = {}
+        # column -> $type
+        self.tagged = {}
+        for c in model.columns:
+            if isinstance(c.type_, UserDefinedType):
+                continue
+            self.scalars.append(c.name)
+            if type(c.type_) in TAGGED:
+                self.tagged[c.name] = TAGGED[type(c.type_)]
+            if AttributePK() in c.props:
+                self.pk = c.name
+            if AttributeDefaultAutoinc() in c.props:
+                self.autoinc.add(c.name)
+            if AttributeUnique() in c.props:
+                self.unique.add(c.name)
+
+
+def _quote(name):
+    return f'"{name}"'
+
+
+class FakeAccelerate:
+    """SQLite-backed stand-in for the Accelerate query endpoint."""
+
+    def __init__(self, schema: str):
+        psl = parse_prisma_schema(schema)
+        self.models = {m.name: ModelInfo(m) for m in psl.models}
+        for m in psl.models:
+            for c in m.columns:
+                if not isinstance(c.type_, UserDefinedType) or c.type_.name not in self.models:
+                    continue
+                rel = [p for p in c.props if isinstance(p, AttributeRelation)]
+                if rel:
+                    info = rel[0]
+                    self.models[m.name].relations[c.name] = Relation(
+                        c.name, c.type_.name, False, info.local_field_name, info.remote_field_name
+                    )
+        # back-references need the forward side to be known
+        for m in psl.models:
+            for c in m.columns:
+                if not isinstance(c.type_, UserDefinedType) or not c.is_array:
+                    continue
+                target = self.models[c.type_.name]
+                for r in target.relations.values():
+                    if r.target == m.name and not r.to_many:
+                        self.models[m.name].relations[c.name] = Relation(c.name, target.name, True, r.remote, r.local)
+                        break
+        self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self.lock = threading.Lock()
+        self.requests = 0
+        for m in self.models.values():
+            cols = []
+            for name in m.scalars:
+                col = _quote(name)
+                if name == m.pk:
+                    col += " INTEGER PRIMARY KEY" + (" AUTOINCREMENT" if name in m.autoinc else "")
+                elif name in m.unique:
+                    col += " UNIQUE"
+                cols.append(col)
+            self.db.execute(f"CREATE TABLE {_quote(m.name)} ({', '.join(cols)})")
+            for rel in m.relations.values():
+                if not rel.to_many:
+                    index = _quote(f"{m.name}_{rel.name}")
+                    self.db.execute(f"CREATE INDEX {index} ON {_quote(m.name)} ({', '.join(map(_quote, rel.local))})")
+
+    # protocol entry point
+    def handle(self, body: dict) -> dict:
+        with self.lock:
+            self.requests += 1
+            if "batch" in body:
+                results = []
+                for st in body["batch"]:
+                    results.append(self._handle_one(st))
+                return {"batchResult": results}
+            return self._handle_one(body)
+
+    def _handle_one(self, st: dict) -> dict:
+        try:
+            data = self.execute(st)
+        except PrismaError as e:
+            return {"errors": [{"error": e.message, "user_facing_error": {"is_panic": False, "message": e.message, "meta": {}, "error_code": e.code}}]}
+        return {"data": {st["action"] + st["modelName"]: data}}
+
+    def execute(self, st: dict):
+        model = self.models[st["modelName"]]
+        query = st["query"]
+        args = query.get("arguments", {})
+        selection = query.get("selection", {})
+        match st["action"]:
+            case "findMany":
+                return self.find_many(model, args, selection)
+            case "findFirst":
+                rows = self.find_many(model, dict(args, take=1), selection)
+                return rows[0] if rows else None
+            case "findUnique":
+                rows = self.find_many(model, args, selection)
+                return rows[0] if rows else None
+            case "aggregate":
+                return self.aggregate(model, args, selection)
+            case "groupBy":
+                return self.group_by(model, args, selection)
+            case "createOne":
+                pk = self.insert(model, args["data"])
+                return self.find_many(model, {"where": {model.pk: pk}}, selection)[0]
+            case "createMany":
+                data = args["data"]
+                if isinstance(data, dict):
+                    data = [data]
+                count = 0
+                for row in data:
+                    try:
+                        self.insert(model, row)
+                        count += 1
+                    except PrismaError:
+                        if not args.get("skipDuplicates"):
+                            raise
+                return {"count": count}
+            case "updateMany":
+                return {"count": self.update(model, args.get("where", {}), args["data"])}
+            case "updateOne":
+                rows = self.find_many(model, {"where": args["where"]}, {model.pk: True})
+                if not rows:
+                    raise PrismaError("P2025", "Record to update not found.")
+                self.update(model, args["where"], args["data"])
+                return self.find_many(model, {"where": {model.pk: rows[0][model.pk]}}, selection)[0]
+            case "deleteMany":
+                where, params = self.where(model, args.get("where", {}))
+                cur = self.db.execute(f"DELETE FROM {_quote(model.name)} WHERE {where}", params)
+                return {"count": cur.rowcount}
+            case "deleteOne":
+                rows = self.find_many(model, {"where": args["where"]}, selection)
+                if not rows:
+                    raise PrismaError("P2025", "Record to delete does not exist.")
+                where, params = self.where(model, args["where"])
+                self.db.execute(f"DELETE FROM {_quote(model.name)} WHERE {where}", params)
+                return rows[0]
+        raise PrismaError("P2009", f"Unknown action {st['action']}")
+
+    # writes
+    def insert(self, model: ModelInfo, data: dict) -> int:
+        data = self._scalar_data(model, data)
+        cols = ", ".join(_quote(k) for k in data)
+        marks = ", ".join("?" for _ in data)
+        try:
+            if data:
+                cur = self.db.execute(f"INSERT INTO {_quote(model.name)} ({cols}) VALUES ({marks})", list(data.values()))
+            else:
+                cur = self.db.execute(f"INSERT INTO {_quote(model.name)} DEFAULT VALUES")
+        except sqlite3.IntegrityError as e:
+            raise PrismaError("P2002", f"Unique constraint failed: {e}")
+        return data.get(model.pk, cur.lastrowid)
+
+    def update(self, model: ModelInfo, where: dict, data: dict) -> int:
+        sets = []
+        params = []
+        for k, v in self._scalar_data(model, data).items():
+            if isinstance(v, dict):
+                (op, val), = v.items()
+                val = _decode(val)
+                match op:
+                    case "set":
+                        sets.append(f"{_quote(k)} = ?")
+                    case "increment":
+                        sets.append(f"{_quote(k)} = {_quote(k)} + ?")
+                    case "decrement":
+                        sets.append(f"{_quote(k)} = {_quote(k)} - ?")
+                    case "multiply":
+                        sets.append(f"{_quote(k)} = {_quote(k)} * ?")
+                    case "divide":
+                        sets.append(f"{_quote(k)} = {_quote(k)} / ?")
+                params.append(val)
+            else:
+                sets.append(f"{_quote(k)} = ?")
+                params.append(v)
+        if not sets:
+            return 0
+        w, wparams = self.where(model, where)
+        try:
+            cur = self.db.execute(f"UPDATE {_quote(model.name)} SET {', '.join(sets)} WHERE {w}", params + wparams)
+        except sqlite3.IntegrityError as e:
+            raise PrismaError("P2002", f"Unique constraint failed: {e}")
+        return cur.rowcount
+
+    def _scalar_data(self, model: ModelInfo, data: dict) -> dict:
+        ret = {}
+        for k, v in data.items():
+            if k in model.relations:
+                rel = model.relations[k]
+                connect = v["connect"]
+                for local, remote in zip(rel.local, rel.remote):
+                    ret[local] = connect[remote]
+                continue
+            if k not in model.scalars:
+                raise PrismaError("P2009", f"Unknown argument `{k}` on {model.name}")
+            if isinstance(v, dict) and "$type" not in v:
+                ret[k] = v
+            else:
+                ret[k] = _decode(v)
+        return ret
+
+    # reads
+    def find_many(self, model: ModelInfo, args: dict, selection: dict) -> list:
+        where, params = self.where(model, args.get("where", {}))
+        order = self.order_by(model, args.get("orderBy"))
+        cursor = args.get("cursor")
+        if cursor:
+            cw, cparams = self.cursor_where(model, cursor, args.get("orderBy"))
+            where = f"({where}) AND ({cw})"
+            params = params + cparams
+        take = args.get("take")
+        skip = args.get("skip") or 0
+        distinct = args.get("distinct")
+        if take is not None and take < 0:
+            # negative take reads backwards from the end
+            reverse = [(c, "DESC" if d == "ASC" else "ASC") for c, d in order or [(model.pk, "ASC")]]
+            sql = self._select_sql(model, where, reverse)
+            rows = [dict(r) for r in self._run(sql, params)]
+            rows = list(reversed(rows[skip : skip - take]))
+        else:
+            sql = self._select_sql(model, where, order)
+            if distinct is None and (take is not None or skip):
+                sql += f" LIMIT {-1 if take is None else take} OFFSET {skip}"
+            rows = [dict(r) for r in self._run(sql, params)]
+            if distinct is not None:
+                seen = set()
+                unique_rows = []
+                for r in rows:
+                    key = tuple(r[d] for d in distinct)
+                    if key not in seen:
+                        seen.add(key)
+                        unique_rows.append(r)
+                end = None if take is None else skip + take
+                rows = unique_rows[skip:end]
+        return self.project(model, rows, selection)
+
+    def _select_sql(self, model, where, order):
+        sql = f"SELECT * FROM {_quote(model.name)} WHERE {where}"
+        if order:
+            sql += " ORDER BY " + ", ".join(f"{c} {d}" for c, d in order)
+        return sql
+
+    def _run(self, sql, params):
+        cur = self.db.execute(sql, params)
+        names = [d[0] for d in cur.description]
+        for row in cur:
+            yield dict(zip(names, row))
+
+    def project(self, model: ModelInfo, rows: list[dict], selection: dict) -> list[dict]:
+        out = [{} for _ in rows]
+        for key, sel in selection.items():
+            if key == "$scalars":
+                if sel:
+                    for o, r in zip(out, rows):
+                        o.update(r)
+                        for column, type_ in model.tagged.items():
+                            o[column] = _encode(type_, r[column])
+            elif key == "$composites":
+                continue
+            elif key in model.relations:
+                self._project_relation(model.relations[key], rows, out, sel)
+            elif key in model.tagged:
+                type_ = model.tagged[key]
+                for o, r in zip(out, rows):
+                    o[key] = _encode(type_, r[key])
+            elif key in model.scalars:
+                for o, r in zip(out, rows):
+                    o[key] = r[key]
+            elif key == "_count":
+                for o, r in zip(out, rows):
+                    counts = {}
+                    for rel_name in sel["selection"]:
+                        rel = model.relations[rel_name]
+                        target = self.models[rel.target]
+                        w = " AND ".join(f"{_quote(rm)} = ?" for rm in rel.remote)
+                        counts[rel_name] = self.db.execute(
+                            f"SELECT COUNT(*) FROM {_quote(target.name)} WHERE {w}", [r[l] for l in rel.local]
+                        ).fetchone()[0]
+                    o["_count"] = counts
+            else:
+                raise PrismaError("P2009", f"Unknown field `{key}` on {model.name}")
+        return out
+
+    def _project_relation(self, rel: Relation, rows, out, sel):
+        target = self.models[rel.target]
+        if sel is True:
+            sel = {"arguments": {}, "selection": {"$scalars": True}}
+        args = sel.get("arguments", {})
+        selection = dict(sel.get("selection", {}))
+        # make sure the join columns come back so results can be matched up
+        extra = [c for c in rel.remote if c not in selection and not selection.get("$scalars")]
+        for c in extra:
+            selection[c] = True
+        keys = {tuple(r[l] for l in rel.local) for r in rows}
+        keys.discard(tuple(None for _ in rel.local))
+        grouped = {}
+        if keys:
+            # one query for all parent rows
+            if len(rel.remote) == 1:
+                parents = {rel.remote[0]: {"in": [k for (k,) in keys]}}
+            else:
+                parents = {"OR": [{"AND": [{rm: v} for rm, v in zip(rel.remote, k)]} for k in keys]}
+            where = {"AND": [args.get("where", {}), parents]}
+            related = self.find_many(target, {"where": where, "orderBy": args.get("orderBy")}, selection)
+            for rr in related:
+                grouped.setdefault(tuple(rr[c] for c in rel.remote), []).append(rr)
+        for o, r in zip(out, rows):
+            children = grouped.get(tuple(r[l] for l in rel.local), [])
+            if extra:
+                children = [{k: v for k, v in c.items() if k not in extra} for c in children]
+            if rel.to_many:
+                skip = args.get("skip") or 0
+                take = args.get("take")
+                o[rel.name] = children[skip : None if take is None else skip + take]
+            else:
+                o[rel.name] = children[0] if children else None
+
+    def aggregate(self, model: ModelInfo, args: dict, selection: dict) -> dict:
+        where, params = self.where(model, args.get("where", {}))
+        exprs, layout = self._aggregate_exprs(selection)
+        sql = f"SELECT {', '.join(exprs) or '1'} FROM {_quote(model.name)} WHERE {where}"
+        take = args.get("take")
+        skip = args.get("skip")
+        if take is not None or skip:
+            inner = f"SELECT * FROM {_quote(model.name)} WHERE {where}"
+            order = self.order_by(model, args.get("orderBy"))
+            if order:
+                inner += " ORDER BY " + ", ".join(f"{c} {d}" for c, d in order)
+            inner += f" LIMIT {-1 if take is None else take} OFFSET {skip or 0}"
+            sql = f"SELECT {', '.join(exprs) or '1'} FROM ({inner})"
+        row = self.db.execute(sql, params).fetchone()
+        return self._aggregate_result(model, layout, row)
+
+    def _aggregate_exprs(self, selection):
+        exprs = []
+        layout = []
+        for agg, sel in selection.items():
+            if not agg.startswith("_"):
+                continue
+            fn = {"_count": "COUNT", "_sum": "SUM", "_avg": "AVG", "_min": "MIN", "_max": "MAX"}[agg]
+            for field in sel["selection"]:
+                if field == "_all":
+                    exprs.append("COUNT(*)")
+                else:
+                    exprs.append(f"{fn}({_quote(field)})")
+                layout.append((agg, field))
+        return exprs, layout
+
+    def _aggregate_result(self, model, layout, row):
+        ret = {}
+        for (agg, field), value in zip(layout, row):
+            type_ = model.tagged.get(field)
+            if agg == "_avg" and value is not None:
+                value = float(value)
+            if type_ and (agg in ("_min", "_max", "_sum") or type_ == "Decimal" and agg == "_avg"):
+                value = _encode(type_, value)
+            ret.setdefault(agg, {})[field] = value
+        return ret
+
+    def group_by(self, model: ModelInfo, args: dict, selection: dict) -> list:
+        by = args["by"]
+        where, params = self.where(model, args.get("where", {}))
+        exprs, layout = self._aggregate_exprs(selection)
+        cols = [_quote(b) for b in by]
+        sql = f"SELECT {', '.join(cols + exprs)} FROM {_quote(model.name)} WHERE {where} GROUP BY {', '.join(cols)}"
+        having = args.get("having")
+        if having:
+            h, hparams = self.having(having)
+            sql += f" HAVING {h}"
+            params = params + hparams
+        order = self.order_by(model, args.get("orderBy"))
+        if order:
+            sql += " ORDER BY " + ", ".join(f"{c} {d}" for c, d in order)
+        take = args.get("take")
+        skip = args.get("skip")
+        if take is not None or skip:
+            sql += f" LIMIT {-1 if take is None else take} OFFSET {skip or 0}"
+        ret = []
+        for row in self.db.execute(sql, params):
+            item = {b: _encode(model.tagged[b], v) if b in model.tagged else v for b, v in zip(by, row[: len(by)])}
+            item.update(self._aggregate_result(model, layout, row[len(by) :]))
+            ret.append({k: v for k, v in item.items() if k in selection})
+        return ret
+
+    def having(self, having: dict):
+        parts = []
+        params = []
+        for field, cond in having.items():
+            for agg, filt in cond.items():
+                fn = {"_count": "COUNT", "_sum": "SUM", "_avg": "AVG", "_min": "MIN", "_max": "MAX"}[agg]
+                expr = "COUNT(*)" if field == "_all" else f"{fn}({_quote(field)})"
+                p, pp = self._scalar_filter(expr, filt)
+                parts.append(p)
+                params.extend(pp)
+        return " AND ".join(parts) or "1", params
+
+    def order_by(self, model: ModelInfo, order_by) -> list[tuple[str, str]]:
+        if not order_by:
+            return []
+        if isinstance(order_by, dict):
+            order_by = [{k: v} for k, v in order_by.items()]
+        ret = []
+        for item in order_by:
+            for field, direction in item.items():
+                if field in ("_count", "_sum", "_avg", "_min", "_max"):
+                    fn = {"_count": "COUNT", "_sum": "SUM", "_avg": "AVG", "_min": "MIN", "_max": "MAX"}[field]
+                    for afield, adir in direction.items():
+                        expr = "COUNT(*)" if afield == "_all" else f"{fn}({_quote(afield)})"
+                        ret.append((expr, adir.upper()))
+                    continue
+                if field in model.relations:
+                    rel = model.relations[field]
+                    target = self.models[rel.target]
+                    (tfield, tdir), = direction.items()
+                    join = " AND ".join(f"t.{_quote(rm)} = {_quote(model.name)}.{_quote(l)}" for l, rm in zip(rel.local, rel.remote))
+                    expr = f"(SELECT t.{_quote(tfield)} FROM {_quote(target.name)} t WHERE {join})"
+                    ret.append((expr, tdir.upper()))
+                    continue
+                nulls = ""
+                if isinstance(direction, dict):
+                    if direction.get("nulls"):
+                        nulls = f" NULLS {direction['nulls'].upper()}"
+                    direction = direction["sort"]
+                ret.append((f"{_quote(model.name)}.{_quote(field)}", direction.upper() + nulls))
+        return ret
+
+    def cursor_where(self, model: ModelInfo, cursor: dict, order_by):
+        w, params = self.where(model, cursor)
+        row = self.db.execute(f"SELECT * FROM {_quote(model.name)} WHERE {w}", params).fetchone()
+        if row is None:
+            return "0", []
+        names = [d[0] for d in self.db.execute(f"SELECT * FROM {_quote(model.name)} LIMIT 0").description]
+        row = dict(zip(names, row))
+        order = self.order_by(model, order_by) or [(f"{_quote(model.name)}.{_quote(model.pk)}", "ASC")]
+        if not any(c == f"{_quote(model.name)}.{_quote(model.pk)}" for c, _ in order):
+            order.append((f"{_quote(model.name)}.{_quote(model.pk)}", "ASC"))
+        # lexicographic "row >= cursor row" in the requested order
+        clauses = []
+        params = []
+        for i, (col, direction) in enumerate(order):
+            field = col.split(".")[-1].strip('"')
+            op = ">" if direction.startswith("ASC") else "<"
+            eqs = []
+            for prev_col, _ in order[:i]:
+                prev_field = prev_col.split(".")[-1].strip('"')
+                eqs.append(f"{prev_col} = ?")
+                params.append(row[prev_field])
+            clauses.append("(" + " AND ".join(eqs + [f"{col} {op} ?"]) + ")")
+            params.append(row[field])
+        eq = " AND ".join(f"{c} = ?" for c, _ in order)
+        params.extend(row[c.split(".")[-1].strip('"')] for c, _ in order)
+        return " OR ".join(clauses + [f"({eq})"]), params
+
+    def where(self, model: ModelInfo, where: dict) -> tuple[str, list]:
+        parts = []
+        params = []
+        for key, value in (where or {}).items():
+            match key:
+                case "AND":
+                    value = value if isinstance(value, list) else [value]
+                    subs = [self.where(model, v) for v in value]
+                    parts.append("(" + " AND ".join(s for s, _ in subs) + ")" if subs else "1")
+                    for _, p in subs:
+                        params.extend(p)
+                case "OR":
+                    value = value if isinstance(value, list) else [value]
+                    subs = [self.where(model, v) for v in value]
+                    parts.append("(" + " OR ".join(s for s, _ in subs) + ")" if subs else "0")
+                    for _, p in subs:
+                        params.extend(p)
+                case "NOT":
+                    value = value if isinstance(value, list) else [value]
+                    for v in value:
+                        s, p = self.where(model, v)
+                        parts.append(f"NOT ({s})")
+                        params.extend(p)
+                case _ if key in model.relations:
+                    s, p = self._relation_filter(model, model.relations[key], value)
+                    parts.append(s)
+                    params.extend(p)
+                case _ if key in model.scalars:
+                    s, p = self._scalar_filter(f"{_quote(model.name)}.{_quote(key)}", value)
+                    parts.append(s)
+                    params.extend(p)
+                case _:
+                    raise PrismaError("P2009", f"Unknown argument `{key}` in where on {model.name}")
+        return " AND ".join(parts) or "1", params
+
+    def _relation_filter(self, model: ModelInfo, rel: Relation, value):
+        target = self.models[rel.target]
+        local = ", ".join(f"{_quote(model.name)}.{_quote(l)}" for l in rel.local)
+        remote = ", ".join(_quote(r) for r in rel.remote)
+        if rel.to_many:
+            ops = value
+        elif value is None:
+            return " AND ".join(f"{_quote(model.name)}.{_quote(l)} IS NULL" for l in rel.local), []
+        elif "is" in value or "isNot" in value:
+            ops = value
+        else:
+            ops = {"is": value}
+        parts = []
+        params = []
+        for op, sub in ops.items():
+            if sub is None:
+                null = " AND ".join(f"{_quote(model.name)}.{_quote(l)} IS {'NOT ' if op == 'isNot' else ''}NULL" for l in rel.local)
+                parts.append(null)
+                continue
+            s, p = self.where(target, sub)
+            match op:
+                case "some" | "is":
+                    parts.append(f"({local}) IN (SELECT {remote} FROM {_quote(target.name)} WHERE {s})")
+                    params.extend(p)
+                case "none" | "isNot":
+                    parts.append(f"({local}) NOT IN (SELECT {remote} FROM {_quote(target.name)} WHERE {s})")
+                    params.extend(p)
+                case "every":
+                    parts.append(f"({local}) NOT IN (SELECT {remote} FROM {_quote(target.name)} WHERE NOT ({s}))")
+                    params.extend(p)
+        return " AND ".join(parts) or "1", params
+
+    def _scalar_filter(self, col: str, value):
+        if value is None:
+            return f"{col} IS NULL", []
+        if not isinstance(value, dict) or "$type" in value:
+            return f"{col} = ?", [_decode(value)]
+        insensitive = value.get("mode") == "insensitive"
+        c = f"LOWER({col})" if insensitive else col
+
+        def v(x):
+            x = _decode(x)
+            return x.lower() if insensitive and isinstance(x, str) else x
+
+        parts = []
+        params = []
+        for op, arg in value.items():
+            match op:
+                case "mode":
+                    continue
+                case "equals":
+                    if arg is None:
+                        parts.append(f"{col} IS NULL")
+                    else:
+                        parts.append(f"{c} = ?")
+                        params.append(v(arg))
+                case "not":
+                    if arg is None:
+                        parts.append(f"{col} IS NOT NULL")
+                    elif isinstance(arg, dict) and "$type" not in arg:
+                        s, p = self._scalar_filter(col, dict(arg, **({"mode": "insensitive"} if insensitive else {})))
+                        parts.append(f"NOT ({s})")
+                        params.extend(p)
+                    else:
+                        parts.append(f"({c} != ? OR {col} IS NULL)")
+                        params.append(v(arg))
+                case "in" | "notIn":
+                    if not arg:
+                        parts.append("0" if op == "in" else "1")
+                        continue
+                    marks = ", ".join("?" for _ in arg)
+                    parts.append(f"{c} {'NOT ' if op == 'notIn' else ''}IN ({marks})")
+                    params.extend(v(a) for a in arg)
+                case "lt" | "lte" | "gt" | "gte":
+                    sym = {"lt": "<", "lte": "<=", "gt": ">", "gte": ">="}[op]
+                    parts.append(f"{c} {sym} ?")
+                    params.append(v(arg))
+                case "contains" | "startsWith" | "endsWith":
+                    pattern = {"contains": "%{}%", "startsWith": "{}%", "endsWith": "%{}"}[op]
+                    escaped = v(arg).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                    # GLOB would be case sensitive, LIKE is not; compare exactly unless insensitive
+                    if insensitive:
+                        parts.append(f"{c} LIKE ? ESCAPE '\\'")
+                    else:
+                        parts.append(f"({c} LIKE ? ESCAPE '\\' AND INSTR({c}, ?) > 0)")
+                    params.append(pattern.format(escaped))
+                    if not insensitive:
+                        params.append(v(arg))
+                case _:
+                    raise PrismaError("P2009", f"Unknown filter `{op}`")
+        return " AND ".join(parts) or "1", params
+
+
+def _decode(value):
+    if isinstance(value, dict) and "$type" in value:
+        match value["$type"]:
+            # Stored as numbers, so that SQLite compares and sums them as such
+            case "Decimal":
+                return float(value["value"])
+            case "BigInt":
+                return int(value["value"])
+        return value["value"]
+    return value
+
+
+def _encode(type_: str, value):
+    if value is None:
+        return None
+    match type_:
+        case "DateTime":
+            # Stored as sent, 2024-01-02T03:04:05.123456z
+            value = value.rstrip("zZ") + "Z"
+        case "BigInt" | "Decimal":
+            value = str(value)
+    return {"$type": type_, "value": value}
+
+
+def _codec(encoding: str):
+    # (compress, decompress) for a Content-Encoding, or None if unavailable
+    try:
+        match encoding:
+            case "gzip":
+                return gzip.compress, gzip.decompress
+            case "br":
+                import brotli
+
+                return brotli.compress, brotli.decompress
+            case "zstd":
+                import zstandard
+
+                return zstandard.compress, zstandard.decompress
+    except ImportError:
+        pass
+    return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, every
+    # keep-alive response waits for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        encoding = self.headers.get("Content-Encoding")
+        if encoding:
+            _, decompress = _codec(encoding)
+            body = decompress(body)
+        return body
+
+    def _send(self, status, body: bytes, headers=None):
+        headers = dict(headers or {})
+        if len(body) >= self.server.compress_min_bytes:
+            # Prefer the first encoding we can produce, in the client's order
+            accepted = [e.split(";")[0].strip() for e in self.headers.get("Accept-Encoding", "").split(",")]
+            for encoding in accepted:
+                codec = _codec(encoding)
+                if codec is not None:
+                    body = codec[0](body)
+                    headers["Content-Encoding"] = encoding
+                    break
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _schema_id(self) -> str:
+        # /{schema_id}/schema, /graphql or /invalidate, after any path prefix
+        return self.path.rstrip("/").split("/")[-2]
+
+    def do_PUT(self):
+        self._read()
+        self.server.schema_uploads += 1
+        self.server.schemas.add(self._schema_id())
+        self._send(200, b"{}")
+
+    def do_POST(self):
+        body = json.loads(self._read())
+        if self._schema_id() not in self.server.schemas:
+            self._send(404, json.dumps({"EngineNotStarted": {"reason": "SchemaMissing"}}).encode())
+            return
+        if self.path.rstrip("/").endswith("/invalidate"):
+            # Nothing is cached here, so there is nothing to drop
+            self.server.invalidated.extend(body["tags"])
+            self._send(200, b"{}")
+            return
+        result = self.server.fake.handle(body)
+        # Nothing is cached here, but report it the way Accelerate does
+        status = "miss" if self.headers.get("cache-control") else "none"
+        self._send(200, json.dumps(result).encode(), {"accelerate-info": json.dumps({"cacheStatus": status})})
+
+
+class FakeAccelerateServer:
+    def __init__(self, schema: str, host="127.0.0.1", port=0):
+        self.fake = FakeAccelerate(schema)
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self.fake
+        self.httpd.schema_uploads = 0
+        self.httpd.schemas = set()
+        self.httpd.invalidated = []
+        # Responses at least this big are compressed when the client accepts it
+        self.httpd.compress_min_bytes = 1024
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1]) as fd:
+        server = FakeAccelerateServer(fd.read(), port=int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    print(f"ENDPOINT: {server.url}")
+    server.httpd.serve_forever()
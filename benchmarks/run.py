@@ -0,0 +1,38 @@
+"""
+Every benchmark, with results that can be saved and compared across commits.
+
+    PYTHONPATH=. python benchmarks/run.py --save before.json
+    git checkout my-branch
+    PYTHONPATH=. python benchmarks/run.py --compare before.json
+"""
+import argparse
+
+import bench_compiler
+import bench_decode
+import bench_orm
+import bench_parser
+from common import Results, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save", help="write the timings to this JSON file")
+    parser.add_argument("--compare", help="print each timing relative to this JSON file")
+    args = parser.parse_args()
+
+    server = setup_django()
+    results = Results()
+    bench_compiler.run(results)
+    for rows in (1_000, 100_000):
+        bench_decode.run(results, rows)
+    bench_orm.run(results, server)
+    bench_parser.run(results, 300)
+    if args.save:
+        results.save(args.save)
+    if args.compare:
+        print()
+        results.compare(args.compare)
+
+
+if __name__ == "__main__":
+    main()
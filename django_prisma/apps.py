@@ -0,0 +1,22 @@
+import threading
+
+from django.apps import AppConfig
+from django.db import connections
+
+
+def warm_up(alias: str):
+    # Registers the schema and opens a pooled connection before the first query
+    connection = connections[alias]
+    try:
+        connection.ensure_connection()
+    finally:
+        connection.close()
+
+
+class DjangoPrismaConfig(AppConfig):
+    name = "django_prisma"
+
+    def ready(self):
+        for alias, settings_dict in connections.settings.items():
+            if settings_dict["ENGINE"] == "django_prisma" and settings_dict["OPTIONS"].get("WARM_UP"):
+                threading.Thread(target=warm_up, args=(alias,), daemon=True).start()
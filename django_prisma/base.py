@@ -1,12 +1,20 @@
+import asyncio
 import base64
-import hashlib
+import dataclasses
+import datetime
 import json
+import logging
+import re
+import threading
+import time
+
+from typing import Optional
 
-import requests
 import urllib3
 
 urllib3.disable_warnings()
 
+from django.conf import settings
 from django.db.backends.postgresql.features import DatabaseFeatures
 from django.db.backends.base.creation import BaseDatabaseCreation
 from django.db.backends.base.client import BaseDatabaseClient
@@ -15,15 +23,45 @@ from django.db.backends.base.operations import BaseDatabaseOperations
 from django.db.backends.base.introspection import BaseDatabaseIntrospection
 from django.db.backends.base.schema import BaseDatabaseSchemaEditor
 
-from django_prisma.compiler import Statement, datetime_to_prisma
-
-GRAPHQL_ENDPOINT = "https://accelerate.prisma-data.net/5.1.1/{schema_id}/graphql"
-SCHEMA_ENDPOINT = "https://accelerate.prisma-data.net/5.1.1/{schema_id}/schema"
+from django_prisma.cache import Freshness, ResponseCache, get_response_cache
+from django_prisma.decoding import dumps, loads
+from django_prisma.compiler import Statement, get_plan_cache
+from django_prisma.converters import NO_CONVERTERS, Converters, load_converters
+from django_prisma.compression import Compression, compress_body
+from django_prisma.instrumentation import Instrumentation, Metrics, get_metrics
+from django_prisma.retry import READ_ACTIONS, Retrier, RetryPolicy, get_retrier, is_read, retryable
+from django_prisma.singleflight import SingleFlight, get_singleflight
+from django_prisma.schema import Schema, load_schema, registry
+from django_prisma.where import datetime_to_prisma, tagged
+from django_prisma.transport import AsyncHttpxTransport, TransportOptions, get_async_transport, get_transport
+
+# Overridden by OPTIONS["ENDPOINT"], e.g. to run against benchmarks/fake_accelerate.py
+DEFAULT_ENDPOINT = "https://accelerate.prisma-data.net/5.1.1"
+GRAPHQL_ENDPOINT = "{endpoint}/{schema_id}/graphql"
+SCHEMA_ENDPOINT = "{endpoint}/{schema_id}/schema"
+INVALIDATE_ENDPOINT = "{endpoint}/{schema_id}/invalidate"
+CACHE_TAGS_HEADER = "accelerate-cache-tags"
+
+# Rows per bulk_create batch when the caller does not pass batch_size
+DEFAULT_BULK_BATCH_SIZE = 5000
+# Accelerate caps request bodies; stay below that when splitting createMany
+DEFAULT_MAX_PAYLOAD_BYTES = 4 * 1024 * 1024
+# Distinct query shapes whose compiled statement is kept around
+DEFAULT_PLAN_CACHE_SIZE = 512
+# Upper bound on response bytes held by the local cache, when it is enabled
+DEFAULT_LOCAL_CACHE_BYTES = 64 * 1024 * 1024
+
+logger = logging.getLogger("django_prisma")
 
 
 class PrismaDatabaseFeatures(DatabaseFeatures):
     uses_savepoints = False
-    pass
+    # createMany only returns a count
+    can_return_rows_from_bulk_insert = False
+    supports_update_conflicts = False
+    supports_update_conflicts_with_target = False
+    # values are sent as typed JSON, so bulk_update's Case needs no Cast
+    requires_casted_case_in_updates = False
 
 
 class PrismaDatabaseOperations(BaseDatabaseOperations):
@@ -35,15 +73,33 @@ class PrismaDatabaseOperations(BaseDatabaseOperations):
     def quote_name(self, name):
         return f'"{name}"'
 
-    def bulk_insert_sql(self, fields, placeholder_rows):
-        print("bulk", fields, placeholder_rows)
-        return ""
+    def bulk_batch_size(self, fields, objs):
+        return self.wrapper.bulk_batch_size
 
     def adapt_datetimefield_value(self, value):
         if value is None:
             return None
         return datetime_to_prisma(value)
 
+    # Prisma has DateTime only: dates are midnight UTC, times are on 1970-01-01
+    def adapt_datefield_value(self, value):
+        if value is None:
+            return None
+        return datetime_to_prisma(datetime.datetime.combine(value, datetime.time()))
+
+    def adapt_timefield_value(self, value):
+        if value is None:
+            return None
+        return datetime_to_prisma(datetime.datetime.combine(datetime.date(1970, 1, 1), value))
+
+    def adapt_decimalfield_value(self, value, max_digits=None, decimal_places=None):
+        if value is None:
+            return None
+        return tagged("Decimal", str(value))
+
+    def adapt_json_value(self, value, encoder):
+        return tagged("Json", json.dumps(value, cls=encoder))
+
 class PrismaDatabaseClient(BaseDatabaseClient):
     def __init__(self, wrapper):
         self.wrapper = wrapper
@@ -87,43 +143,420 @@ class PrismaDatabase:
     InterfaceError = Error
     Error = Error
 
+    @staticmethod
+    def Binary(value):
+        # BinaryField values
+        return tagged("Bytes", base64.b64encode(value).decode())
+
+
+def dependencies(st: Statement) -> frozenset[str]:
+    # Statements built by hand rather than compiled only know their own table
+    return st.depends_on or frozenset((st.statement["modelName"],))
+
+
+def model_tag(table: str) -> str:
+    # Accelerate tags are letters, digits and underscores
+    return "model_" + re.sub(r"\W", "_", table)
+
+
+def cache_headers(statements: list[Statement], tag_models: bool = False) -> dict[str, str]:
+    # A shared request can only be cached if every statement agrees on how
+    cache_strategy = statements[0].cache_strategy
+    if not cache_strategy or any(st.cache_strategy != cache_strategy for st in statements):
+        return {}
+    headers = {"cache-control": f"max-age={cache_strategy.ttl},stale-while-revalidate={cache_strategy.swr}"}
+    tags = list(cache_strategy.tags)
+    if tag_models:
+        tags += sorted({model_tag(table) for st in statements for table in dependencies(st)})
+    if tags:
+        headers[CACHE_TAGS_HEADER] = ",".join(tags)
+    return headers
+
+
+def written_models(statements: list[Statement]) -> set[str]:
+    return {st.statement["modelName"] for st in statements if st.statement["action"] not in READ_ACTIONS}
 
-class Cursor:
-    def __init__(self, session, schema_id):
-        self.session = session
-        self.schema_id = schema_id
 
+def invalidation_body(models: set[str]) -> bytes:
+    return dumps({"tags": sorted(model_tag(model) for model in models)}).encode()
+
+
+def check_invalidation(response):
+    # The write itself went through; failing it now would invite a retry
+    if response.status_code >= 400:
+        logger.warning("Accelerate cache invalidation failed with %s: %s", response.status_code, response.text[:200])
+
+
+def raise_errors(_json: dict):
+    for error in _json.get("errors", []):
+        ufe = error["user_facing_error"]
+        if ufe["error_code"] == "P2002":
+            raise PrismaDatabase.IntegrityError(ufe["message"])
+        if ufe["error_code"] == "P2009":
+            raise FieldNotFoundError(ufe["message"])
+
+
+def unpack(other: Statement, result):
+    if isinstance(result, list):
+        # Multiple results must each get formatted as rows
+        return [other.rows(result)]
+    _tuple = other.dict_to_tuple(result)
+    #if isinstance(_tuple, int): # Update returns # of rows
+    return _tuple
+    #return [[_tuple]]
+
+
+def batch_body(statements: list[Statement]) -> str:
+    # One round trip for all of them, using the JSON protocol's batch envelope
+    return dumps({"batch": [st.statement for st in statements]})
+
+
+def unpack_batch(statements: list[Statement], _json: dict) -> list:
+    raise_errors(_json)
+    results = []
+    for st, item in zip(statements, _json["batchResult"]):
+        raise_errors(item)
+        results.append(unpack(st, item["data"][st.key]))
+    return results
+
+
+def decode(statements: list[Statement], response) -> list:
+    _json = loads(response.content)
+    if len(statements) == 1:
+        st = statements[0]
+        raise_errors(_json)
+        return [unpack(st, _json["data"][st.key])]
+    return unpack_batch(statements, _json)
+
+
+def flight_key(statements: list[Statement], body: str) -> tuple:
+    # Identical requests: same statements, asking for the same caching
+    return body, tuple(cache_headers(statements).items())
+
+
+def lookup_cached(response_cache: Optional[ResponseCache], statements: list[Statement], refresh) -> tuple[list, list[int]]:
+    # Returns the cached results, and the positions that still need a request
+    results = [None] * len(statements)
+    missing = []
+    for i, st in enumerate(statements):
+        if response_cache is None or st.cache_strategy is None:
+            missing.append(i)
+            continue
+        freshness, value = response_cache.get(st.body)
+        if freshness is Freshness.MISS:
+            missing.append(i)
+            continue
+        if freshness is Freshness.STALE and response_cache.begin_refresh(st.body):
+            refresh(st)
+        results[i] = value
+    return results, missing
+
+
+def cached_versions(response_cache: Optional[ResponseCache], statements: list[Statement]) -> Optional[list]:
+    # Taken before the request, so results read across a write are not stored
+    if response_cache is None:
+        return None
+    return [None if st.cache_strategy is None else response_cache.version(dependencies(st)) for st in statements]
+
+
+def store_cached(
+    response_cache: Optional[ResponseCache],
+    statements: list[Statement],
+    results: list,
+    size: int,
+    versions: Optional[list] = None,
+):
+    if response_cache is None:
+        return
+    versions = versions or [None] * len(statements)
+    for st, result, version in zip(statements, results, versions):
+        if st.cache_strategy is not None:
+            response_cache.set(
+                st.body, result, size // len(statements), st.cache_strategy, dependencies(st), version
+            )
+
+
+def schema_missing(response) -> bool:
+    # Accelerate forgot the schema, or a marker on disk wrongly said it had it
+    if response.status_code != 404:
+        return False
+    try:
+        body = loads(response.content)
+    except ValueError:
+        return False
+    return isinstance(body, dict) and body.get("EngineNotStarted", {}).get("reason") == "SchemaMissing"
+
+
+def check_status(response):
+    # Still failing after any retries the policy allowed
+    if retryable(response):
+        raise PrismaDatabase.OperationalError(f"Accelerate answered {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def check_upload(response):
+    if response.status_code >= 400:
+        raise ValueError(f"Failed to start up data-proxy: {response.text}")
+
+
+def upload_schema(transport, schema: Schema, cache_dir: Optional[str] = None, endpoint: str = DEFAULT_ENDPOINT):
+    check_upload(transport.put(SCHEMA_ENDPOINT.format(endpoint=endpoint, schema_id=schema.id), schema.inline))
+    registry.mark_registered(schema.id, cache_dir)
+
+
+async def aupload_schema(
+    transport: AsyncHttpxTransport, schema: Schema, cache_dir: Optional[str] = None, endpoint: str = DEFAULT_ENDPOINT
+):
+    check_upload(await transport.put(SCHEMA_ENDPOINT.format(endpoint=endpoint, schema_id=schema.id), schema.inline))
+    registry.mark_registered(schema.id, cache_dir)
+
+
+@dataclasses.dataclass
+class Request:
+    # A request body on its way out, and what is recorded about it
+    statements: list[Statement]
+    payload: bytes
+    content: bytes
+    headers: dict[str, str]
+    versions: Optional[list]
+    start: float
+    serialized: float
+
+
+class BaseCursor:
+    """
+    The local cache, coalescing, compression, metrics and invalidation
+    around sending statements. Cursor and AsyncCursor only differ in
+    talking to the transport synchronously or not.
+    """
+
+    def __init__(
+        self,
+        transport,
+        schema: Schema,
+        response_cache: Optional[ResponseCache] = None,
+        schema_cache_dir: Optional[str] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        endpoint: str = DEFAULT_ENDPOINT,
+        compression: Optional[Compression] = None,
+        retrier: Optional[Retrier] = None,
+        singleflight: Optional[SingleFlight] = None,
+        accelerate_invalidation: bool = False,
+    ):
+        self.transport = transport
+        self.schema = schema
+        self.response_cache = response_cache
+        self.schema_cache_dir = schema_cache_dir
+        self.instrumentation = instrumentation
+        self.endpoint = endpoint
+        self.compression = compression
+        self.retrier = retrier
+        self.singleflight = singleflight
+        self.accelerate_invalidation = accelerate_invalidation
+
+    @property
+    def url(self) -> str:
+        return GRAPHQL_ENDPOINT.format(endpoint=self.endpoint, schema_id=self.schema.id)
+
+    @property
+    def invalidation_url(self) -> str:
+        return INVALIDATE_ENDPOINT.format(endpoint=self.endpoint, schema_id=self.schema.id)
+
+    def _refresh(self, other: Statement):
+        raise NotImplementedError
+
+    def _lookup(self, statements: list[Statement]) -> tuple[list, list[int]]:
+        results, missing = lookup_cached(self.response_cache, statements, self._refresh)
+        if self.instrumentation is not None and len(missing) < len(statements):
+            self.instrumentation.cached_results(statements, results, missing)
+        return results, missing
+
+    def _flight_key(self, statements: list[Statement], body: str) -> Optional[tuple]:
+        # None when the request may not share another's response
+        if self.singleflight is None or not is_read(statements):
+            return None
+        return flight_key(statements, body)
+
+    def _coalesced(self, statements: list[Statement], results: list, shared: bool) -> list:
+        if shared and self.instrumentation is not None:
+            self.instrumentation.cached_results(statements, results, [], "coalesced")
+        return results
+
+    def _request(self, statements: list[Statement], body: str, start: float) -> Request:
+        versions = cached_versions(self.response_cache, statements)
+        payload = body.encode()
+        content, headers = compress_body(payload, self.compression)
+        headers = {**cache_headers(statements, self.accelerate_invalidation), **headers}
+        return Request(statements, payload, content, headers, versions, start, time.perf_counter())
+
+    def _results(self, request: Request, r) -> list:
+        received = time.perf_counter()
+        statements = request.statements
+        results = decode(statements, r)
+        decoded = time.perf_counter()
+        store_cached(self.response_cache, statements, results, len(r.content), request.versions)
+        if self.instrumentation is not None:
+            self.instrumentation.fetched(
+                statements,
+                results,
+                r,
+                request.serialized - request.start,
+                received - request.serialized,
+                decoded - received,
+                len(request.payload),
+                len(request.content),
+            )
+        return results
+
+    def _evict(self, models: set[str]) -> bool:
+        # Whether Accelerate's cache needs to be told as well
+        if self.response_cache is not None:
+            self.response_cache.invalidate_models(models)
+        return self.accelerate_invalidation
+
+
+class Cursor(BaseCursor):
     def execute(self, other: Statement, other2=None):
-        key = other.statement["action"] + other.statement["modelName"]  # findMany User
-        data = json.dumps(other.statement)
-        if other.cache_strategy:
-            _cache_headers = {"cache-control": "max-age=60,stale-while-revalidate=60"}
-        else:
-            _cache_headers = {}
-        r = self.session.post(
-            GRAPHQL_ENDPOINT.format(schema_id=self.schema_id), verify=False, data=data, headers=_cache_headers
-        )
-        _json = r.json()
-        for error in _json.get("errors", []):
-            ufe = error["user_facing_error"]
-            if ufe["error_code"] == "P2002":
-                raise PrismaDatabase.IntegrityError(ufe["message"])
-            if ufe["error_code"] == "P2009":
-                raise FieldNotFoundError(ufe["message"])
-
-        result = r.json()["data"][key]
-        if isinstance(result, list):
-            # Multiple results must each get formatted as rows
-            return [[other.dict_to_tuple(r) for r in result]]
-        _tuple = other.dict_to_tuple(result)
-        #if isinstance(_tuple, int): # Update returns # of rows
-        return _tuple
-        #return [[_tuple]]
+        return self.execute_many([other])[0]
+
+    def execute_many(self, statements: list[Statement]) -> list:
+        results, missing = self._lookup(statements)
+        if missing:
+            fetched = self._fetch([statements[i] for i in missing])
+            for i, result in zip(missing, fetched):
+                results[i] = result
+        return results
+
+    def _fetch(self, statements: list[Statement]) -> list:
+        start = time.perf_counter()
+        body = statements[0].body if len(statements) == 1 else batch_body(statements)
+        key = self._flight_key(statements, body)
+        if key is None:
+            return self._send(statements, body, start)
+        results, shared = self.singleflight.do(key, lambda: self._send(statements, body, start))
+        return self._coalesced(statements, results, shared)
+
+    def _send(self, statements: list[Statement], body: str, start: float) -> list:
+        request = self._request(statements, body, start)
+        results = self._results(request, self._post(request))
+        written = written_models(statements)
+        if written:
+            self._invalidate(written)
+        return results
+
+    def _invalidate(self, models: set[str]):
+        if not self._evict(models):
+            return
+        try:
+            check_invalidation(self.transport.post(self.invalidation_url, invalidation_body(models)))
+        except getattr(self.transport, "errors", ()) as e:
+            logger.warning("Accelerate cache invalidation failed: %s", e)
+
+    def _refresh(self, other: Statement):
+        threading.Thread(target=self._background_refresh, args=(other,), daemon=True).start()
+
+    def _background_refresh(self, other: Statement):
+        try:
+            self._fetch([other])
+        finally:
+            self.response_cache.end_refresh(other.body)
+
+    def _post(self, request: Request):
+        def attempt(timeout: Optional[float]):
+            r = self.transport.post(self.url, request.content, request.headers, timeout)
+            if schema_missing(r):
+                registry.forget(self.schema.id, self.schema_cache_dir)
+                upload_schema(self.transport, self.schema, self.schema_cache_dir, self.endpoint)
+                r = self.transport.post(self.url, request.content, request.headers, timeout)
+            return r
+
+        if self.retrier is None:
+            return check_status(attempt(None))
+        errors = getattr(self.transport, "errors", ())
+        try:
+            return check_status(self.retrier.call(attempt, request.statements, errors))
+        except (TimeoutError, *errors) as e:
+            raise PrismaDatabase.OperationalError(str(e)) from e
 
     def close(self):
         pass
 
 
+class AsyncCursor(BaseCursor):
+    transport: AsyncHttpxTransport
+
+    async def execute(self, other: Statement):
+        return (await self.execute_many([other]))[0]
+
+    async def execute_many(self, statements: list[Statement]) -> list:
+        results, missing = self._lookup(statements)
+        if missing:
+            fetched = await self._fetch([statements[i] for i in missing])
+            for i, result in zip(missing, fetched):
+                results[i] = result
+        return results
+
+    async def _fetch(self, statements: list[Statement]) -> list:
+        start = time.perf_counter()
+        body = statements[0].body if len(statements) == 1 else batch_body(statements)
+        key = self._flight_key(statements, body)
+        if key is None:
+            return await self._send(statements, body, start)
+        results, shared = await self.singleflight.ado(key, lambda: self._send(statements, body, start))
+        return self._coalesced(statements, results, shared)
+
+    async def _send(self, statements: list[Statement], body: str, start: float) -> list:
+        request = self._request(statements, body, start)
+        results = self._results(request, await self._post(request))
+        written = written_models(statements)
+        if written:
+            await self._invalidate(written)
+        return results
+
+    async def _invalidate(self, models: set[str]):
+        if not self._evict(models):
+            return
+        try:
+            check_invalidation(await self.transport.post(self.invalidation_url, invalidation_body(models)))
+        except getattr(self.transport, "errors", ()) as e:
+            logger.warning("Accelerate cache invalidation failed: %s", e)
+
+    def _refresh(self, other: Statement):
+        task = asyncio.get_running_loop().create_task(self._background_refresh(other))
+        # the loop only keeps weak references to tasks
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    async def _background_refresh(self, other: Statement):
+        try:
+            await self._fetch([other])
+        finally:
+            self.response_cache.end_refresh(other.body)
+
+    async def _post(self, request: Request):
+        if not registry.is_registered(self.schema.id, self.schema_cache_dir):
+            await aupload_schema(self.transport, self.schema, self.schema_cache_dir, self.endpoint)
+
+        async def attempt(timeout: Optional[float]):
+            r = await self.transport.post(self.url, request.content, request.headers, timeout)
+            if schema_missing(r):
+                registry.forget(self.schema.id, self.schema_cache_dir)
+                await aupload_schema(self.transport, self.schema, self.schema_cache_dir, self.endpoint)
+                r = await self.transport.post(self.url, request.content, request.headers, timeout)
+            return r
+
+        if self.retrier is None:
+            return check_status(await attempt(None))
+        errors = getattr(self.transport, "errors", ())
+        try:
+            return check_status(await self.retrier.acall(attempt, request.statements, errors))
+        except (TimeoutError, *errors) as e:
+            raise PrismaDatabase.OperationalError(str(e)) from e
+
+
+_background_tasks = set()
+
+
 class DatabaseSchemaEditor(BaseDatabaseSchemaEditor):
     pass
 
@@ -146,33 +579,87 @@ class PrismaDatabaseWrapper(BaseDatabaseWrapper):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        with open(self.settings_dict["SCHEMA_PATH"], "rb") as fd:
-            self.schema = fd.read()
-        # https://github.com/prisma/prisma/blob/eb9ef4d623765df76c73d8ff5ced51f747168bec/packages/client/src/generation/utils/buildInlineSchema.ts#L13
-        self.schema_inline = base64.b64encode(self.schema)
-        self.schema_id = hashlib.sha256(self.schema_inline).hexdigest()
+        self.schema_path = self.settings_dict["SCHEMA_PATH"]
         self.token = self.settings_dict["TOKEN"]
 
-        headers = {"Connection": "keep-alive", "Authorization": f"Bearer {self.token}"}
-        self.session = requests.Session()
-        self.session.headers.update(headers)
+        options = self.settings_dict.get("OPTIONS", {})
+        self.schema_cache_dir = options.get("SCHEMA_CACHE_DIR")
+        self.endpoint = options.get("ENDPOINT", DEFAULT_ENDPOINT).rstrip("/")
+        self.compression = Compression.from_settings(options)
+        self.bulk_batch_size = options.get("BULK_BATCH_SIZE", DEFAULT_BULK_BATCH_SIZE)
+        self.max_payload_bytes = options.get("MAX_PAYLOAD_BYTES", DEFAULT_MAX_PAYLOAD_BYTES)
+        self.transport_options = TransportOptions.from_settings(options)
+        self.retrier = get_retrier(self.alias, RetryPolicy.from_settings(options))
+        self.singleflight = get_singleflight(self.alias, options.get("COALESCE_READS", False))
+        self.accelerate_invalidation = options.get("ACCELERATE_INVALIDATION", False)
+        self.decode_types = options.get("DECODE_TYPES", True)
+        self.plan_cache = get_plan_cache(self.alias, options.get("PLAN_CACHE_SIZE", DEFAULT_PLAN_CACHE_SIZE))
+        self.response_cache = get_response_cache(
+            self.alias,
+            options.get("LOCAL_CACHE_ENTRIES", 0),
+            options.get("LOCAL_CACHE_BYTES", DEFAULT_LOCAL_CACHE_BYTES),
+        )
+        self.metrics: Optional[Metrics] = get_metrics(self.alias, options.get("METRICS", False))
+        self.instrumentation = Instrumentation(self.alias, self.metrics)
         self.connection = None
 
+    @property
+    def schema(self) -> Schema:
+        return load_schema(self.schema_path)
+
+    @property
+    def converters(self) -> Converters:
+        # Built from the schema the first time a query is compiled
+        if not self.decode_types:
+            return NO_CONVERTERS
+        return load_converters(self.schema_path, self.schema_cache_dir, settings.USE_TZ)
+
+    @property
+    def transport(self):
+        return get_transport(self.alias, self.token, self.transport_options)
+
     def create_cursor(self, name=None):
-        return Cursor(self.session, self.schema_id)
+        return Cursor(
+            self.transport,
+            self.schema,
+            self.response_cache,
+            self.schema_cache_dir,
+            self.instrumentation,
+            self.endpoint,
+            self.compression,
+            self.retrier,
+            self.singleflight,
+            self.accelerate_invalidation,
+        )
+
+    def create_async_cursor(self) -> AsyncCursor:
+        return AsyncCursor(
+            self.async_transport(),
+            self.schema,
+            self.response_cache,
+            self.schema_cache_dir,
+            self.instrumentation,
+            self.endpoint,
+            self.compression,
+            self.retrier,
+            self.singleflight,
+            self.accelerate_invalidation,
+        )
+
+    def async_transport(self) -> AsyncHttpxTransport:
+        return get_async_transport(self.alias, self.token, self.transport_options)
 
     def is_usable(self):
         return self.connection is not None
 
     def get_new_connection(self, conn_params):
-        print("get new conn")
+        return Connection()
 
     def connect(self):
         if self.connection is not None:
             return
-        r = self.session.put(SCHEMA_ENDPOINT.format(schema_id=self.schema_id), data=self.schema_inline, verify=False)
-        if not r.ok:
-            raise ValueError(f"Failed to start up data-proxy: {r.text}")
+        if not registry.is_registered(self.schema.id, self.schema_cache_dir):
+            upload_schema(self.transport, self.schema, self.schema_cache_dir, self.endpoint)
         self.connection = Connection()
 
 
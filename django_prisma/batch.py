@@ -0,0 +1,158 @@
+import contextlib
+import contextvars
+
+from typing import Any, Callable, Optional
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.query import QuerySet
+
+# While recording, Cursor.execute hands the compiled statement back instead of
+# sending it; while replaying, it serves results fetched by the batch.
+_recording = contextvars.ContextVar("prisma_batch_recording", default=False)
+_prefetched = contextvars.ContextVar("prisma_batch_prefetched", default=None)
+
+
+class Recorded(Exception):
+    def __init__(self, statement):
+        super().__init__(statement)
+        self.statement = statement
+
+
+def recording() -> bool:
+    return _recording.get()
+
+
+# What record() returns for a callable that needed no statement, e.g. a
+# count() answered from a queryset's result cache
+NO_STATEMENT = object()
+
+
+def record(fn: Callable[[], Any]) -> tuple[Any, Any]:
+    # The statement `fn` would send, without sending it; or NO_STATEMENT
+    # and what `fn` returned, if it finished without one
+    token = _recording.set(True)
+    try:
+        result = fn()
+    except Recorded as r:
+        return r.statement, None
+    finally:
+        _recording.reset(token)
+    return NO_STATEMENT, result
+
+
+@contextlib.contextmanager
+def serving(prefetched: dict[str, list]):
+    # Statements whose body is in `prefetched` get its results, in order
+    outer = _prefetched.get() or {}
+    token = _prefetched.set({**outer, **prefetched})
+    try:
+        yield
+    finally:
+        _prefetched.reset(token)
+
+
+def take_prefetched(statement) -> tuple[bool, Any]:
+    prefetched = _prefetched.get()
+    # Outside a replay, without encoding the statement to look it up
+    if not prefetched:
+        return False, None
+    results = prefetched.get(statement.body)
+    if not results:
+        return False, None
+    return True, results.pop(0)
+
+
+class BatchResult:
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+        self.statement = None
+        self.result = None
+
+
+class PrismaBatch:
+    def __init__(self, using: str = DEFAULT_DB_ALIAS):
+        self.using = using
+        self.pending: list[BatchResult] = []
+
+    def add(self, fn: Callable[[], Any]) -> BatchResult:
+        # `fn` must run exactly one statement, e.g. `lambda: qs.count()`
+        item = BatchResult(fn)
+        statement, result = record(fn)
+        if statement is NO_STATEMENT:
+            # Nothing to send: it is resolved already
+            item.result = result
+            return item
+        item.statement = statement
+        self.pending.append(item)
+        return item
+
+    def fetch(self, queryset: QuerySet) -> QuerySet:
+        # The queryset's result cache gets filled when the batch runs
+        self.add(queryset._fetch_all)
+        return queryset
+
+    def count(self, queryset: QuerySet) -> BatchResult:
+        return self.add(queryset.count)
+
+    def aggregate(self, queryset: QuerySet, *args, **kwargs) -> BatchResult:
+        return self.add(lambda: queryset.aggregate(*args, **kwargs))
+
+    def update(self, queryset: QuerySet, **kwargs) -> BatchResult:
+        return self.add(lambda: queryset.update(**kwargs))
+
+    def execute(self):
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        with connections[self.using].cursor() as cursor:
+            results = cursor.execute_many([item.statement for item in pending])
+        self._replay(pending, results)
+
+    async def aexecute(self):
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        cursor = connections[self.using].create_async_cursor()
+        if len(pending) == 1:
+            results = [await cursor.execute(pending[0].statement)]
+        else:
+            results = await cursor.execute_many([item.statement for item in pending])
+        self._replay(pending, results)
+
+    def _replay(self, pending: list[BatchResult], results: list):
+        prefetched = {}
+        for item, result in zip(pending, results):
+            prefetched.setdefault(item.statement.body, []).append(result)
+        with serving(prefetched):
+            for item in pending:
+                item.result = item.fn()
+
+
+class prisma_batch:
+    """
+    Send every read queued inside the block to Accelerate in one request.
+
+        with prisma_batch() as batch:
+            users = batch.fetch(User.objects.filter(name="A"))
+            pets = batch.count(Pet.objects.all())
+        print(list(users), pets.result)
+    """
+
+    def __init__(self, using: str = DEFAULT_DB_ALIAS):
+        self.batch = PrismaBatch(using)
+
+    def __enter__(self) -> PrismaBatch:
+        return self.batch
+
+    def __exit__(self, exc_type, exc, tb) -> Optional[bool]:
+        if exc_type is None:
+            self.batch.execute()
+        return None
+
+    async def __aenter__(self) -> PrismaBatch:
+        return self.batch
+
+    async def __aexit__(self, exc_type, exc, tb) -> Optional[bool]:
+        if exc_type is None:
+            await self.batch.aexecute()
+        return None
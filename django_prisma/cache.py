@@ -0,0 +1,161 @@
+import dataclasses
+import enum
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Optional
+
+from django_prisma.manager import CacheStrategy
+
+
+class Freshness(enum.Enum):
+    MISS = enum.auto()
+    FRESH = enum.auto()
+    # Past its ttl but inside the swr window: serve it, and refresh it
+    STALE = enum.auto()
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    value: Any
+    size: int
+    fresh_until: float
+    stale_until: float
+    tags: tuple[str, ...] = ()
+    # Tables whose writes make it stale
+    models: frozenset[str] = frozenset()
+
+
+class ResponseCache:
+    """
+    LRU of unpacked query results keyed by the statement's request body,
+    bounded both by number of entries and by the size of the responses.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.size = 0
+        self.refreshing: set[str] = set()
+        # tag -> keys of the entries cached with it
+        self.tagged: dict[str, set[str]] = {}
+        # table -> keys of the entries depending on it
+        self.by_model: dict[str, set[str]] = {}
+        # table -> writes seen, to drop results read while a write went through
+        self.versions: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[Freshness, Any]:
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return Freshness.MISS, None
+            if now >= entry.stale_until:
+                self._remove(key)
+                return Freshness.MISS, None
+            self.entries.move_to_end(key)
+            if now < entry.fresh_until:
+                return Freshness.FRESH, entry.value
+            return Freshness.STALE, entry.value
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        size: int,
+        cache_strategy: CacheStrategy,
+        models: frozenset[str] = frozenset(),
+        version: Optional[int] = None,
+    ):
+        # `version` is what version(models) said before the value was read
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        ttl, swr, tags = cache_strategy.ttl, cache_strategy.swr, cache_strategy.tags
+        entry = CacheEntry(value, size, now + ttl, now + ttl + swr, tags, models)
+        with self.lock:
+            if version is not None and self._version(models) != version:
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.size += size
+            for tag in tags:
+                self.tagged.setdefault(tag, set()).add(key)
+            for model in models:
+                self.by_model.setdefault(model, set()).add(key)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def begin_refresh(self, key: str) -> bool:
+        # Only one caller gets to refresh a stale entry
+        with self.lock:
+            if key in self.refreshing:
+                return False
+            self.refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: str):
+        with self.lock:
+            self.refreshing.discard(key)
+
+    def version(self, models: frozenset[str]) -> int:
+        with self.lock:
+            return self._version(models)
+
+    def invalidate(self, tags) -> int:
+        # Drops every entry cached with any of the tags; returns how many
+        with self.lock:
+            return self._invalidate(self.tagged, tags)
+
+    def invalidate_models(self, models) -> int:
+        # Drops every entry that read from any of the tables, after a write to them
+        with self.lock:
+            for model in models:
+                self.versions[model] = self.versions.get(model, 0) + 1
+            return self._invalidate(self.by_model, models)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tagged.clear()
+            self.by_model.clear()
+            self.size = 0
+
+    def _version(self, models: frozenset[str]) -> int:
+        # Only ever grows, so it changes whenever one of the tables is written
+        return sum(self.versions.get(model, 0) for model in models)
+
+    def _invalidate(self, index: dict, names) -> int:
+        keys = set()
+        for name in names:
+            keys |= index.get(name, set())
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key)
+        self.size -= entry.size
+        for index, names in ((self.tagged, entry.tags), (self.by_model, entry.models)):
+            for name in names:
+                keys = index[name]
+                keys.discard(key)
+                if not keys:
+                    del index[name]
+
+
+_caches: dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(alias: str, max_entries: int, max_bytes: int) -> Optional[ResponseCache]:
+    if not max_entries:
+        return None
+    with _caches_lock:
+        if alias not in _caches:
+            _caches[alias] = ResponseCache(max_entries, max_bytes)
+        return _caches[alias]
@@ -1,8 +1,16 @@
-import datetime
+import copy
+import dataclasses
+import operator
+import threading
+import time
 
-from typing import Any, Protocol, Optional
+from collections import OrderedDict
+
+from typing import Any, Callable, Protocol, Optional
 
 from django.db.models.query import Field
+from django.db import NotSupportedError
+from django.db.models.constants import LOOKUP_SEP, OnConflict
 from django.db.models.sql.constants import MULTI, SINGLE
 from django.db.models.sql.compiler import (
     SQLAggregateCompiler as BaseSQLAggregateCompiler,
@@ -12,24 +20,53 @@ from django.db.models.sql.compiler import (
     SQLUpdateCompiler as BaseSQLUpdateCompiler,
 )
 from django.db.models.sql.datastructures import Join
-from django.db.models.sql.where import WhereNode, AND, tree
-from django.db.models.lookups import Exact, In, GreaterThan
-from django.db.models.expressions import Col
-from django.db.models.aggregates import Count, Star
+from django.db.models.sql.where import AND, WhereNode
+from django.db.models.expressions import Case, Col, OrderBy, Ref, Value
+from django.db.models.functions import Cast
+from django.db.models.aggregates import Avg, Count, Max, Min, Star, Sum
 
-from django_prisma.manager import CacheableManager, CacheStrategy
+from django_prisma import batch
+from django_prisma.converters import ColumnConverter, Converters, convert_columns
+from django_prisma.decoding import column_extractor, dumps, row_extractor
+from django_prisma.manager import CacheStrategy
+from django_prisma.where import merge, where_to_dict
 
 class Statement(Protocol):
     statement: dict
     cache_strategy: Optional[CacheStrategy]
+    # Seconds spent building it, reported by instrumentation
+    compile_time: float = 0.0
+    # Tables a read's result comes from, so writes to them can evict it
+    depends_on: frozenset[str] = frozenset()
+    # Per row column, from the schema's types; None where values need none
+    converters: Optional[list[Optional[ColumnConverter]]] = None
+
     def dict_to_tuple(self, data: dict[str, Any]) -> tuple[Any]:
         ...
 
+    def rows(self, results: list[dict[str, Any]]) -> list:
+        return [self.dict_to_tuple(r) for r in results]
+
+    @property
+    def key(self) -> str:
+        # findMany User
+        return self.statement["action"] + self.statement["modelName"]
+
+    @property
+    def body(self) -> str:
+        # Encoded once per statement dict: the local cache, coalescing and the
+        # request all key on it. Copies rebound to a new dict encode again.
+        cached = self.__dict__.get("_body")
+        if cached is None or cached[0] is not self.statement:
+            cached = self.__dict__["_body"] = (self.statement, dumps(self.statement))
+        return cached[1]
+
 class InsertStatement(Statement):
-    def __init__(self, model: str, field_names: list[Field], values: list):
+    def __init__(self, model: str, field_names: list[Field], values: list, returning_fields: Optional[list[Field]] = None):
         self.model = model
-        self.field_names = [str(f.name) for f in field_names]
+        self.field_names = [f.column for f in field_names]
         self.field_values = values
+        self.returning_fields = [f.column for f in returning_fields or []]
         self.cache_strategy = None
 
     @property
@@ -47,151 +84,412 @@ class InsertStatement(Statement):
         return self.statement
 
     def dict_to_tuple(self, data: dict[str, Any]) -> list[Any]:
-        ret = [data[colname] for colname in self.field_names]
-        return [[ret]]
-
-
-def cast_to_prisma(val: Any) -> Any:
-    match val:
-        case datetime.datetime():
-            return datetime_to_prisma(val)
-
-def datetime_to_prisma(dt) -> str:
-    # Prisma doesn't support datetime with ISO offset
-    # https://github.com/prisma/prisma/issues/9516
-    d, _, _ = dt.isoformat().partition('+')
-    # It also requires a silly trailing z
-    return d + 'z'
-
-def node_to_dict(n: tree.Node):
-    match n:
-        case Exact():
-            return {n.lhs.field.name: n.rhs}
-        case WhereNode():
-            return where_to_dict(n)
-        case In():
-            assert isinstance(n.lhs, Col)
-            assert isinstance(n.rhs, list)
-            return {n.lhs.field.name: {"in": n.rhs}}
-        case GreaterThan():
-            return {n.lhs.field.name: {"gt": cast_to_prisma(n.rhs)}}
-
-    assert False, f'got {n}, {type(n)}'
-
-
-def where_to_dict(w: WhereNode):
-    ret = {}
-    if w.connector == AND:
-        for c in w.children:
-            ret.update(node_to_dict(c))
-    return ret
+        row = tuple(data[colname] for colname in self.returning_fields)
+        if self.converters:
+            return convert_columns(list(zip(row)), self.converters)
+        return [row]
+
+
+class CreateManyStatement(Statement):
+    def __init__(self, model: str, rows: list[dict[str, Any]], skip_duplicates: bool = False):
+        # createMany only reports how many rows were written; the engine we
+        # talk to predates createManyAndReturn, so no primary keys come back.
+        self.model = model
+        self.rows = rows
+        self.cache_strategy = None
+        self.statement = {
+            "modelName": model,
+            "action": "createMany",
+            "query": {
+                "arguments": {"data": rows, "skipDuplicates": skip_duplicates},
+                "selection": {"count": True},
+            },
+        }
+
+    def dict_to_tuple(self, data: dict[str, Any]) -> int:
+        return data["count"]
+
+
+def split_by_payload_size(rows: list, max_bytes: int, measure: Callable[[Any], int] = lambda row: len(dumps(row))) -> list[list]:
+    # Accelerate rejects oversized request bodies, so a single batch may
+    # need to be sent as several createMany statements (or batch requests).
+    chunks = []
+    chunk = []
+    size = 0
+    for row in rows:
+        row_size = measure(row) + 1
+        if chunk and size + row_size > max_bytes:
+            chunks.append(chunk)
+            chunk = []
+            size = 0
+        chunk.append(row)
+        size += row_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+# Key of the Prisma aggregate/groupBy result holding each Django aggregate
+PRISMA_AGGREGATES = {Count: "_count", Sum: "_sum", Avg: "_avg", Min: "_min", Max: "_max"}
+
+
+@dataclasses.dataclass
+class Constant:
+    # A selected expression Django computes without the database, e.g. Value(1)
+    value: Any
+
+
+# Where a selected column lives in a Prisma result: relation names, then the field
+ColumnPath = tuple[str, ...]
+
+
+def paths_to_selection(paths: list[ColumnPath]) -> dict[str, Any]:
+    selection = {}
+    for path in paths:
+        node = selection
+        for relation in path[:-1]:
+            node = node.setdefault(relation, {"arguments": {}, "selection": {}})["selection"]
+        node[path[-1]] = True
+    return selection
+
+
+def extract_rows(statement, results: list[dict[str, Any]]) -> list[tuple]:
+    # Typed values are converted a column at a time, across all the results
+    if statement.converters:
+        return convert_columns(statement.extract_columns(results), statement.converters)
+    return list(map(statement.extract, results))
+
+
+def bind_arguments(statement, where: dict, take: Optional[int], skip: int, cache_strategy: Optional[CacheStrategy]):
+    # Same query shape with different parameters: reuse selection and extractor
+    st = copy.copy(statement)
+    st.cache_strategy = cache_strategy
+    arguments = dict(statement.statement["query"]["arguments"], where=where)
+    arguments.pop("take", None)
+    arguments.pop("skip", None)
+    if take is not None:
+        arguments["take"] = take
+    if skip:
+        arguments["skip"] = skip
+    st.statement = dict(statement.statement, query=dict(statement.statement["query"], arguments=arguments))
+    return st
 
 
 class AggregateStatement(Statement):
-    def __init__(self, model: str, aggregates: dict[str, Count], cache_strategy: Optional[CacheStrategy]):
+    def __init__(
+        self,
+        model: str,
+        columns: list[ColumnPath],
+        where: dict,
+        cache_strategy: Optional[CacheStrategy],
+        order_by: Optional[list[dict[str, Any]]] = None,
+    ):
         # {"modelName":"Pet","action":"aggregate","query":{"arguments":{},"selection":{"_count":{"arguments":{},"selection":{"_all":true}}}}}
+        # columns are ("_sum", "age")-style paths into the single result object
         self.model = model
-        self.field_names = []
-        for k in aggregates.keys():
-            if k == "__count":
-                k = "_count"
-            self.field_names.append(k)
+        self.columns = columns
         self.cache_strategy = cache_strategy
         self.statement = {
             "modelName": model,
             "action": "aggregate",
             "query": {
-                "arguments": {},
-                "selection": {},
+                "arguments": {"where": where},
+                "selection": paths_to_selection(columns),
             },
         }
-        for agg in aggregates.values():
-            match agg:
-                case Count():
-                    _agg_name = "_count"
-                case _:
-                    assert False, f"Agg {agg} unhandled"
-            sel = {}
-            for exp in agg.source_expressions:
-                match exp:
-                    case Star():
-                        key = "_all"
-                    case default:
-                        assert False, f"Expresion {exp} unhandled"
-                sel[key] = True
-                self.statement["query"]["selection"][_agg_name] = {"arguments": {}, "selection": sel}
+        if order_by:
+            self.statement["query"]["arguments"]["orderBy"] = order_by
+        self.extract = row_extractor(columns)
+        self.extract_columns = column_extractor(columns)
 
     def query(self) -> dict[str, Any]:
         return self.statement
 
-    def dict_to_tuple(self, data: dict[str, Any]) -> list[Any]:
-        ret = [data[colname] for colname in self.field_names]
-        assert len(ret) == 1
-        k, v = ret[0].popitem()
-        return [[v]]
+    def bind(self, where: dict, take: Optional[int], skip: int, cache_strategy: Optional[CacheStrategy]) -> "AggregateStatement":
+        return bind_arguments(self, where, take, skip, cache_strategy)
+
+    def dict_to_tuple(self, data: dict[str, Any]) -> tuple[Any]:
+        return extract_rows(self, [data])[0]
+
+
+class GroupByStatement(Statement):
+    def __init__(
+        self,
+        model: str,
+        columns: list[ColumnPath | Constant],
+        by: list[str],
+        where: dict,
+        cache_strategy: Optional[CacheStrategy],
+        order_by: Optional[list[dict[str, Any]]] = None,
+    ):
+        # values(...).annotate(...): one result object per group, holding the
+        # `by` fields and the requested aggregates
+        self.model = model
+        self.columns = columns
+        self.cache_strategy = cache_strategy
+        paths = [c for c in columns if not isinstance(c, Constant)]
+        self.statement = {
+            "modelName": model,
+            "action": "groupBy",
+            "query": {
+                "arguments": {"by": by, "where": where},
+                "selection": paths_to_selection(paths),
+            },
+        }
+        # Prisma refuses take/skip on groupBy without an orderBy
+        self.statement["query"]["arguments"]["orderBy"] = order_by or [{field: "asc"} for field in by]
+        self.extract = row_extractor(columns)
+        self.extract_columns = column_extractor(columns)
+
+    def query(self) -> dict[str, Any]:
+        return self.statement
+
+    def bind(self, where: dict, take: Optional[int], skip: int, cache_strategy: Optional[CacheStrategy]) -> "GroupByStatement":
+        return bind_arguments(self, where, take, skip, cache_strategy)
+
+    def dict_to_tuple(self, data: dict[str, Any]) -> tuple[Any]:
+        return extract_rows(self, [data])[0]
+
+    def rows(self, results: list[dict[str, Any]]) -> list[tuple[Any]]:
+        return extract_rows(self, results)
 
 
 class SelectStatement(Statement):
-    def __init__(self, model: str, field_names: list[str], where: WhereNode, joins: list[Join], cache_strategy: Optional[CacheStrategy]):
+    def __init__(
+        self,
+        model: str,
+        columns: list[ColumnPath | Constant],
+        where: dict,
+        cache_strategy: Optional[CacheStrategy],
+        pk: str,
+        order_by: Optional[list[dict[str, Any]]] = None,
+        take: Optional[int] = None,
+        skip: Optional[int] = None,
+        distinct: Optional[list[str]] = None,
+    ):
         self.model = model
-        self.field_names = field_names
-        self.where = where
-        self.joins = joins
+        self.columns = columns
+        self.pk = pk
         self.cache_strategy = cache_strategy
-        _where = where_to_dict(where)
+        paths = [c for c in columns if not isinstance(c, Constant)]
+        # Prisma needs at least one field, e.g. for exists()
+        selection = paths_to_selection(paths or [(pk,)])
         self.statement = {
             "modelName": model,
             "action": "findMany",
             "query": {
                 "arguments": {
-                    "where": _where,
+                    "where": where,
                 },
-                "selection": {"$composites": True, "$scalars": True},
+                "selection": selection,
             },
         }
-
-        for join in joins:
-            # True here means all of them in default order
-            # Can apply sorting and filtering
-            # This is recursive also
-            # And can select a subset of fields.. but not sure how to in django
-            self.statement['query']['selection'][join.join_field.name] = True
+        arguments = self.statement["query"]["arguments"]
+        if order_by:
+            arguments["orderBy"] = order_by
+        if take is not None:
+            arguments["take"] = take
+        if skip:
+            arguments["skip"] = skip
+        if distinct:
+            arguments["distinct"] = distinct
+        self.extract = row_extractor(columns)
+        self.extract_columns = column_extractor(columns)
 
     def query(self) -> dict[str, Any]:
         return self.statement
 
-    def dict_to_tuple(self, data: dict[str, Any]) -> list[Any]:
-        ret = [data[colname] for colname in self.field_names]
-        for join in self.joins:
-            jname = join.join_field.name
-            join_values = data[jname].values()  # order?
-            ret.extend(join_values)
-        return ret
+    def bind(self, where: dict, take: Optional[int], skip: int, cache_strategy: Optional[CacheStrategy]) -> "SelectStatement":
+        return bind_arguments(self, where, take, skip, cache_strategy)
+
+    def include(self, includes: dict[str, dict[str, Any]]) -> "SelectStatement":
+        # Related rows nested under each result, {"pets": {"arguments", "selection"}};
+        # every relation's list rides along as an extra trailing value of the row
+        st = copy.copy(self)
+        query = self.statement["query"]
+        st.statement = dict(self.statement, query=dict(query, selection={**query["selection"], **includes}))
+        st.columns = [*self.columns, *((relation,) for relation in includes)]
+        st.extract = row_extractor(st.columns)
+        st.extract_columns = column_extractor(st.columns)
+        if self.converters:
+            st.converters = [*self.converters, *(None for _ in includes)]
+        return st
+
+    def dict_to_tuple(self, data: dict[str, Any]) -> tuple[Any]:
+        return extract_rows(self, [data])[0]
+
+    def rows(self, results: list[dict[str, Any]]) -> list[tuple[Any]]:
+        return extract_rows(self, results)
+
+
+class PageStatement(Statement):
+    def __init__(self, select: SelectStatement, take: int, cursor: Any = None, skip: int = 0):
+        # One page of `select`, walked with Prisma's cursor pagination on the pk
+        self.select = select
+        self.cache_strategy = select.cache_strategy
+        self.depends_on = select.depends_on
+        pk = select.pk
+        query = select.statement["query"]
+        arguments = dict(query["arguments"], take=take)
+        arguments.pop("skip", None)
+        order_by = list(arguments.get("orderBy", []))
+        if not any(pk in o for o in order_by):
+            # pages are only stable under a total order
+            order_by.append({pk: "asc"})
+        arguments["orderBy"] = order_by
+        if cursor is not None:
+            arguments["cursor"] = {pk: cursor}
+            arguments["skip"] = 1
+        elif skip:
+            arguments["skip"] = skip
+        selection = query["selection"]
+        if not selection.get("$scalars") and pk not in selection:
+            selection = dict(selection, **{pk: True})
+        self.statement = {
+            "modelName": select.model,
+            "action": "findMany",
+            "query": {"arguments": arguments, "selection": selection},
+        }
+
+    def dict_to_tuple(self, data: dict[str, Any]) -> tuple[tuple[Any], Any]:
+        # The pk travels with each row so the next page can start after it
+        return self.select.dict_to_tuple(data), data[self.select.pk]
+
+    def rows(self, results: list[dict[str, Any]]) -> list[tuple[tuple[Any], Any]]:
+        return list(zip(self.select.rows(results), map(operator.itemgetter(self.select.pk), results)))
 
 
 class UpdateStatement(Statement):
-    def __init__(self, model: str, field_name_values: dict[str, Any], where: WhereNode, joins: list[Join], cache_strategy: Optional[CacheStrategy]):
+    def __init__(self, model: str, field_name_values: dict[str, Any], where: dict, cache_strategy: Optional[CacheStrategy]):
         self.model = model
-        self.where = where
-        self.joins = joins
         self.cache_strategy = None
-        _where = where_to_dict(where)
         self.statement = {
             "modelName": model,
             "action": "updateMany",
             "query": {
                 "arguments": {
-                    "where": _where,
+                    "where": where,
                     "data": field_name_values,
                 },
                 "selection": {"$composites": True, "$scalars": True},
             },
         }
-        print(self.statement)
 
     def dict_to_tuple(self, data: dict[str, Any]) -> list[Any]:
         return data['count']
 
+
+class DeleteStatement(Statement):
+    def __init__(self, model: str, where: dict):
+        self.model = model
+        self.cache_strategy = None
+        self.statement = {
+            "modelName": model,
+            "action": "deleteMany",
+            "query": {"arguments": {"where": where}, "selection": {"count": True}},
+        }
+
+    def dict_to_tuple(self, data: dict[str, Any]) -> int:
+        return data["count"]
+
+
+@dataclasses.dataclass
+class Plan:
+    # Everything pre_sql_setup works out for one query shape
+    statement: "SelectStatement | AggregateStatement"
+    select: list
+    klass_info: Optional[dict]
+    annotation_col_map: Optional[dict]
+    has_extra_select: bool
+
+
+class PlanCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.plans: OrderedDict[tuple, Plan] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[Plan]:
+        with self.lock:
+            plan = self.plans.get(key)
+            if plan is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.plans.move_to_end(key)
+            return plan
+
+    def set(self, key: tuple, plan: Plan):
+        with self.lock:
+            self.plans[key] = plan
+            if len(self.plans) > self.max_entries:
+                self.plans.popitem(last=False)
+
+
+_plan_caches: dict[str, PlanCache] = {}
+_plan_caches_lock = threading.Lock()
+
+
+def get_plan_cache(alias: str, max_entries: int) -> Optional[PlanCache]:
+    if not max_entries:
+        return None
+    with _plan_caches_lock:
+        if alias not in _plan_caches:
+            _plan_caches[alias] = PlanCache(max_entries)
+        return _plan_caches[alias]
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def plan_key(query) -> Optional[tuple]:
+    """
+    Fingerprint of everything that decides the selection, joins and ordering
+    of a query. Filter values and limits are left out: they are bound into
+    the cached statement for every execution.
+    """
+    if query.combinator or query.extra or query.subquery or query.where.contains_aggregate:
+        return None
+    if any(getattr(join, "filtered_relation", None) for join in query.alias_map.values()):
+        return None
+    key = (
+        query.model,
+        tuple(query.alias_map.items()),
+        tuple(query.alias_refcount.items()),
+        query.select,
+        query.default_cols,
+        _freeze(query.select_related),
+        frozenset(query.deferred_loading[0]),
+        query.deferred_loading[1],
+        query.values_select,
+        tuple(query.annotations.items()),
+        None if query.annotation_select_mask is None else frozenset(query.annotation_select_mask),
+        query.order_by,
+        query.extra_order_by,
+        query.default_ordering,
+        query.standard_ordering,
+        query.distinct,
+        query.distinct_fields,
+        query.group_by,
+    )
+    try:
+        hash(key)
+    except TypeError:
+        # e.g. Value() of a list
+        return None
+    return key
+
+
+def depends_on(query) -> frozenset[str]:
+    # The query's table and every table it joins, for filters or select_related
+    return frozenset({query.get_meta().db_table, *(join.table_name for join in query.alias_map.values())})
+
+
 class SelectSQLCompiler(BaseSQLCompiler):
     def __init__(self, query, connection, using, elide_empty=True):
         super().__init__(query, connection, using, elide_empty)
@@ -200,44 +498,266 @@ class SelectSQLCompiler(BaseSQLCompiler):
         # i think only sql.InsertQuery.__str__ calls as_sql
         raise ValueError("somebody still calls as_sql")
 
+    def cache_strategy(self) -> Optional[CacheStrategy]:
+        # Set by PrismaQuerySet.with_cache()
+        return getattr(self.query, "prisma_cache_strategy", None)
+
     def executable(self):
+        cache_strategy = self.cache_strategy()
+        plan_cache = self.connection.plan_cache
+        key = plan_key(self.query) if plan_cache is not None else None
+        plan = plan_cache.get(key) if key is not None else None
+        if plan is None:
+            plan = self.compile_plan()
+            if key is not None:
+                plan_cache.set(key, plan)
+        else:
+            # What pre_sql_setup would have set; Django's iterables read these
+            self.select = plan.select
+            self.klass_info = plan.klass_info
+            self.annotation_col_map = plan.annotation_col_map
+            self.col_count = len(plan.select)
+            self.has_extra_select = plan.has_extra_select
+            self.where, self.having, self.qualify = self.query.where, None, None
+
+        take = None
+        if self.query.high_mark is not None:
+            take = self.query.high_mark - self.query.low_mark
+        st = plan.statement.bind(where_to_dict(self.where, self.query), take, self.query.low_mark, cache_strategy)
+        st.depends_on = depends_on(self.query)
+        includes = getattr(self.query, "prisma_includes", None)
+        if includes and isinstance(st, SelectStatement):
+            st = st.include(includes)
+            opts = self.query.get_meta()
+            st.depends_on |= {opts.get_field(relation).related_model._meta.db_table for relation in includes}
+        return st
+
+    def compile_plan(self) -> Plan:
         # pre_sql_setup mutates self and populates `self.select`
         extra_select, order_by, group_by = self.pre_sql_setup(with_col_aliases=False)
         opts = self.query.get_meta()
-        fields = [(f.db_column or f.attname) for f in opts.fields]
-
-        # any way to find the actual manager/queryset?
-        # this only checks whether the manager instance was _last used_ for a 
-        # query with cache.
-        cache_strategy = None
-        for m in opts.managers:
-            if isinstance(m, CacheableManager):
-                cache_strategy = m.cache_strategy
-
-        # TODO: pre_sql_setup probably has enough information to know when
-        # it's just a Count(*) and when it's SELECT a,b, count(c)
-        annotations = self.query.annotation_select
-        if annotations:
-            return AggregateStatement(opts.db_table, annotations, cache_strategy)
-
-        joins = []
-        for alias_name, alias in self.query.alias_map.items():
-            if not self.query.alias_refcount[alias_name]:
-                continue
-            if not isinstance(alias, Join):
-                # i guess?
-                continue
-            joins.append(alias)
-        st = SelectStatement(opts.db_table, fields, self.where, joins, cache_strategy)
-        return st
+        types = self.connection.converters
+        if self.having:
+            raise NotSupportedError("Filtering on aggregates is not supported")
+        if self.is_aggregation():
+            columns = [self.aggregate_path(expr) for expr, _, _ in self.select]
+            converters = [types.aggregate(opts.db_table, *path) for path in columns]
+            st = AggregateStatement(opts.db_table, columns, where_to_dict(self.where, self.query), None)
+        elif self.is_group_by():
+            if self._meta_ordering:
+                # Like Django, don't let Meta.ordering split the groups
+                order_by = []
+            columns = [
+                self.aggregate_path(expr) if expr.contains_aggregate else self.select_column(expr)
+                for expr, _, _ in self.select
+            ]
+            converters = [
+                types.aggregate(opts.db_table, *path) if expr.contains_aggregate else self.column_converter(types, expr)
+                for path, (expr, _, _) in zip(columns, self.select)
+            ]
+            by = []
+            for expr in self.query.group_by:
+                if not isinstance(expr, Col) or expr.alias != self.query.base_table:
+                    raise NotSupportedError(f"Grouping by {expr} is not supported")
+                by.append(expr.target.column)
+            st = GroupByStatement(
+                opts.db_table,
+                columns,
+                by,
+                where_to_dict(self.where, self.query),
+                None,
+                order_by=self.prisma_order_by(order_by),
+            )
+        else:
+            columns = [self.select_column(expr) for expr, _, _ in self.select]
+            converters = [self.column_converter(types, expr) for expr, _, _ in self.select]
+            distinct = None
+            if self.query.distinct:
+                distinct = self.distinct_fields(columns)
+            st = SelectStatement(
+                opts.db_table,
+                columns,
+                where_to_dict(self.where, self.query),
+                None,
+                opts.pk.column,
+                order_by=self.prisma_order_by(order_by),
+                distinct=distinct,
+            )
+        if any(converters):
+            st.converters = converters
+        return Plan(st, self.select, self.klass_info, self.annotation_col_map, self.has_extra_select)
+
+    def is_aggregation(self) -> bool:
+        # aggregate()/count() select nothing but aggregates over the whole table
+        return (
+            bool(self.select)
+            and self.query.group_by is None
+            and all(getattr(expr, "contains_aggregate", False) for expr, _, _ in self.select)
+        )
+
+    def is_group_by(self) -> bool:
+        # values(...).annotate(...); per-row relation counts stay on findMany
+        if not isinstance(self.query.group_by, tuple):
+            return False
+        aggregates = [expr for expr, _, _ in self.select if getattr(expr, "contains_aggregate", False)]
+        return bool(aggregates) and not any(isinstance(e, Count) and self.is_relation_count(e) for e in aggregates)
+
+    def aggregate_path(self, expr) -> ColumnPath:
+        # Sum("age") -> ("_sum", "age"); Prisma only aggregates the model's own columns
+        name = PRISMA_AGGREGATES.get(type(expr))
+        if name is None or expr.distinct or expr.filter is not None:
+            raise NotSupportedError(f"Aggregating with {expr} is not supported")
+        (source,) = expr.source_expressions
+        if isinstance(source, Ref):
+            source = source.source
+        match source:
+            case Star():
+                return (name, "_all")
+            case Col() if source.alias == self.query.base_table:
+                return (name, source.target.column)
+        raise NotSupportedError(f"Aggregating over {source} is not supported")
+
+    def select_column(self, expr) -> ColumnPath | Constant:
+        match expr:
+            case Col():
+                return (*self.relation_path(expr.alias), expr.target.column)
+            case Value():
+                return Constant(expr.value)
+            case Count() if self.is_relation_count(expr):
+                (col,) = expr.source_expressions
+                join = self.query.alias_map[col.alias]
+                return ("_count", join.join_field.name)
+        raise NotSupportedError(f"Selecting {expr} is not supported")
+
+    def column_converter(self, types: Converters, expr) -> Optional[ColumnConverter]:
+        if not isinstance(expr, Col):
+            return None
+        return types.column(expr.target.model._meta.db_table, expr.target.column)
+
+    def is_relation_count(self, expr: Count) -> bool:
+        # Count("pets") per row maps to Prisma's relation _count
+        if expr.distinct or expr.filter is not None:
+            return False
+        if len(expr.source_expressions) != 1:
+            return False
+        (col,) = expr.source_expressions
+        if not isinstance(col, Col) or not col.target.primary_key:
+            return False
+        join = self.query.alias_map.get(col.alias)
+        if not isinstance(join, Join) or join.join_field.concrete:
+            return False
+        if join.parent_alias != self.query.base_table:
+            return False
+        # Grouping must be per row of the base table
+        opts = self.query.get_meta()
+        return any(isinstance(e, Col) and e.alias == self.query.base_table and e.target == opts.pk for e, _, _ in self.select)
+
+    def relation_path(self, alias: str) -> list[str]:
+        # Relation fields leading from the base table to `alias`
+        path = []
+        join = self.query.alias_map[alias]
+        while isinstance(join, Join):
+            if not join.join_field.concrete:
+                raise NotSupportedError(f"Can't reach columns across to-many relation {join.join_field.name}")
+            path.append(join.join_field.name)
+            join = self.query.alias_map[join.parent_alias]
+        return list(reversed(path))
+
+    def prisma_order_by(self, order_by) -> list[dict[str, Any]]:
+        ret = []
+        for expr, _ in order_by:
+            col = expr.expression if isinstance(expr, OrderBy) else None
+            if isinstance(col, Ref):
+                # ordering by something that is also selected
+                col = col.source
+            if isinstance(col, Col):
+                path = (*self.relation_path(col.alias), col.target.column)
+            elif type(col) in PRISMA_AGGREGATES and self.is_group_by():
+                path = self.aggregate_path(col)
+            else:
+                raise NotSupportedError(f"Ordering by {expr} is not supported")
+            direction = "desc" if expr.descending else "asc"
+            if expr.nulls_first or expr.nulls_last:
+                direction = {"sort": direction, "nulls": "first" if expr.nulls_first else "last"}
+            item = direction
+            for key in reversed(path):
+                item = {key: item}
+            ret.append(item)
+        return ret
+
+    def distinct_fields(self, columns: list[ColumnPath | Constant]) -> Optional[list[str]]:
+        opts = self.query.get_meta()
+        if self.query.distinct_fields:
+            names = []
+            for name in self.query.distinct_fields:
+                if LOOKUP_SEP in name:
+                    raise NotSupportedError(f"Prisma can't apply distinct across relations: {name}")
+                names.append(opts.pk.column if name == "pk" else opts.get_field(name).column)
+            return names
+        if any(isinstance(c, tuple) and len(c) > 1 for c in columns):
+            raise NotSupportedError("Prisma can't apply distinct across relations")
+        fields = [c[0] for c in columns if isinstance(c, tuple)]
+        if opts.pk.column in fields:
+            # Rows are already unique
+            return None
+        return fields
 
     def field_as_sql(self, field, val):
         raise ValueError()
 
-    def execute_sql(self, result_type=MULTI, chunked_fetch=False, chunk_size=1024):
+    def timed_executable(self):
+        start = time.perf_counter()
         q = self.executable()
+        elapsed = time.perf_counter() - start
+        statements = q if isinstance(q, list) else [q]
+        for st in statements:
+            st.compile_time = elapsed / len(statements)
+        return q
+
+    def execute_statement(self, statement: Statement):
+        # Batches (and the async path) compile statements without sending
+        # them, then replay the query against the results they fetched.
+        if batch.recording():
+            raise batch.Recorded(statement)
+        found, result = batch.take_prefetched(statement)
+        if found:
+            return result
         c = self.connection.cursor()
-        res = c.execute(q)
+        return c.execute(statement)
+
+    def execute_chunked(self, select: SelectStatement, chunk_size: int):
+        arguments = select.statement["query"]["arguments"]
+        remaining = arguments.get("take")
+        skip = arguments.get("skip", 0)
+        cursor = None
+        while remaining is None or remaining > 0:
+            take = chunk_size if remaining is None else min(chunk_size, remaining)
+            (rows,) = self.execute_statement(PageStatement(select, take, cursor, skip))
+            if rows:
+                yield [row for row, _ in rows]
+            if len(rows) < take:
+                return
+            cursor = rows[-1][1]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def execute_sql(self, result_type=MULTI, chunked_fetch=False, chunk_size=1024):
+        q = self.timed_executable()
+        if chunked_fetch and result_type == MULTI and isinstance(q, SelectStatement):
+            # .iterator(): fetch page by page instead of the whole result
+            return self.execute_chunked(q, chunk_size)
+        res = self.execute_statement(q)
+        includes = getattr(self.query, "prisma_includes", None)
+        if includes and isinstance(q, SelectStatement) and result_type == MULTI:
+            # Django's iterables ignore the trailing values; PrismaQuerySet reads them here
+            (rows,) = res
+            self.query.prisma_included = [row[-len(includes):] for row in rows]
+        if isinstance(q, AggregateStatement):
+            # Always exactly one row
+            return res if result_type == SINGLE else [[res]]
+        if result_type == SINGLE and isinstance(q, (SelectStatement, GroupByStatement)):
+            (rows,) = res
+            return rows[0] if rows else None
         if res and result_type == SINGLE:
             assert len(res) == 1
             return res[0]
@@ -253,44 +773,146 @@ class SQLInsertCompiler(SelectSQLCompiler, BaseSQLInsertCompiler):
     def executable(self):
         opts = self.query.get_meta()
         fields = self.query.fields or [opts.pk]
-        assert len(self.query.objs) == 1
         values = [
             [self.prepare_value(field, self.pre_save_val(field, obj)) for field in fields] for obj in self.query.objs
         ]
-        values = values[0]
-        st = InsertStatement(opts.db_table, fields, values)
-        return [st, values]
+        if self.returning_fields:
+            # Only a single object can ask for its primary key back
+            assert len(values) == 1
+            st = InsertStatement(opts.db_table, fields, values[0], self.returning_fields)
+            types = self.connection.converters
+            converters = [types.column(f.model._meta.db_table, f.column) for f in self.returning_fields]
+            if any(converters):
+                st.converters = converters
+            return [st]
+
+        columns = [f.column for f in fields]
+        rows = [dict(zip(columns, row)) for row in values]
+        skip_duplicates = self.query.on_conflict == OnConflict.IGNORE
+        max_bytes = self.connection.max_payload_bytes
+        return [
+            CreateManyStatement(opts.db_table, chunk, skip_duplicates) for chunk in split_by_payload_size(rows, max_bytes)
+        ]
 
     def execute_sql(self, returning_fields=None):
-        print("retfields", returning_fields)
+        self.returning_fields = returning_fields
         with self.connection.cursor() as cursor:
-            st, _ = self.executable()
-            return cursor.execute(st)
-        # this is supposed to apply converters if returning
+            results = [cursor.execute(st) for st in self.timed_executable()]
+        if not returning_fields:
+            return []
+        return results[0]
 
 
 class SQLDeleteCompiler(SelectSQLCompiler, BaseSQLDeleteCompiler):
     """A wrapper class for compatibility with Django specifications."""
 
-    pass
+    def executable(self):
+        # Both the collector's fast deletes (a whole queryset, when no signals
+        # or cascades need the rows) and its per-batch pk__in deletes land here
+        opts = self.query.get_meta()
+        return DeleteStatement(opts.db_table, where_to_dict(self.query.where, self.query))
 
 
 class SQLUpdateCompiler(SelectSQLCompiler, BaseSQLUpdateCompiler):
     """A wrapper class for compatibility with Django specifications."""
-    def executable(self):
-        new_values = {}
+    def executable(self) -> list[UpdateStatement]:
         opts = self.query.get_meta()
+        data = {}
+        per_pk: dict[Any, dict[str, Any]] = {}
         for field, model, val in self.query.values:
-            val = field.get_db_prep_save(val, connection=self.connection)
-            new_values[field.name] = val
-        print(self.query.where, new_values)
-        return UpdateStatement(opts.db_table, new_values, self.query.where, [], None)
+            if hasattr(val, "resolve_expression"):
+                val = val.resolve_expression(self.query, allow_joins=False, for_save=True)
+            if isinstance(val, Cast):
+                (val,) = val.source_expressions
+            match val:
+                case Case():
+                    for pk, value in self.case_values(val):
+                        per_pk.setdefault(pk, {})[field.column] = field.get_db_prep_save(value, connection=self.connection)
+                    continue
+                case Value():
+                    val = val.value
+                case _ if hasattr(val, "resolve_expression"):
+                    raise NotSupportedError(f"Updating {field.name} to {val} is not supported")
+            data[field.column] = field.get_db_prep_save(val, connection=self.connection)
+        if not per_pk:
+            return [UpdateStatement(opts.db_table, data, where_to_dict(self.query.where, self.query), None)]
+
+        # bulk_update: objects that end up with the same values share a statement
+        where = where_to_dict(self.where_without_pk_in(), self.query)
+        groups: dict[str, tuple[dict[str, Any], list]] = {}
+        for pk, values in per_pk.items():
+            row = {**data, **values}
+            groups.setdefault(dumps(row), (row, []))[1].append(pk)
+        statements = []
+        for row, pks in groups.values():
+            pk_filter = {opts.pk.column: pks[0] if len(pks) == 1 else {"in": pks}}
+            statements.append(UpdateStatement(opts.db_table, row, merge([where, pk_filter]), None))
+        return statements
+
+    def case_values(self, case: Case) -> list[tuple[Any, Any]]:
+        # bulk_update's Case(When(pk=..., then=Value(...)), ...) as (pk, value) pairs
+        pk = self.query.get_meta().pk
+        ret = []
+        for when in case.cases:
+            condition = when.condition
+            if isinstance(condition, WhereNode) and len(condition.children) == 1 and not condition.negated:
+                (condition,) = condition.children
+            lhs = getattr(condition, "lhs", None)
+            if (
+                getattr(condition, "lookup_name", None) != "exact"
+                or getattr(lhs, "target", None) != pk
+                or not isinstance(when.result, Value)
+            ):
+                raise NotSupportedError(f"Updating with {case} is not supported")
+            ret.append((condition.rhs, when.result.value))
+        return ret
+
+    def where_without_pk_in(self) -> WhereNode:
+        # bulk_update filters on pk__in=[the whole batch]; every statement
+        # already names its own pks, so don't repeat the list in each one
+        where = self.query.where
+        if where.connector != AND or where.negated:
+            return where
+        pk = self.query.get_meta().pk
+        children = [
+            c for c in where.children
+            if not (getattr(c, "lookup_name", None) == "in" and getattr(c.lhs, "target", None) == pk)
+        ]
+        return WhereNode(children, AND)
+
+    def execute_sql(self, result_type):
+        statements = self.timed_executable()
+        if len(statements) == 1:
+            # A plain update(), which prisma_batch may be recording
+            return self.execute_statement(statements[0])
+        rows = 0
+        max_bytes = self.connection.max_payload_bytes
+        with self.connection.cursor() as cursor:
+            for chunk in split_by_payload_size(statements, max_bytes, lambda st: len(st.body)):
+                rows += sum(cursor.execute_many(chunk))
+        return rows
 
 
 class SQLAggregateCompiler(SelectSQLCompiler, BaseSQLAggregateCompiler):
     """A wrapper class for compatibility with Django specifications."""
 
-    pass
+    def executable(self):
+        # aggregate()/count() over a sliced queryset; Prisma's aggregate
+        # takes orderBy/take/skip itself, so no subquery is needed
+        inner = self.query.inner_query
+        if inner.distinct or inner.combinator or inner.group_by is not None or inner.where.contains_aggregate:
+            raise NotSupportedError("Aggregating over distinct, combined or grouped querysets is not supported")
+        compiler = inner.get_compiler(self.using, self.connection)
+        _, order_by, _ = compiler.pre_sql_setup(with_col_aliases=False)
+        columns = [compiler.aggregate_path(expr) for expr in self.query.annotation_select.values()]
+        where = where_to_dict(compiler.where, inner)
+        st = AggregateStatement(inner.get_meta().db_table, columns, where, None, order_by=compiler.prisma_order_by(order_by))
+        take = None
+        if inner.high_mark is not None:
+            take = inner.high_mark - inner.low_mark
+        st = st.bind(where, take, inner.low_mark, getattr(inner, "prisma_cache_strategy", None))
+        st.depends_on = depends_on(inner)
+        return st
 
 
 SQLCompiler = SelectSQLCompiler
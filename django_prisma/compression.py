@@ -0,0 +1,60 @@
+import dataclasses
+import gzip
+
+from typing import Any, Callable, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+
+# Request bodies smaller than this are sent as they are
+DEFAULT_COMPRESS_MIN_BYTES = 1024
+
+
+def _gzip() -> Callable[[bytes], bytes]:
+    return lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _brotli() -> Callable[[bytes], bytes]:
+    try:
+        import brotli
+    except ImportError:
+        import brotlicffi as brotli
+    return lambda data: brotli.compress(data, quality=5)
+
+
+def _zstd() -> Callable[[bytes], bytes]:
+    import zstandard
+
+    return lambda data: zstandard.compress(data, 3)
+
+
+# Content-Encoding -> factory of its compress function
+COMPRESSORS = {"gzip": _gzip, "br": _brotli, "zstd": _zstd}
+
+
+@dataclasses.dataclass(frozen=True)
+class Compression:
+    encoding: str
+    min_bytes: int
+    compress: Callable[[bytes], bytes]
+
+    @classmethod
+    def from_settings(cls, options: dict[str, Any]) -> Optional["Compression"]:
+        encoding = options.get("COMPRESSION")
+        if encoding is None:
+            return None
+        if encoding not in COMPRESSORS:
+            raise ImproperlyConfigured(f"COMPRESSION must be one of {', '.join(COMPRESSORS)}, not {encoding!r}")
+        try:
+            compress = COMPRESSORS[encoding]()
+        except ImportError as e:
+            raise ImproperlyConfigured(
+                f"{encoding} compression needs an extra package: pip install django-prisma[compression]"
+            ) from e
+        return cls(encoding, options.get("COMPRESS_MIN_BYTES", DEFAULT_COMPRESS_MIN_BYTES), compress)
+
+
+def compress_body(payload: bytes, compression: Optional[Compression]) -> tuple[bytes, dict[str, str]]:
+    # The request body, and the headers describing its encoding
+    if compression is None or len(payload) < compression.min_bytes:
+        return payload, {}
+    return compression.compress(payload), {"Content-Encoding": compression.encoding}
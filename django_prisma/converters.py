@@ -0,0 +1,154 @@
+import base64
+import datetime
+import decimal
+import functools
+import logging
+import operator
+import uuid
+
+from typing import Callable, Iterable, Optional, Sequence
+
+from lark.exceptions import LarkError
+
+from django_prisma.psl_parser import parse_prisma_schema
+from django_prisma.psl_types import PSL, BigInt, Bytes, DateTime, Decimal, Json, PSLColumn, String
+
+logger = logging.getLogger("django_prisma")
+
+# Takes every value of one column, returns them converted and in order
+ColumnConverter = Callable[[Sequence], Sequence]
+# Lazily maps a column's untagged values to Python ones
+Parser = Callable[[Iterable], Iterable]
+
+_value = operator.itemgetter("value")
+# Prisma sends every DateTime in UTC, as 2024-01-02T03:04:05.000Z
+_strip_z = operator.methodcaller("rstrip", "Zz")
+_as_utc = operator.methodcaller("replace", tzinfo=datetime.timezone.utc)
+_date_part = operator.itemgetter(slice(10))
+_time_part = operator.itemgetter(slice(11, None))
+
+
+def _aware_datetimes(values: Iterable) -> Iterable:
+    # fromisoformat only reads the Z itself from Python 3.11 on
+    return map(_as_utc, map(datetime.datetime.fromisoformat, map(_strip_z, values)))
+
+
+def _naive_datetimes(values: Iterable) -> Iterable:
+    # USE_TZ = False: naive values go out as UTC, and come back the same way
+    return map(datetime.datetime.fromisoformat, map(_strip_z, values))
+
+
+def _dates(values: Iterable) -> Iterable:
+    return map(datetime.date.fromisoformat, map(_date_part, values))
+
+
+def _times(values: Iterable) -> Iterable:
+    return map(datetime.time.fromisoformat, map(_strip_z, map(_time_part, values)))
+
+
+def _unchanged(values: Iterable) -> Iterable:
+    # Json: the value is the document as a string, JSONField loads it
+    return values
+
+
+def column_converter(parse: Parser) -> ColumnConverter:
+    """
+    Converts a whole column at once: one C-level map over its values rather
+    than a type dispatch per cell. The JSON protocol wraps typed values as
+    {"$type": "DateTime", "value": ...}, every value of a column alike.
+    """
+
+    def convert(values: Sequence) -> Sequence:
+        if None in values:
+            present = [v for v in values if v is not None]
+            converted = iter(convert(present))
+            return [None if v is None else next(converted) for v in values]
+        if values and isinstance(values[0], dict):
+            values = map(_value, values)
+        return list(parse(values))
+
+    return convert
+
+
+def parser(column: PSLColumn, use_tz: bool) -> Optional[Parser]:
+    # None for values that arrive as the Python value Django expects
+    if column.is_array:
+        return None
+    native = column.native_type
+    native = native.name if native else None
+    match column.type_:
+        case DateTime():
+            match native:
+                case "Date":
+                    return _dates
+                case "Time" | "Timetz":
+                    return _times
+            return _aware_datetimes if use_tz else _naive_datetimes
+        case BigInt():
+            return functools.partial(map, int)
+        case Decimal():
+            return functools.partial(map, decimal.Decimal)
+        case Bytes():
+            return functools.partial(map, base64.b64decode)
+        case Json():
+            return _unchanged
+        case String() if native == "Uuid":
+            return functools.partial(map, uuid.UUID)
+    return None
+
+
+class Converters:
+    """
+    Column converters for every model of a schema, worked out once from
+    its types. Compiled statements keep the ones for the columns they select.
+    """
+
+    def __init__(self, psl: PSL, use_tz: bool):
+        self.columns: dict[str, dict[str, PSLColumn]] = {}
+        self.converters: dict[str, dict[str, ColumnConverter]] = {}
+        for model in psl.models:
+            self.columns[model.name] = {c.name: c for c in model.columns}
+            converters = self.converters[model.name] = {}
+            for c in model.columns:
+                parse = parser(c, use_tz)
+                if parse is not None:
+                    converters[c.name] = column_converter(parse)
+
+    def column(self, model: str, column: str) -> Optional[ColumnConverter]:
+        return self.converters.get(model, {}).get(column)
+
+    def aggregate(self, model: str, name: str, column: str) -> Optional[ColumnConverter]:
+        # ("_avg", "price"): min, max and sum keep the column's type, avg is
+        # a plain float unless the column is a Decimal; counts are ints
+        match name:
+            case "_min" | "_max" | "_sum":
+                return self.column(model, column)
+            case "_avg":
+                c = self.columns.get(model, {}).get(column)
+                if c is not None and isinstance(c.type_, Decimal):
+                    return self.column(model, column)
+        return None
+
+
+NO_CONVERTERS = Converters(PSL([], [], None), True)
+
+
+@functools.lru_cache(maxsize=None)
+def load_converters(path: str, cache_dir: Optional[str] = None, use_tz: bool = True) -> Converters:
+    with open(path) as fd:
+        text = fd.read()
+    try:
+        psl = parse_prisma_schema(text, cache_dir)
+    except LarkError as e:
+        # Typed values are then handed to Django as Prisma sent them
+        logger.warning("Could not parse %s, values will not be converted: %s", path, e)
+        return NO_CONVERTERS
+    return Converters(psl, use_tz)
+
+
+def convert_columns(columns: list[Sequence], converters: list[Optional[ColumnConverter]]) -> list[tuple]:
+    # Rows out of whole columns, the typed ones converted first
+    for i, convert in enumerate(converters):
+        if convert is not None:
+            columns[i] = convert(columns[i])
+    return list(zip(*columns))
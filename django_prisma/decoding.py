@@ -0,0 +1,123 @@
+import itertools
+import json
+import operator
+import uuid
+
+from typing import Any, Callable, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _default(obj: Any) -> Any:
+    # What orjson writes on its own: UUIDField hands over uuid.UUID values
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, default=_default)
+
+
+def _segment(prefix: tuple[str, ...], fields: list[str]) -> Callable[[dict], tuple]:
+    get = operator.itemgetter(*fields)
+    if len(fields) == 1:
+        # itemgetter with a single key returns the bare value
+        single = get
+        get = lambda data: (single(data),)
+    if not prefix:
+        return get
+
+    missing = (None,) * len(fields)
+
+    def nested(data):
+        for relation in prefix:
+            data = data[relation]
+            if data is None:
+                # nullable relation
+                return missing
+        return get(data)
+
+    return nested
+
+
+def _constant(value: Any) -> Callable[[dict], tuple]:
+    value = (value,)
+    return lambda data: value
+
+
+def _concat(first, second):
+    return lambda data: first(data) + second(data)
+
+
+def row_extractor(columns: list) -> Callable[[dict], tuple]:
+    """
+    Build a function turning one Prisma result object into a row tuple.
+
+    `columns` holds paths (relation names, then a field) or Constants.
+    Consecutive fields under the same relation are read by one itemgetter,
+    so a flat select is a single C call per row.
+    """
+    segments = []
+    prefix = None
+    fields = []
+    for column in columns:
+        if not isinstance(column, tuple):
+            if fields:
+                segments.append(_segment(prefix, fields))
+                prefix, fields = None, []
+            segments.append(_constant(column.value))
+            continue
+        if fields and column[:-1] != prefix:
+            segments.append(_segment(prefix, fields))
+            fields = []
+        prefix = column[:-1]
+        fields.append(column[-1])
+    if fields:
+        segments.append(_segment(prefix, fields))
+
+    if not segments:
+        return lambda data: ()
+    extract = segments[0]
+    for segment in segments[1:]:
+        extract = _concat(extract, segment)
+    return extract
+
+
+def _column(column) -> Callable[[list[dict]], Sequence]:
+    if not isinstance(column, tuple):
+        value = column.value
+        return lambda results: itertools.repeat(value, len(results))
+    get = operator.itemgetter(column[-1])
+    if len(column) == 1:
+        return lambda results: list(map(get, results))
+    prefix = column[:-1]
+
+    def nested(data):
+        for relation in prefix:
+            data = data[relation]
+            if data is None:
+                return None
+        return get(data)
+
+    return lambda results: list(map(nested, results))
+
+
+def column_extractor(columns: list) -> Callable[[list[dict]], list[Sequence]]:
+    """
+    Like row_extractor, but reads every result at once into one sequence per
+    column, for columns that are converted a whole column at a time.
+    """
+    getters = [_column(column) for column in columns]
+    return lambda results: [get(results) for get in getters]
@@ -0,0 +1,246 @@
+import bisect
+import dataclasses
+import threading
+
+from typing import Any, Optional
+
+from django.dispatch import Signal
+
+from django_prisma.decoding import loads
+
+# Sent after every statement, including local cache hits, with
+# `alias` and `event` (a QueryEvent) as arguments.
+statement_executed = Signal()
+
+# Accelerate's `accelerate-info` cacheStatus -> ours
+CACHE_STATUSES = {"ttl": "hit", "swr": "stale", "miss": "miss", "none": "none"}
+
+
+@dataclasses.dataclass
+class QueryEvent:
+    model: str
+    action: str
+    # Seconds. Statements sent together in a batch share the serialize,
+    # network and decode times and the response size of the whole request.
+    compile_time: float
+    serialize_time: float
+    network_time: float
+    decode_time: float
+    response_bytes: int
+    # Rows returned, or affected for writes
+    rows: Optional[int]
+    # hit, stale, miss or none as reported by Accelerate; local when the
+    # result came out of the in-process response cache, coalesced when it
+    # was shared from an identical request in flight
+    cache_status: Optional[str]
+    batch_size: int = 1
+    # Request body before and after compression
+    request_bytes: int = 0
+    request_wire_bytes: int = 0
+    # Response body as received, before Content-Encoding was undone;
+    # None when the HTTP client doesn't say
+    response_wire_bytes: Optional[int] = None
+
+    @property
+    def request_compression(self) -> Optional[float]:
+        return self.request_wire_bytes / self.request_bytes if self.request_bytes else None
+
+    @property
+    def response_compression(self) -> Optional[float]:
+        if self.response_wire_bytes is None or not self.response_bytes:
+            return None
+        return self.response_wire_bytes / self.response_bytes
+
+
+def cache_status(response) -> Optional[str]:
+    info = response.headers.get("accelerate-info")
+    if not info:
+        return None
+    try:
+        status = loads(info).get("cacheStatus")
+    except (ValueError, AttributeError):
+        return None
+    return CACHE_STATUSES.get(status, status)
+
+
+def wire_bytes(response) -> Optional[int]:
+    if hasattr(response, "num_bytes_downloaded"):
+        # httpx
+        return response.num_bytes_downloaded
+    raw = getattr(response, "raw", None)
+    if raw is not None and hasattr(raw, "tell"):
+        # requests: the urllib3 response counts what came off the socket
+        return raw.tell()
+    return None
+
+
+def row_count(result: Any) -> Optional[int]:
+    match result:
+        case [list() as rows]:
+            return len(rows)
+        case int():
+            return result
+    return 1
+
+
+# Histogram upper bounds: 100µs to ~13s, 64B to 64MiB, and compressed/raw size
+TIME_BUCKETS = tuple(0.0001 * 2**i for i in range(18))
+SIZE_BUCKETS = tuple(2**i for i in range(6, 27))
+RATIO_BUCKETS = tuple(i / 20 for i in range(1, 21))
+
+
+class Histogram:
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        # The last bucket holds everything above the largest bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def percentile(self, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th percentile
+        if not self.count:
+            return None
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= q * self.count:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "buckets": dict(zip((*self.bounds, float("inf")), self.counts)),
+        }
+
+
+TIMINGS = ("compile_time", "serialize_time", "network_time", "decode_time")
+
+
+class Metrics:
+    """
+    In-memory histograms of QueryEvents, per model and action.
+
+        connection.metrics.snapshot()[("User", "findMany")]["network_time"]["p99"]
+    """
+
+    def __init__(self):
+        self.histograms: dict[tuple[str, str], dict[str, Histogram]] = {}
+        self.cache_statuses: dict[tuple[str, str], dict[Optional[str], int]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, event: QueryEvent):
+        key = (event.model, event.action)
+        with self.lock:
+            histograms = self.histograms.get(key)
+            if histograms is None:
+                histograms = {name: Histogram(TIME_BUCKETS) for name in TIMINGS}
+                histograms["response_bytes"] = Histogram(SIZE_BUCKETS)
+                histograms["rows"] = Histogram(SIZE_BUCKETS)
+                histograms["request_compression"] = Histogram(RATIO_BUCKETS)
+                histograms["response_compression"] = Histogram(RATIO_BUCKETS)
+                self.histograms[key] = histograms
+                self.cache_statuses[key] = {}
+            for name in TIMINGS:
+                histograms[name].observe(getattr(event, name))
+            histograms["response_bytes"].observe(event.response_bytes)
+            if event.rows is not None:
+                histograms["rows"].observe(event.rows)
+            for name in ("request_compression", "response_compression"):
+                ratio = getattr(event, name)
+                if ratio is not None:
+                    histograms[name].observe(ratio)
+            statuses = self.cache_statuses[key]
+            statuses[event.cache_status] = statuses.get(event.cache_status, 0) + 1
+
+    def snapshot(self) -> dict[tuple[str, str], dict[str, Any]]:
+        with self.lock:
+            return {
+                key: {
+                    **{name: h.snapshot() for name, h in histograms.items()},
+                    "cache_status": dict(self.cache_statuses[key]),
+                }
+                for key, histograms in self.histograms.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.cache_statuses.clear()
+
+
+_metrics: dict[str, Metrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def get_metrics(alias: str, enabled: bool) -> Optional[Metrics]:
+    if not enabled:
+        return None
+    with _metrics_lock:
+        if alias not in _metrics:
+            _metrics[alias] = Metrics()
+        return _metrics[alias]
+
+
+class Instrumentation:
+    # Handed to the cursors; called once per executed statement
+    def __init__(self, alias: str, metrics: Optional[Metrics] = None):
+        self.alias = alias
+        self.metrics = metrics
+
+    def __call__(self, event: QueryEvent):
+        if self.metrics is not None:
+            self.metrics.observe(event)
+        statement_executed.send(sender=Instrumentation, alias=self.alias, event=event)
+
+    def fetched(
+        self,
+        statements: list,
+        results: list,
+        response,
+        serialize_time: float,
+        network_time: float,
+        decode_time: float,
+        request_bytes: int = 0,
+        request_wire_bytes: int = 0,
+    ):
+        status = cache_status(response)
+        size = len(response.content)
+        received = wire_bytes(response)
+        for st, result in zip(statements, results):
+            self(
+                QueryEvent(
+                    st.statement["modelName"],
+                    st.statement["action"],
+                    st.compile_time,
+                    serialize_time,
+                    network_time,
+                    decode_time,
+                    size,
+                    row_count(result),
+                    status,
+                    len(statements),
+                    request_bytes,
+                    request_wire_bytes,
+                    received,
+                )
+            )
+
+    def cached_results(self, statements: list, results: list, missing: list[int], status: str = "local"):
+        # Served without a request of their own: by the local response cache,
+        # or by an identical one already in flight ("coalesced")
+        missing = set(missing)
+        for i, (st, result) in enumerate(zip(statements, results)):
+            if i in missing:
+                continue
+            statement = st.statement
+            self(QueryEvent(statement["modelName"], statement["action"], st.compile_time, 0.0, 0.0, 0.0, 0, row_count(result), status))
@@ -1,20 +1,166 @@
 import dataclasses
-from django.db import models
 
-@dataclasses.dataclass
+from typing import Any, Optional
+
+from asgiref.sync import sync_to_async
+from django.db import NotSupportedError, models
+from django.db.models import Prefetch
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.fields.related_descriptors import ManyToManyDescriptor, ReverseManyToOneDescriptor
+from django.db.models.query import ModelIterable
+
+from django_prisma import batch
+from django_prisma.batch import PrismaBatch
+
+@dataclasses.dataclass(frozen=True)
 class CacheStrategy:
+    # Seconds the result is fresh, then served stale while being refreshed
     ttl: int
     swr: int
+    # Labels to invalidate cached results by, e.g. ("users",)
+    tags: tuple[str, ...] = ()
 
-class CacheableManager(models.Manager):
-    def __init__(self):
-        self.cache_strategy = None
-        super().__init__()
+    def __post_init__(self):
+        object.__setattr__(self, "tags", tuple(self.tags))
+
+
+@dataclasses.dataclass
+class Include:
+    # A reverse foreign key prefetch fetched nested in its parents' rows
+    accessor: str
+    relation: str
+    queryset: Optional[models.QuerySet]
+    spec: dict[str, Any]
+
+
+class PrismaQuerySet(models.QuerySet):
+    def with_cache(self, cache_strategy: Optional[CacheStrategy]) -> "PrismaQuerySet":
+        # Kept on the query, so it survives chaining and is read by the compiler
+        clone = self._chain()
+        clone.query.prisma_cache_strategy = cache_strategy
+        return clone
+
+    def _fetch_all(self):
+        includes = None
+        if self._result_cache is None and self._prefetch_related_lookups and self._iterable_class is ModelIterable:
+            includes = self._prisma_includes()
+        if not includes:
+            return super()._fetch_all()
+        self.query.prisma_includes = {i.relation: i.spec for i in includes}
+        try:
+            results = list(self._iterable_class(self))
+            included = getattr(self.query, "prisma_included", [])
+        finally:
+            self.query.__dict__.pop("prisma_includes", None)
+            self.query.__dict__.pop("prisma_included", None)
+        self._result_cache = results
+        prefetched = {}
+        for n, include in enumerate(includes):
+            prefetched.update(self._included_results(include, [rows[n] for rows in included]))
+        # Django's own prefetching still wires up the caches; the statements
+        # it runs are answered with the nested rows instead of going out.
+        with batch.serving(prefetched):
+            super()._fetch_all()
+
+    def _prisma_includes(self) -> list[Include]:
+        # prefetch_related() over reverse foreign keys can come back nested in
+        # the main query, one level deep; anything else is prefetched as usual
+        includes = {}
+        for lookup in self._prefetch_related_lookups:
+            if not isinstance(lookup, Prefetch):
+                lookup = Prefetch(lookup)
+            accessor, _, rest = lookup.prefetch_through.partition(LOOKUP_SEP)
+            if accessor in includes:
+                continue
+            descriptor = getattr(self.model, accessor, None)
+            if not isinstance(descriptor, ReverseManyToOneDescriptor) or isinstance(descriptor, ManyToManyDescriptor):
+                continue
+            # The Prefetch queryset only applies to the last level
+            queryset = lookup.queryset if not rest else None
+            template = queryset if queryset is not None else descriptor.rel.related_model._default_manager.get_queryset()
+            if template.query.is_sliced:
+                continue
+            try:
+                statement = template.query.chain().get_compiler(self.db).executable()
+            except NotSupportedError:
+                continue
+            query = statement.statement["query"]
+            spec = {"arguments": query["arguments"], "selection": query["selection"]}
+            includes[accessor] = Include(accessor, descriptor.rel.name, queryset, spec)
+        return list(includes.values())
 
-    def get_queryset(self):
-        self.cache_strategy = None
-        return super().get_queryset()
+    def _included_results(self, include: Include, nested: list[list[dict]]) -> dict[str, list]:
+        # What the prefetch query Django is about to run would return
+        instances = []
+        related = []
+        seen = set()
+        for obj, rows in zip(self._result_cache, nested):
+            if obj.pk in seen:
+                continue
+            seen.add(obj.pk)
+            instances.append(obj)
+            related.extend(rows)
+        if not instances:
+            return {}
+        manager = getattr(instances[0], include.accessor)
+        querysets = None if include.queryset is None else [include.queryset]
+        statement, _ = batch.record(lambda: manager.get_prefetch_querysets(instances, querysets))
+        if statement is batch.NO_STATEMENT:
+            raise ValueError("Prefetching did not run a statement")
+        return {statement.body: [[statement.rows(related)]]}
+
+    def _nests_prefetches(self) -> bool:
+        # Whether every prefetch comes back nested in the main query, so that
+        # fetching runs that one statement and nothing after it
+        if not self._prefetch_related_lookups:
+            return True
+        if self._iterable_class is not ModelIterable:
+            return False
+        accessors = {include.accessor for include in self._prisma_includes()}
+        for lookup in self._prefetch_related_lookups:
+            through = lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup
+            if LOOKUP_SEP in through or through not in accessors:
+                return False
+        return True
+
+    # Django runs the async methods through sync_to_async; these compile the
+    # statement in place and await it on the async transport instead.
+    async def _aone(self, fn):
+        if not self._nests_prefetches():
+            # Django's prefetching runs its own statements on the sync cursor
+            return await sync_to_async(fn)()
+        batch = PrismaBatch(self.db)
+        item = batch.add(fn)
+        await batch.aexecute()
+        return item.result
+
+    def __aiter__(self):
+        async def generator():
+            if self._result_cache is None:
+                await self._aone(self._fetch_all)
+            for item in self._result_cache:
+                yield item
+
+        return generator()
+
+    async def aget(self, *args, **kwargs):
+        return await self._aone(lambda: self.get(*args, **kwargs))
+
+    async def acount(self):
+        return await self._aone(self.count)
+
+    async def afirst(self):
+        return await self._aone(self.first)
+
+    async def alast(self):
+        return await self._aone(self.last)
+
+    async def aaggregate(self, *args, **kwargs):
+        return await self._aone(lambda: self.aggregate(*args, **kwargs))
+
+
+class CacheableManager(models.Manager):
+    _queryset_class = PrismaQuerySet
 
-    def with_cache(self, cache_strategy: CacheStrategy):
-        self.cache_strategy = cache_strategy
-        return super().get_queryset()
+    def with_cache(self, cache_strategy: Optional[CacheStrategy]) -> PrismaQuerySet:
+        return self.get_queryset().with_cache(cache_strategy)
@@ -1,8 +1,19 @@
+import functools
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from typing import Optional
+
+from django_prisma import psl_types
 from django_prisma.psl_types import *
-from lark import Lark, Transformer
+from lark import Lark, Transformer, Tree
 
 grammar = """
-?start: (generator | datasource | model)+
+?start: (generator | datasource | model | enum)+
 
 generator: "generator" IDENTIFIER "{" generator_body "}"
 generator_body: (IDENTIFIER "=" STRING | IDENTIFIER "=" "[" string_list "]")*
@@ -10,43 +21,59 @@ generator_body: (IDENTIFIER "=" STRING | IDENTIFIER "=" "[" string_list "]")*
 datasource: "datasource" IDENTIFIER "{" datasource_body "}"
 datasource_body: (IDENTIFIER "=" STRING | IDENTIFIER "=" "env" "(" STRING ")")*
 
-model: "model" IDENTIFIER "{" (field | opt_field | arr_field | block_attributes)* "}"
+enum: "enum" IDENTIFIER "{" (enum_value | block_attribute)* "}"
+enum_value: IDENTIFIER attributes*
+
+model: "model" IDENTIFIER "{" (field | opt_field | arr_field | block_attribute)* "}"
 
 field: IDENTIFIER TYPE attributes*
 opt_field: IDENTIFIER TYPE "?" attributes*
 arr_field: IDENTIFIER TYPE "[" "]" attributes*
 
-block_attributes: unique_constraint
-unique_constraint: "@@unique" "(" "[" identifier_list "]" ")"
+// @@unique([a, b]), @@index(...), @@map(...): only @@unique is kept
+block_attribute: "@@" IDENTIFIER "(" [args] ")"
 
-attributes: "@" IDENTIFIER
-          | "@" IDENTIFIER "(" STRING ")"
-          | "@" IDENTIFIER "(" IDENTIFIER ")"
-          | "@" IDENTIFIER "(" IDENTIFIER "(" ")" ")"
-          | "@" "default" "(" default_body ")"
-          | "@" "relation" "(" relation_body ")"
-          | "@" "relation" "(" relation_body ")"
+// @id, @default(now()), @relation(fields: [a], references: [id], onDelete: Cascade), ...
+attributes: "@" IDENTIFIER ["(" args ")"]
+          | native_type
 
-relation_body: IDENTIFIER ":" "[" identifier_list "]" "," IDENTIFIER ":" "[" identifier_list "]"
-default_body: IDENTIFIER "(" ")"
+native_type: "@" IDENTIFIER "." IDENTIFIER ["(" native_args ")"]
+native_args: (NUMBER | STRING | IDENTIFIER) ("," (NUMBER | STRING | IDENTIFIER))*
+
+args: arg ("," arg)*
+?arg: IDENTIFIER ":" value -> named_arg
+    | value
+?value: NUMBER | STRING | IDENTIFIER
+      | IDENTIFIER "(" [args] ")" -> call
+      | "[" [values] "]" -> array
+values: value ("," value)*
 
 string_list: STRING ("," STRING)*
-identifier_list: IDENTIFIER ("," IDENTIFIER)*
 
 TYPE: IDENTIFIER
 IDENTIFIER: /[a-zA-Z_][a-zA-Z0-9_]*/
-STRING: /"[^"]*"/
+STRING: /"(\\\\.|[^"\\\\])*"/
+NUMBER: /-?[0-9]+([.][0-9]+)?/
 ARRAY: "[" "]"
 OPTIONAL: "?"
 
 %import common.WS
+%import common.CPP_COMMENT
 %ignore WS
+%ignore CPP_COMMENT
 """
 
 
+@dataclasses.dataclass
+class Call:
+    # A function call in an attribute's arguments, e.g. dbgenerated("...")
+    name: str
+    args: list
+
+
 class PSLTransformer(Transformer):
-    identifier_list = list
     string_list = list
+    values = list
 
     def model(self, items):
         name, *cols_and_constraints = items
@@ -56,48 +83,95 @@ class PSLTransformer(Transformer):
             match item:
                 case CompoundUniqueConstraint(_):
                     constraints.append(item)
-                case _:
+                case PSLColumn():
                     cols.append(item)
         return PSLModel(name, cols, constraints)
 
-    def unique_constraint(self, items):
-        return CompoundUniqueConstraint(list(items))
+    def block_attribute(self, items):
+        name, args = items
+        match name, args:
+            case "unique", [list(fields), *_]:
+                # Fields may come with options, as in name(sort: Desc)
+                return CompoundUniqueConstraint([f.name if isinstance(f, Call) else f for f in fields])
+        return None
 
     def attributes(self, items):
-        ret = []
-        for item in items:
-            match item:
-                case "id":
-                    ret.append(AttributePK())
-                case "unique":
-                    ret.append(AttributeUnique())
-                case AttributeDefaultAutoinc():
-                    ret.append(item)
-                case _:
-                    ret.append(item)
-        return ret
-
-    def default_body(self, items):
-        item = items[0]
-        match item:
-            case "autoincrement":
+        match items:
+            case [Attribute() as native]:
+                return [native]
+            case ["id", _]:
+                return [AttributePK()]
+            case ["unique", _]:
+                return [AttributeUnique()]
+            case ["updatedAt", _]:
+                return [AttributeUpdatedAt()]
+            case ["default", [value, *_]]:
+                default = self.default(value)
+                return [] if default is None else [default]
+            case ["relation", args]:
+                return self.relation(args)
+        # @map, @ignore, @db-less attributes Django has no use for
+        return []
+
+    def default(self, value) -> Optional[Attribute]:
+        match value:
+            case Call("autoincrement"):
                 return AttributeDefaultAutoinc()
-            case _:
-                assert False, f"Did not deal with {item}"
+            case Call("now"):
+                return AttributeDefaultNow()
+            case Call(name):
+                return AttributeDefaultFunction(name)
+            case list():
+                # Scalar list defaults, e.g. @default([]), are left to the database
+                return None
+        return AttributeDefaultValue(str(value))
 
-    def relation_body(self, items):
-        pairs = {items[i]: items[i + 1] for i in range(0, len(items), 2)}
-        local = pairs["fields"]
-        remote = pairs["references"]
-        return AttributeRelation(local_field_name=local, remote_field_name=remote)
+    def relation(self, args) -> list[Attribute]:
+        named = dict(arg for arg in args if isinstance(arg, tuple))
+        if "fields" not in named:
+            # The side of the relation without the foreign key
+            return []
+        return [AttributeRelation(named["fields"], named["references"], named.get("onDelete"))]
+
+    def args(self, items):
+        return list(items)
+
+    def named_arg(self, items):
+        name, value = items
+        return (name, value)
+
+    def call(self, items):
+        name, args = items
+        return Call(name, args or [])
+
+    def array(self, items):
+        (values,) = items
+        return values or []
+
+    def native_type(self, items):
+        namespace, name, args = items
+        assert namespace == "db", f"Did not deal with @{namespace}.{name}"
+        return AttributeNative(name, args or [])
+
+    def native_args(self, items):
+        return [str(item) for item in items]
+
+    def enum(self, items):
+        name, *values = items
+        return PSLEnum(name, [v for v in values if v is not None])
+
+    def enum_value(self, items):
+        return items[0]
 
     def opt_field(self, items):
         name, type_, *modifiers = items
-        return PSLColumn(name, type_, props=modifiers, is_array=False, is_opt=True)
+        flattened_modifiers = [item for sublist in modifiers for item in sublist]
+        return PSLColumn(name, type_, props=flattened_modifiers, is_array=False, is_opt=True)
 
     def arr_field(self, items):
         name, type_, *modifiers = items
-        return PSLColumn(name, type_, props=modifiers, is_array=True, is_opt=False)
+        flattened_modifiers = [item for sublist in modifiers for item in sublist]
+        return PSLColumn(name, type_, props=flattened_modifiers, is_array=True, is_opt=False)
 
     def field(self, items):
         name, type_, *modifiers = items
@@ -108,37 +182,134 @@ class PSLTransformer(Transformer):
         return str(items)
 
     def TYPE(self, items):
-        match items:
-            case "Int":
-                return Int()
-            case "String":
-                return String()
-            case _:
-                return UserDefinedType(str(items))
+        scalar = SCALARS.get(str(items))
+        if scalar is not None:
+            return scalar()
+        # A model or an enum; enums are told apart once the whole schema is read
+        return UserDefinedType(str(items))
+
+
+@functools.lru_cache(maxsize=None)
+def get_parser(cache_dir: Optional[str] = None) -> Lark:
+    # Built on first use rather than at import. With `cache_dir`, lark keeps
+    # the LALR tables there, so later processes skip the grammar analysis.
+    # They are pickled: never in a shared directory such as the temp dir.
+    cache = False
+    if cache_dir is not None:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        cache = os.path.join(cache_dir, f"lark-{code_fingerprint()}.tables")
+    return Lark(grammar, parser="lalr", transformer=PSLTransformer(), cache=cache)
+
+
+@functools.lru_cache(maxsize=None)
+def code_fingerprint() -> str:
+    # Parsed schemas stored on disk are only valid for this grammar, this
+    # transformer and these types
+    digest = hashlib.sha256()
+    for path in (__file__, psl_types.__file__):
+        with open(path, "rb") as fd:
+            digest.update(fd.read())
+    return digest.hexdigest()[:16]
+
+
+# Schema hash -> its PSL; the same PSL object is handed to every caller
+_parsed: dict[str, PSL] = {}
+_parsed_lock = threading.Lock()
+
 
+def parse_prisma_schema(text: str, cache_dir: Optional[str] = None) -> PSL:
+    """
+    Parses a schema once per process, and with `cache_dir`, once per schema
+    and version of this module, keeping the result as JSON named after the
+    schema's hash. The result is shared: do not modify it.
+    """
+    key = hashlib.sha256(text.encode()).hexdigest()
+    with _parsed_lock:
+        psl = _parsed.get(key)
+    if psl is not None:
+        return psl
+    path = None if cache_dir is None else os.path.join(cache_dir, f"{key}-{code_fingerprint()}.json")
+    if path is not None:
+        psl = _load(path)
+    if psl is None:
+        psl = _parse(text, cache_dir)
+        if path is not None:
+            _store(path, psl)
+    with _parsed_lock:
+        return _parsed.setdefault(key, psl)
 
-_parser = Lark(grammar, parser="lalr", transformer=PSLTransformer())
 
+def _encode(value):
+    # Dataclasses as objects tagged with their class name
+    if dataclasses.is_dataclass(value):
+        fields = {f.name: _encode(getattr(value, f.name)) for f in dataclasses.fields(value)}
+        return {"$type": type(value).__name__, **fields}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    return value
 
-def parse_prisma_schema(text: str) -> PSL:
-    result = _parser.parse(text)
+
+def _decode(value):
+    # Only ever builds the dataclasses of psl_types, whatever the file says
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if isinstance(value, dict):
+        fields = {k: _decode(v) for k, v in value.items() if k != "$type"}
+        cls = vars(psl_types).get(value.get("$type"))
+        if not isinstance(cls, type) or not dataclasses.is_dataclass(cls):
+            raise ValueError(f"Not a schema type: {value.get('$type')!r}")
+        return cls(**fields)
+    return value
+
+
+def _load(path: str) -> Optional[PSL]:
+    try:
+        with open(path, "rb") as fd:
+            psl = _decode(json.load(fd))
+    except Exception:
+        # Missing, truncated or otherwise unreadable: parse it again
+        return None
+    return psl if isinstance(psl, PSL) else None
+
+
+def _store(path: str, psl: PSL):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Renamed into place, so that concurrent readers never see half a file
+    fd, tmp = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, "w") as f:
+        json.dump(_encode(psl), f)
+    os.replace(tmp, path)
+
+
+def _parse(text: str, cache_dir: Optional[str] = None) -> PSL:
+    result = get_parser(cache_dir).parse(text)
+    # `?start` inlines a schema holding a single block
+    children = result.children if isinstance(result, Tree) else [result]
     datasources = []
     models = []
+    enums = []
     generator = None
-    for child in result.children:
+    for child in children:
         match child:
             case PSLModel(_):
                 models.append(child)
+            case PSLEnum(_):
+                enums.append(child)
             case PSLDatasource(_):
                 datasources.append(child)
             case PSLGenerator(_):
                 assert generator is None
                 generator = child
-    return PSL(models, datasources, generator)
+    by_name = {enum.name: enum for enum in enums}
+    for model in models:
+        for column in model.columns:
+            match column.type_:
+                case UserDefinedType(name) if name in by_name:
+                    column.type_ = EnumType(name, by_name[name].values)
+    return PSL(models, datasources, generator, enums)
 
 
 if __name__ == "__main__":
     import sys
-    models = parse_prisma_schema(open(sys.argv[1]).read()).models
-    for model in models:
-        print(model.to_django_model())
+    print(parse_prisma_schema(open(sys.argv[1]).read()).to_django_models())
@@ -28,6 +28,53 @@ class String(PSLType):
     pass
 
 
+@dataclasses.dataclass
+class Boolean(PSLType):
+    pass
+
+
+@dataclasses.dataclass
+class BigInt(PSLType):
+    pass
+
+
+@dataclasses.dataclass
+class Float(PSLType):
+    pass
+
+
+@dataclasses.dataclass
+class Decimal(PSLType):
+    pass
+
+
+@dataclasses.dataclass
+class DateTime(PSLType):
+    pass
+
+
+@dataclasses.dataclass
+class Json(PSLType):
+    pass
+
+
+@dataclasses.dataclass
+class Bytes(PSLType):
+    pass
+
+
+@dataclasses.dataclass
+class EnumType(PSLType):
+    # A UserDefinedType naming one of the schema's enums
+    name: str
+    values: list[str]
+
+
+SCALARS = {
+    t.__name__: t for t in (Int, String, Boolean, BigInt, Float, Decimal, DateTime, Json, Bytes)
+}
+
+
 @dataclasses.dataclass
 class Attribute:
     pass
@@ -53,38 +100,133 @@ class AttributeDefaultAutoinc(Attribute):
     pass
 
 
+@dataclasses.dataclass
+class AttributeDefaultNow(Attribute):
+    pass
+
+
+@dataclasses.dataclass
+class AttributeDefaultFunction(Attribute):
+    # uuid(), cuid(), dbgenerated() and the like: the database fills it in
+    name: str
+
+
+@dataclasses.dataclass
+class AttributeDefaultValue(Attribute):
+    # As written in the schema: 0, 1.5, "text", true, or an enum value
+    value: str
+
+
+@dataclasses.dataclass
+class AttributeUpdatedAt(Attribute):
+    pass
+
+
+@dataclasses.dataclass
+class AttributeNative(Attribute):
+    # @db.VarChar(255) -> AttributeNative("VarChar", ["255"])
+    name: str
+    args: list[str]
+
+
 @dataclasses.dataclass
 class AttributeRelation(Attribute):
     local_field_name: list[str]
     remote_field_name: list[str]
+    # Referential action, e.g. "Cascade"; None is Prisma's default
+    on_delete: Optional[str] = None
+
+
+# Prisma's referential actions, as Django's on_delete handlers
+ON_DELETE = {
+    "Cascade": "CASCADE",
+    "Restrict": "PROTECT",
+    "NoAction": "DO_NOTHING",
+    "SetNull": "SET_NULL",
+    "SetDefault": "SET_DEFAULT",
+}
 
 
 @dataclasses.dataclass
 class PSLColumn:
     name: str
-    type_: Int | String | UserDefinedType
+    type_: PSLType
     props: list[Attribute]
     is_array: bool
     is_opt: bool
 
+    @property
+    def native_type(self) -> Optional[AttributeNative]:
+        for p in self.props:
+            if isinstance(p, AttributeNative):
+                return p
+        return None
+
     @property
     def django_type(self) -> str:
+        native = self.native_type
+        native = native.name if native else None
         match self.type_:
             case Int():
                 if AttributeDefaultAutoinc() in self.props:
                     return "models.AutoField"
                 return f"models.IntegerField"
+            case BigInt():
+                if AttributeDefaultAutoinc() in self.props:
+                    return "models.BigAutoField"
+                return "models.BigIntegerField"
             case String():
+                match native:
+                    case "Text":
+                        return "models.TextField"
+                    case "Uuid":
+                        return "models.UUIDField"
                 return f"models.CharField"
+            case Boolean():
+                return "models.BooleanField"
+            case Float():
+                return "models.FloatField"
+            case Decimal():
+                return "models.DecimalField"
+            case DateTime():
+                match native:
+                    case "Date":
+                        return "models.DateField"
+                    case "Time" | "Timetz":
+                        return "models.TimeField"
+                return "models.DateTimeField"
+            case Json():
+                return "models.JSONField"
+            case Bytes():
+                return "models.BinaryField"
+            case EnumType(_):
+                return "models.CharField"
             case UserDefinedType(_):
                 return "models.ForeignKey"
 
     @property
     def django_field_props(self) -> str:
         props = []
+        match self.type_:
+            case EnumType(_, values):
+                choices = ", ".join(f'("{v}", "{v}")' for v in values)
+                props.append(f"choices=[{choices}]")
         for p in self.props:
             match p:
-                case AttributeDefaultAutoinc():
+                case AttributeDefaultAutoinc() | AttributeDefaultFunction(_):
+                    continue
+                case AttributeDefaultNow():
+                    props.append("default=timezone.now")
+                case AttributeUpdatedAt():
+                    props.append("auto_now=True")
+                case AttributeDefaultValue(value):
+                    props.append(f"default={self.python_default(value)}")
+                case AttributeNative("VarChar" | "Char", [length]):
+                    props.append(f"max_length={length}")
+                case AttributeNative("Decimal", [digits, places]):
+                    props.append(f"max_digits={digits}")
+                    props.append(f"decimal_places={places}")
+                case AttributeNative(_):
                     continue
                 case AttributePK():
                     props.append("primary_key=True")
@@ -92,7 +234,7 @@ class PSLColumn:
                     props.append("unique=True")
                 case AttributeRelation(_):
                     props.append(f'to={self.type_.name}')
-                    props.append('on_delete=models.CASCADE')
+                    props.append(f'on_delete=models.{ON_DELETE.get(p.on_delete, "CASCADE")}')
                     props.append(f'db_column="{p.local_field_name[0]}"')
                 case _:
                     assert False, p
@@ -102,6 +244,28 @@ class PSLColumn:
 
         return ", ".join(props)
 
+    def python_default(self, value: str) -> str:
+        match self.type_:
+            case Boolean():
+                return "True" if value == "true" else "False"
+            case EnumType(_):
+                return f'"{value}"'
+            case Decimal():
+                return f'decimal.Decimal("{value}")'
+        return value
+
+    @property
+    def imports(self) -> set[str]:
+        # What the rendered field refers to, besides django.db.models
+        imports = set()
+        for p in self.props:
+            match p:
+                case AttributeDefaultNow():
+                    imports.add("from django.utils import timezone")
+                case AttributeDefaultValue(_) if isinstance(self.type_, Decimal):
+                    imports.add("import decimal")
+        return imports
+
     def to_django_model(self) -> str:
         return f"{self.name} = {self.django_type}({self.django_field_props})"
 
@@ -149,6 +313,12 @@ class {self.name}(models.Model):
 """
 
 
+@dataclasses.dataclass
+class PSLEnum:
+    name: str
+    values: list[str]
+
+
 @dataclasses.dataclass
 class PSLDatasource:
     pass
@@ -164,3 +334,15 @@ class PSL:
     models: list[PSLModel]
     datasources: list[PSLDatasource]
     generator: Optional[PSLGenerator]
+    enums: list[PSLEnum] = dataclasses.field(default_factory=list)
+
+    def to_django_models(self) -> str:
+        # A whole models.py: the imports the fields need, then every model
+        imports = {"from django.db import models"}
+        for model in self.models:
+            for column in model._columns_to_represent_in_django():
+                imports |= column.imports
+        modules = sorted(i for i in imports if i.startswith("import "))
+        names = sorted(i for i in imports if i.startswith("from "))
+        header = "\n\n".join("\n".join(group) for group in (modules, names) if group)
+        return header + "\n\n" + "\n".join(model.to_django_model() for model in self.models)
@@ -0,0 +1,256 @@
+import asyncio
+import collections
+import concurrent.futures
+import dataclasses
+import random
+import threading
+import time
+
+from typing import Any, Awaitable, Callable, Optional
+
+# Statements that can safely be sent twice
+READ_ACTIONS = {"findMany", "findFirst", "findUnique", "aggregate", "groupBy", "count"}
+# Answers that say nothing about the statement itself
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+@dataclasses.dataclass(frozen=True)
+class RetryPolicy:
+    # Extra attempts for reads; writes only ever get one
+    retries: int = 2
+    # Seconds; the n-th retry waits up to backoff * 2**n, capped at max_backoff
+    backoff: float = 0.05
+    max_backoff: float = 1.0
+    # Seconds a statement may take in total, retries and backoff included
+    deadline: Optional[float] = None
+    # Send a second copy of a read that is slower than this percentile of
+    # recent reads of the same shape, and use whichever answers first
+    hedge_percentile: Optional[float] = None
+    # Threads per alias that run hedged reads; past that, reads are sent
+    # from the calling thread without a hedge
+    hedge_workers: int = 8
+
+    @classmethod
+    def from_settings(cls, options: dict[str, Any]) -> "RetryPolicy":
+        defaults = cls()
+        return cls(
+            retries=options.get("RETRIES", defaults.retries),
+            backoff=options.get("RETRY_BACKOFF", defaults.backoff),
+            max_backoff=options.get("RETRY_BACKOFF_MAX", defaults.max_backoff),
+            deadline=options.get("DEADLINE", defaults.deadline),
+            hedge_percentile=options.get("HEDGE_PERCENTILE", defaults.hedge_percentile),
+            hedge_workers=options.get("HEDGE_WORKERS", defaults.hedge_workers),
+        )
+
+    def backoff_delay(self, attempt: int) -> float:
+        # Full jitter, so that clients that failed together retry apart
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+
+class LatencyTracker:
+    """Recent response times per statement shape, to pick when to hedge."""
+
+    def __init__(self, size: int = 256, min_samples: int = 20):
+        self.size = size
+        self.min_samples = min_samples
+        self.samples: dict[tuple, collections.deque] = {}
+        self.lock = threading.Lock()
+
+    def record(self, key: tuple, seconds: float):
+        with self.lock:
+            samples = self.samples.get(key)
+            if samples is None:
+                samples = self.samples[key] = collections.deque(maxlen=self.size)
+            samples.append(seconds)
+
+    def percentile(self, key: tuple, q: float) -> Optional[float]:
+        with self.lock:
+            samples = self.samples.get(key)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def is_read(statements: list) -> bool:
+    return all(st.statement["action"] in READ_ACTIONS for st in statements)
+
+
+def shape(statements: list) -> tuple:
+    return tuple((st.statement["modelName"], st.statement["action"]) for st in statements)
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise TimeoutError("Statement deadline exceeded")
+    return left
+
+
+def retryable(response) -> bool:
+    return response.status_code in RETRYABLE_STATUSES
+
+
+def answered(future) -> bool:
+    # A finished attempt whose response can be used as is
+    return future.exception() is None and not retryable(future.result())
+
+
+def settle(finished: list):
+    # Every copy of a hedged read is back and none answered: a response,
+    # which call() may retry, over an error; raise only if all of them failed
+    for future in finished:
+        if future.exception() is None:
+            return future.result()
+    return finished[0].result()
+
+
+class Retrier:
+    """
+    Runs one request with the policy's deadline, retries and hedging.
+    `attempt(timeout)` sends the request, giving up after `timeout` seconds
+    (None: the transport's own timeouts), and returns the response.
+    """
+
+    def __init__(self, policy: RetryPolicy, latencies: Optional[LatencyTracker] = None):
+        self.policy = policy
+        self.latencies = latencies or LatencyTracker()
+        # Only started once a read is first hedged
+        self.executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.executor_lock = threading.Lock()
+        self.hedge_slots = threading.BoundedSemaphore(policy.hedge_workers)
+
+    def hedge_delay(self, statements: list) -> Optional[float]:
+        if self.policy.hedge_percentile is None:
+            return None
+        return self.latencies.percentile(shape(statements), self.policy.hedge_percentile)
+
+    def call(self, attempt: Callable[[Optional[float]], Any], statements: list, errors: tuple) -> Any:
+        policy = self.policy
+        deadline = None if policy.deadline is None else time.monotonic() + policy.deadline
+        read = is_read(statements)
+        retries = policy.retries if read else 0
+        n = 0
+        while True:
+            timeout = remaining(deadline)
+            delay = self.hedge_delay(statements) if read else None
+            start = time.monotonic()
+            try:
+                if delay is None:
+                    response = attempt(timeout)
+                else:
+                    response = self.hedged(attempt, timeout, delay)
+            except errors:
+                if n >= retries:
+                    raise
+            else:
+                if read:
+                    self.latencies.record(shape(statements), time.monotonic() - start)
+                if n >= retries or not retryable(response):
+                    return response
+            pause = policy.backoff_delay(n)
+            if deadline is not None and time.monotonic() + pause >= deadline:
+                raise TimeoutError("Statement deadline exceeded")
+            time.sleep(pause)
+            n += 1
+
+    def submit(self, attempt: Callable[[Optional[float]], Any], timeout: Optional[float]):
+        # None when every hedging thread is busy
+        if not self.hedge_slots.acquire(blocking=False):
+            return None
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(
+                    self.policy.hedge_workers, thread_name_prefix="prisma-hedge"
+                )
+        future = self.executor.submit(attempt, timeout)
+        future.add_done_callback(lambda _: self.hedge_slots.release())
+        return future
+
+    def hedged(self, attempt: Callable[[Optional[float]], Any], timeout: Optional[float], delay: float) -> Any:
+        first = self.submit(attempt, timeout)
+        if first is None:
+            return attempt(timeout)
+        try:
+            return first.result(timeout=delay)
+        except concurrent.futures.TimeoutError:
+            pass
+        second = self.submit(attempt, timeout)
+        if second is None:
+            return first.result()
+        # The slower request keeps going in the background; its answer is dropped
+        pending = {first, second}
+        finished = []
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            finished.extend(done)
+            for future in done:
+                if answered(future):
+                    return future.result()
+        return settle(finished)
+
+    async def acall(self, attempt: Callable[[Optional[float]], Awaitable[Any]], statements: list, errors: tuple) -> Any:
+        policy = self.policy
+        deadline = None if policy.deadline is None else time.monotonic() + policy.deadline
+        read = is_read(statements)
+        retries = policy.retries if read else 0
+        n = 0
+        while True:
+            timeout = remaining(deadline)
+            delay = self.hedge_delay(statements) if read else None
+            start = time.monotonic()
+            try:
+                if delay is None:
+                    response = await attempt(timeout)
+                else:
+                    response = await self.ahedged(attempt, timeout, delay)
+            except errors:
+                if n >= retries:
+                    raise
+            else:
+                if read:
+                    self.latencies.record(shape(statements), time.monotonic() - start)
+                if n >= retries or not retryable(response):
+                    return response
+            pause = policy.backoff_delay(n)
+            if deadline is not None and time.monotonic() + pause >= deadline:
+                raise TimeoutError("Statement deadline exceeded")
+            await asyncio.sleep(pause)
+            n += 1
+
+    async def ahedged(
+        self, attempt: Callable[[Optional[float]], Awaitable[Any]], timeout: Optional[float], delay: float
+    ) -> Any:
+        first = asyncio.ensure_future(attempt(timeout))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        pending = {first, asyncio.ensure_future(attempt(timeout))}
+        finished = []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                finished.extend(done)
+                for task in done:
+                    if answered(task):
+                        return task.result()
+            return settle(finished)
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+_retriers: dict[str, Retrier] = {}
+_retriers_lock = threading.Lock()
+
+
+def get_retrier(alias: str, policy: RetryPolicy) -> Retrier:
+    with _retriers_lock:
+        retrier = _retriers.get(alias)
+        if retrier is None or retrier.policy != policy:
+            if retrier is not None and retrier.executor is not None:
+                retrier.executor.shutdown(wait=False)
+            retrier = _retriers[alias] = Retrier(policy)
+        return retrier
@@ -0,0 +1,64 @@
+import base64
+import dataclasses
+import functools
+import hashlib
+import os
+import threading
+
+from typing import Optional
+
+
+@dataclasses.dataclass(frozen=True)
+class Schema:
+    inline: bytes
+    id: str
+
+
+@functools.lru_cache(maxsize=None)
+def load_schema(path: str) -> Schema:
+    # Read and hashed once per process, the first time a query needs it
+    with open(path, "rb") as fd:
+        # https://github.com/prisma/prisma/blob/eb9ef4d623765df76c73d8ff5ced51f747168bec/packages/client/src/generation/utils/buildInlineSchema.ts#L13
+        inline = base64.b64encode(fd.read())
+    return Schema(inline, hashlib.sha256(inline).hexdigest())
+
+
+class SchemaRegistry:
+    """
+    Schema ids Accelerate already knows about. Kept in-process, and when
+    `cache_dir` is set, as empty marker files named after the schema id so
+    that new processes skip the upload too.
+    """
+
+    def __init__(self):
+        self.registered: set[str] = set()
+        self.lock = threading.Lock()
+
+    def is_registered(self, schema_id: str, cache_dir: Optional[str] = None) -> bool:
+        with self.lock:
+            if schema_id in self.registered:
+                return True
+        if cache_dir is not None and os.path.exists(os.path.join(cache_dir, schema_id)):
+            with self.lock:
+                self.registered.add(schema_id)
+            return True
+        return False
+
+    def mark_registered(self, schema_id: str, cache_dir: Optional[str] = None):
+        with self.lock:
+            self.registered.add(schema_id)
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            open(os.path.join(cache_dir, schema_id), "a").close()
+
+    def forget(self, schema_id: str, cache_dir: Optional[str] = None):
+        with self.lock:
+            self.registered.discard(schema_id)
+        if cache_dir is not None:
+            try:
+                os.remove(os.path.join(cache_dir, schema_id))
+            except FileNotFoundError:
+                pass
+
+
+registry = SchemaRegistry()
@@ -0,0 +1,93 @@
+import asyncio
+import dataclasses
+import threading
+import weakref
+
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+@dataclasses.dataclass
+class Flight:
+    done: threading.Event = dataclasses.field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses identical reads that are in flight at the same time into one
+    request, whose result every caller gets. Threads share with threads,
+    coroutines with coroutines on the same event loop.
+    """
+
+    def __init__(self):
+        self.flights: dict[Hashable, Flight] = {}
+        self.async_flights = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+        # Requests sent, and callers that waited on one instead of sending their own
+        self.requests = 0
+        self.collapsed = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> tuple[Any, bool]:
+        # Returns fn()'s result, and whether it came from another caller's request
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+                self.requests += 1
+            else:
+                self.collapsed += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            flights = self.async_flights.setdefault(loop, {})
+            task = flights.get(key)
+            shared = task is not None
+            if shared:
+                self.collapsed += 1
+            else:
+                self.requests += 1
+        if not shared:
+            task = flights[key] = loop.create_task(fn())
+            task.add_done_callback(lambda _: flights.pop(key, None) if flights.get(key) is task else None)
+        # A cancelled caller must not cancel the request the others wait on
+        return await asyncio.shield(task), shared
+
+    def snapshot(self) -> dict[str, int]:
+        with self.lock:
+            return {"requests": self.requests, "collapsed": self.collapsed}
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.collapsed = 0
+
+
+_singleflights: dict[str, SingleFlight] = {}
+_singleflights_lock = threading.Lock()
+
+
+def get_singleflight(alias: str, enabled: bool) -> Optional[SingleFlight]:
+    if not enabled:
+        return None
+    with _singleflights_lock:
+        if alias not in _singleflights:
+            _singleflights[alias] = SingleFlight()
+        return _singleflights[alias]
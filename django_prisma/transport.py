@@ -0,0 +1,222 @@
+import asyncio
+import dataclasses
+import os
+import threading
+import warnings
+import weakref
+
+from typing import Any, Optional
+
+import requests
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+
+@dataclasses.dataclass(frozen=True)
+class TransportOptions:
+    # Connections open at once per process (per event loop for async)
+    pool_size: int = 100
+    # Idle connections kept alive; defaults to pool_size
+    max_keepalive: Optional[int] = None
+    connect_timeout: Optional[float] = 10.0
+    read_timeout: Optional[float] = None
+    http2: bool = False
+
+    @classmethod
+    def from_settings(cls, options: dict[str, Any]) -> "TransportOptions":
+        defaults = cls()
+        return cls(
+            pool_size=options.get("POOL_SIZE", defaults.pool_size),
+            max_keepalive=options.get("MAX_KEEPALIVE", defaults.max_keepalive),
+            connect_timeout=options.get("CONNECT_TIMEOUT", defaults.connect_timeout),
+            read_timeout=options.get("READ_TIMEOUT", defaults.read_timeout),
+            http2=options.get("HTTP2", defaults.http2),
+        )
+
+    @property
+    def keepalive(self) -> int:
+        return self.pool_size if self.max_keepalive is None else self.max_keepalive
+
+
+def _capped(timeout: Optional[float], limit: Optional[float]) -> Optional[float]:
+    # The tighter of a configured timeout and what is left of a deadline
+    if limit is None:
+        return timeout
+    return limit if timeout is None else min(timeout, limit)
+
+
+def _headers(token: str) -> dict[str, str]:
+    return {"Connection": "keep-alive", "Authorization": f"Bearer {token}"}
+
+
+def _httpx(options: TransportOptions):
+    try:
+        import httpx
+    except ImportError as e:
+        raise ImproperlyConfigured("This transport requires httpx: pip install django-prisma[async]") from e
+    if options.http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError as e:
+            raise ImproperlyConfigured("HTTP2 requires the h2 package: pip install django-prisma[http2]") from e
+    limits = httpx.Limits(max_connections=options.pool_size, max_keepalive_connections=options.keepalive)
+    # Waiting for a free pooled connection is bounded like connecting
+    timeout = httpx.Timeout(options.read_timeout, connect=options.connect_timeout, pool=options.connect_timeout)
+    return httpx, {"limits": limits, "timeout": timeout, "http2": options.http2, "verify": False}
+
+
+def _httpx_timeout(client, limit: Optional[float]):
+    if limit is None:
+        return client.timeout
+    timeout = client.timeout
+    return type(timeout)(
+        connect=_capped(timeout.connect, limit),
+        read=_capped(timeout.read, limit),
+        write=_capped(timeout.write, limit),
+        pool=_capped(timeout.pool, limit),
+    )
+
+
+class _PoolTimeout:
+    # requests never passes a pool timeout, so a blocking pool would wait
+    # forever for a free connection; wait no longer than connecting may take,
+    # which post() has already capped by the deadline
+    def urlopen(self, method, url, *args, pool_timeout=None, **kwargs):
+        if pool_timeout is None:
+            pool_timeout = getattr(kwargs.get("timeout"), "connect_timeout", None)
+        return super().urlopen(method, url, *args, pool_timeout=pool_timeout, **kwargs)
+
+
+class _HTTPConnectionPool(_PoolTimeout, HTTPConnectionPool):
+    pass
+
+
+class _HTTPSConnectionPool(_PoolTimeout, HTTPSConnectionPool):
+    pass
+
+
+class _BlockingAdapter(HTTPAdapter):
+    """
+    Blocks for a free connection instead of opening throwaway ones once
+    every pooled connection is busy, up to the request's connect timeout.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPConnectionPool, "https": _HTTPSConnectionPool}
+
+    def send(self, request, *args, **kwargs):
+        try:
+            return super().send(request, *args, **kwargs)
+        except EmptyPoolError as e:
+            # Never got a connection, so the request was not sent
+            raise requests.ConnectTimeout(e, request=request) from e
+
+
+class RequestsTransport:
+    # Failures worth retrying a read for: the request may never have arrived
+    errors = (requests.ConnectionError, requests.Timeout)
+
+    def __init__(self, session: requests.Session, timeout=None):
+        self.session = session
+        self.timeout = timeout
+
+    @classmethod
+    def create(cls, token: str, options: TransportOptions) -> "RequestsTransport":
+        if options.keepalive != options.pool_size:
+            # urllib3 keeps every pooled connection open once it has been used
+            warnings.warn("MAX_KEEPALIVE is ignored without HTTP2: requests keeps up to POOL_SIZE connections open")
+        session = requests.Session()
+        session.headers.update(_headers(token))
+        adapter = _BlockingAdapter(pool_connections=1, pool_maxsize=options.pool_size, pool_block=True)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return cls(session, (options.connect_timeout, options.read_timeout))
+
+    def post(
+        self, url: str, content: bytes, headers: Optional[dict[str, str]] = None, timeout: Optional[float] = None
+    ):
+        if timeout is not None:
+            connect, read = self.timeout or (None, None)
+            timeout = (_capped(connect, timeout), _capped(read, timeout))
+        else:
+            timeout = self.timeout
+        return self.session.post(url, data=content, headers=headers, timeout=timeout, verify=False)
+
+    def put(self, url: str, content: bytes):
+        return self.session.put(url, data=content, timeout=self.timeout, verify=False)
+
+    def close(self):
+        self.session.close()
+
+
+class HttpxTransport:
+    def __init__(self, client):
+        import httpx
+
+        self.client = client
+        self.errors = (httpx.TransportError,)
+
+    @classmethod
+    def create(cls, token: str, options: TransportOptions) -> "HttpxTransport":
+        httpx, kwargs = _httpx(options)
+        return cls(httpx.Client(headers=_headers(token), **kwargs))
+
+    def post(
+        self, url: str, content: bytes, headers: Optional[dict[str, str]] = None, timeout: Optional[float] = None
+    ):
+        return self.client.post(url, content=content, headers=headers, timeout=_httpx_timeout(self.client, timeout))
+
+    def put(self, url: str, content: bytes):
+        return self.client.put(url, content=content)
+
+    def close(self):
+        self.client.close()
+
+
+class AsyncHttpxTransport:
+    def __init__(self, client):
+        import httpx
+
+        self.client = client
+        self.errors = (httpx.TransportError,)
+
+    @classmethod
+    def create(cls, token: str, options: TransportOptions) -> "AsyncHttpxTransport":
+        httpx, kwargs = _httpx(options)
+        return cls(httpx.AsyncClient(headers=_headers(token), **kwargs))
+
+    async def post(
+        self, url: str, content: bytes, headers: Optional[dict[str, str]] = None, timeout: Optional[float] = None
+    ):
+        return await self.client.post(url, content=content, headers=headers, timeout=_httpx_timeout(self.client, timeout))
+
+    async def put(self, url: str, content: bytes):
+        return await self.client.put(url, content=content)
+
+
+# Django creates a wrapper per thread; they all share one pool per alias.
+# Keyed by pid too, so forked workers never reuse their parent's sockets.
+_transports: dict[tuple[int, str], RequestsTransport | HttpxTransport] = {}
+_transports_lock = threading.Lock()
+# httpx async clients are bound to the event loop they were first used on
+_async_transports = weakref.WeakKeyDictionary()
+
+
+def get_transport(alias: str, token: str, options: TransportOptions) -> RequestsTransport | HttpxTransport:
+    key = (os.getpid(), alias)
+    with _transports_lock:
+        if key not in _transports:
+            # requests can't speak HTTP/2
+            transport_class = HttpxTransport if options.http2 else RequestsTransport
+            _transports[key] = transport_class.create(token, options)
+        return _transports[key]
+
+
+def get_async_transport(alias: str, token: str, options: TransportOptions) -> AsyncHttpxTransport:
+    transports = _async_transports.setdefault(asyncio.get_running_loop(), {})
+    if alias not in transports:
+        transports[alias] = AsyncHttpxTransport.create(token, options)
+    return transports[alias]
@@ -0,0 +1,231 @@
+import base64
+import datetime
+import decimal
+import uuid
+
+from typing import Any, Optional
+
+from django.db import NotSupportedError
+from django.db.models.expressions import Col, Exists
+from django.db.models.sql.constants import LOUTER
+from django.db.models.sql.datastructures import Join
+from django.db.models.sql.where import AND, OR, NothingNode, WhereNode, tree
+
+try:
+    from django.db.models.expressions import ColPairs
+except ImportError:
+    # Django < 5.2
+    ColPairs = ()
+
+# Django lookup -> Prisma scalar filter
+OPERATORS = {
+    "exact": "equals",
+    "iexact": "equals",
+    "gt": "gt",
+    "gte": "gte",
+    "lt": "lt",
+    "lte": "lte",
+    "contains": "contains",
+    "icontains": "contains",
+    "startswith": "startsWith",
+    "istartswith": "startsWith",
+    "endswith": "endsWith",
+    "iendswith": "endsWith",
+}
+INSENSITIVE = {"iexact", "icontains", "istartswith", "iendswith"}
+
+
+def datetime_to_prisma(dt) -> str:
+    # Prisma doesn't support datetime with ISO offset
+    # https://github.com/prisma/prisma/issues/9516
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(datetime.timezone.utc)
+    d, _, _ = dt.isoformat().partition('+')
+    # It also requires a silly trailing z
+    return d + 'z'
+
+
+def tagged(type_: str, value: str) -> dict:
+    # How the JSON protocol spells values JSON has no type for
+    return {"$type": type_, "value": value}
+
+
+def cast_to_prisma(val: Any) -> Any:
+    match val:
+        case datetime.datetime():
+            return datetime_to_prisma(val)
+        case datetime.date():
+            return datetime_to_prisma(datetime.datetime.combine(val, datetime.time()))
+        case datetime.time():
+            return datetime_to_prisma(datetime.datetime.combine(datetime.date(1970, 1, 1), val))
+        case uuid.UUID():
+            return str(val)
+        case decimal.Decimal():
+            return tagged("Decimal", str(val))
+        case bytes() | bytearray() | memoryview():
+            return tagged("Bytes", base64.b64encode(val).decode())
+    return val
+
+
+def merge(filters: list[dict]) -> dict:
+    # AND of filters, as a single object unless two of them constrain the same key
+    merged = {}
+    for f in filters:
+        if merged.keys() & f.keys():
+            return {"AND": filters}
+        merged.update(f)
+    return merged
+
+
+def relation_filter(join: Join, condition: dict, or_missing: bool = False) -> dict:
+    # `or_missing`: the condition holds for the LEFT JOIN's row of NULLs too,
+    # so rows without a related one match as well
+    name = join.join_field.name
+    if join.join_field.concrete:
+        if or_missing:
+            return {"OR": [{name: {"is": condition}}, {name: None}]}
+        return {name: {"is": condition}}
+    # reverse foreign key: some related row must match
+    if or_missing:
+        return {"OR": [{name: {"some": condition}}, {name: {"none": {}}}]}
+    return {name: {"some": condition}}
+
+
+def matches_null_row(child: tree.Node) -> bool:
+    # Whether a LEFT JOIN's row of NULLs satisfies the lookup
+    return getattr(child, "lookup_name", None) == "isnull" and bool(child.rhs)
+
+
+def depth(alias: str, query) -> int:
+    n = 0
+    join = query.alias_map[alias]
+    while isinstance(join, Join):
+        n += 1
+        join = query.alias_map[join.parent_alias]
+    return n
+
+
+def scalar_condition(lookup) -> Any:
+    rhs = lookup.rhs
+    if hasattr(rhs, "resolve_expression"):
+        raise NotSupportedError(f"Filtering against {rhs} is not supported")
+    name = lookup.lookup_name
+    match name:
+        case "exact":
+            return cast_to_prisma(rhs)
+        case "isnull":
+            return None if rhs else {"not": None}
+        case "in":
+            # NULL never matches IN
+            return {"in": [cast_to_prisma(v) for v in rhs if v is not None]}
+        case "range":
+            return {"gte": cast_to_prisma(rhs[0]), "lte": cast_to_prisma(rhs[1])}
+    if name not in OPERATORS:
+        raise NotSupportedError(f"The {name} lookup is not supported")
+    condition = {OPERATORS[name]: cast_to_prisma(rhs)}
+    if name in INSENSITIVE:
+        condition["mode"] = "insensitive"
+    return condition
+
+
+def exists_filter(exists: Exists, query) -> tuple[str, dict]:
+    # exclude() across a reverse relation compiles to a correlated EXISTS over
+    # the related table; that is a some/none filter on the relation.
+    inner = exists.query
+    if inner.where.connector != AND or inner.where.negated:
+        raise NotSupportedError(f"Filtering on {exists} is not supported")
+    correlation = None
+    rest = []
+    for child in inner.where.children:
+        rhs = getattr(child, "rhs", None)
+        if isinstance(rhs, Col) and rhs.alias not in inner.alias_map and child.lookup_name == "exact":
+            correlation = child
+        else:
+            rest.append(child)
+    if correlation is None or not isinstance(correlation.lhs, Col):
+        raise NotSupportedError(f"Filtering on {exists} is not supported")
+    field = correlation.lhs.target
+    outer = correlation.rhs
+    if not field.many_to_one or field.target_field != outer.target:
+        raise NotSupportedError(f"Filtering on {exists} is not supported")
+    condition = combine_and(rest, inner, correlation.lhs.alias)
+    return outer.alias, {field.related_query_name(): {"some": condition}}
+
+
+def lookup_filter(lookup, query, base: str) -> tuple[str, dict]:
+    # The filter, and the alias of the model it applies to
+    lhs = lookup.lhs
+    if isinstance(lhs, Exists) and lookup.lookup_name == "exact":
+        alias, condition = exists_filter(lhs, query)
+        return alias, condition if lookup.rhs else {"NOT": [condition]}
+    if isinstance(lhs, ColPairs) and len(lhs.targets) == 1 and lookup.lookup_name == "in":
+        # prefetch_related over a forward foreign key filters on (pk,) tuples
+        (col,) = lhs.get_cols()
+        return col.alias, {col.target.column: {"in": [cast_to_prisma(v) for (v,) in lookup.rhs if v is not None]}}
+    if not isinstance(lhs, Col):
+        # transforms (__year, __lower, ...) and expressions
+        raise NotSupportedError(f"Filtering on {lhs} is not supported")
+    join = query.alias_map[lhs.alias]
+    if lookup.lookup_name == "isnull" and isinstance(join, Join) and lhs.target.primary_key:
+        # pets__isnull / owner__isnull after a LEFT JOIN: whether a related row exists
+        name = join.join_field.name
+        if join.join_field.concrete:
+            return join.parent_alias, {name: None} if lookup.rhs else {name: {"isNot": None}}
+        return join.parent_alias, {name: {"none" if lookup.rhs else "some": {}}}
+    return lhs.alias, {lhs.target.column: scalar_condition(lookup)}
+
+
+def child_filter(child: tree.Node, query, base: str) -> tuple[str, dict]:
+    match child:
+        case WhereNode():
+            return base, node_to_dict(child, query, base)
+        case NothingNode():
+            # Prisma matches nothing for an empty OR
+            return base, {"OR": []}
+    return lookup_filter(child, query, base)
+
+
+def combine_and(children: list[tree.Node], query, base: str) -> dict:
+    # Lookups through the same join must match the same related row, so
+    # they are collected per alias and nested under one relation filter.
+    by_alias: dict[str, list[dict]] = {}
+    null_rows: dict[str, bool] = {}
+    for child in children:
+        alias, f = child_filter(child, query, base)
+        by_alias.setdefault(alias, []).append(f)
+        null_rows[alias] = null_rows.get(alias, True) and matches_null_row(child)
+    while len(by_alias) > 1 or base not in by_alias:
+        if not by_alias:
+            return {}
+        alias = max((a for a in by_alias if a != base), key=lambda a: depth(a, query))
+        join = query.alias_map[alias]
+        if not isinstance(join, Join):
+            raise NotSupportedError(f"Can't filter on {alias} from {base}")
+        null_row = null_rows.pop(alias)
+        f = relation_filter(join, merge(by_alias.pop(alias)), null_row and join.join_type == LOUTER)
+        by_alias.setdefault(join.parent_alias, []).append(f)
+        null_rows[join.parent_alias] = null_rows.get(join.parent_alias, True) and null_row
+    return merge(by_alias[base])
+
+
+def node_to_dict(node: WhereNode, query, base: str) -> dict:
+    if node.connector == AND:
+        f = combine_and(node.children, query, base)
+    elif node.connector == OR:
+        f = {"OR": [combine_and([c], query, base) for c in node.children]}
+    else:
+        raise NotSupportedError(f"{node.connector} filters are not supported")
+    if node.negated:
+        return {"NOT": [f]}
+    return f
+
+
+def where_to_dict(where: Optional[WhereNode], query) -> dict:
+    """
+    Translate a query's WHERE tree into a Prisma filter object. Lookups
+    across foreign keys become relation filters (is/some/none), so
+    filtering always happens on Accelerate's side.
+    """
+    if where is None:
+        return {}
+    return node_to_dict(where, query, query.base_table)
@@ -0,0 +1,59 @@
+import json
+import os
+
+import django
+import pytest
+from django.conf import settings
+
+settings.configure(
+    DATABASES={
+        "default": {
+            "ENGINE": "django_prisma",
+            "TOKEN": "test",
+            "SCHEMA_PATH": os.path.join(os.path.dirname(__file__), "schema.prisma"),
+        }
+    },
+    INSTALLED_APPS=["testapp"],
+    USE_TZ=True,
+)
+django.setup()
+
+from django.db import connection
+
+from django_prisma.base import Cursor
+from django_prisma.schema import Schema
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(body).encode()
+        self.text = self.content.decode()
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    def __init__(self):
+        self.respond = None
+        self.headers = {}
+        self.bodies = []
+        self.sent_headers = []
+
+    def post(self, url, content, headers=None, timeout=None):
+        body = json.loads(content)
+        self.bodies.append(body)
+        self.sent_headers.append(headers or {})
+        return FakeResponse(self.respond(body), headers=self.headers)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    # Answers requests with `session.respond(body)` instead of Accelerate
+    session = FakeSession()
+    monkeypatch.setattr(connection, "connection", object())
+    monkeypatch.setattr(connection, "create_cursor", lambda name=None: Cursor(session, Schema(b"", "schema")))
+    return session
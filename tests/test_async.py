@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+
+from django_prisma.base import PrismaDatabaseWrapper
+from django_prisma.transport import AsyncHttpxTransport, HttpxTransport
+from testapp.models import Pet, User
+
+httpx = pytest.importorskip("httpx")
+
+
+def test_async_queries_use_async_transport(monkeypatch):
+    bodies = []
+
+    def handler(request):
+        if request.method == "PUT":
+            return httpx.Response(200, json={})
+        body = json.loads(request.content)
+        bodies.append(body)
+        if body["action"] == "aggregate":
+            return httpx.Response(200, json={"data": {"aggregateUser": {"_count": {"_all": 2}}}})
+        rows = [{"id": 1, "email": "a@x", "name": None}]
+        return httpx.Response(200, json={"data": {"findManyUser": rows}})
+
+    def transport(wrapper):
+        return AsyncHttpxTransport(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    # async code may get its own wrapper instance, so patch the class
+    monkeypatch.setattr(PrismaDatabaseWrapper, "async_transport", transport)
+
+    async def main():
+        count = await User.objects.acount()
+        user = await User.objects.aget(id=1)
+        emails = [u.email async for u in User.objects.all()]
+        return count, user, emails
+
+    count, user, emails = asyncio.run(main())
+    assert count == 2
+    assert user.email == "a@x"
+    assert emails == ["a@x"]
+    assert [b["action"] for b in bodies] == ["aggregate", "findMany", "findMany"]
+
+
+def test_async_prefetch_that_cannot_be_nested(monkeypatch):
+    # Pet -> owner is prefetched with its own query, run off the event loop
+    def handler(request):
+        if request.method == "PUT":
+            return httpx.Response(200, json={})
+        body = json.loads(request.content)
+        if body["modelName"] == "Pet":
+            return httpx.Response(200, json={"data": {"findManyPet": [{"id": 1, "name": "rex", "ownerId": 2}]}})
+        return httpx.Response(200, json={"data": {"findManyUser": [{"id": 2, "email": "b@x", "name": None}]}})
+
+    client = httpx.MockTransport(handler)
+    monkeypatch.setattr(PrismaDatabaseWrapper, "transport", property(lambda w: HttpxTransport(httpx.Client(transport=client))))
+    monkeypatch.setattr(
+        PrismaDatabaseWrapper, "async_transport", lambda w: AsyncHttpxTransport(httpx.AsyncClient(transport=client))
+    )
+
+    async def main():
+        return [p async for p in Pet.objects.prefetch_related("owner")]
+
+    pets = asyncio.run(main())
+    assert [(p.name, p.owner.email) for p in pets] == [("rex", "b@x")]
+
+
+def test_async_reads_of_an_evaluated_queryset(monkeypatch):
+    # Answered from the result cache, nothing is sent
+    monkeypatch.setattr(PrismaDatabaseWrapper, "async_transport", lambda w: pytest.fail("sent a request"))
+    users = User.objects.order_by("id")
+    users._result_cache = [User(id=1, email="a@x")]
+
+    async def main():
+        return await users.acount(), await users.afirst()
+
+    count, first = asyncio.run(main())
+    assert count == 1
+    assert first.email == "a@x"
@@ -0,0 +1,41 @@
+from django_prisma.batch import prisma_batch
+from testapp.models import Pet, User
+
+
+def batch_response(body):
+    results = []
+    for st in body["batch"]:
+        key = st["action"] + st["modelName"]
+        if st["action"] == "findMany":
+            data = [{"id": 1, "email": "a@x", "name": None}]
+        else:
+            data = {"_count": {"_all": 4}}
+        results.append({"data": {key: data}})
+    return {"batchResult": results}
+
+
+def test_batch_sends_one_request(session):
+    session.respond = batch_response
+
+    with prisma_batch() as batch:
+        users = batch.fetch(User.objects.filter(id=1))
+        pets = batch.count(Pet.objects.all())
+
+    assert len(session.bodies) == 1
+    assert [st["action"] for st in session.bodies[0]["batch"]] == ["findMany", "aggregate"]
+    assert [u.email for u in users] == ["a@x"]
+    assert pets.result == 4
+    assert len(session.bodies) == 1
+
+
+def test_batch_resolves_what_needs_no_request(session):
+    session.respond = lambda body: {"data": {"findManyUser": [{"id": 1, "email": "a@x", "name": None}]}}
+    users = User.objects.all()
+    list(users)
+    session.bodies.clear()
+
+    with prisma_batch() as batch:
+        count = batch.count(users)
+
+    assert session.bodies == []
+    assert count.result == 1
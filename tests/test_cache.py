@@ -0,0 +1,140 @@
+from django.db import connection
+from testapp.models import Pet, User
+
+from django_prisma import cache, compiler, decoding
+from django_prisma.base import CACHE_TAGS_HEADER, Cursor
+from django_prisma.cache import Freshness, ResponseCache
+from django_prisma.manager import CacheStrategy
+from django_prisma.schema import Schema
+
+
+def test_ttl_and_swr(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    c = ResponseCache(max_entries=10, max_bytes=1000)
+    c.set("q", [[1]], 10, CacheStrategy(ttl=5, swr=5))
+
+    assert c.get("q") == (Freshness.FRESH, [[1]])
+    now[0] = 106
+    assert c.get("q") == (Freshness.STALE, [[1]])
+    assert c.begin_refresh("q")
+    assert not c.begin_refresh("q")
+    c.end_refresh("q")
+    now[0] = 111
+    assert c.get("q") == (Freshness.MISS, None)
+    assert c.size == 0
+
+
+def test_lru_bounds():
+    c = ResponseCache(max_entries=2, max_bytes=100)
+    cs = CacheStrategy(ttl=60, swr=0)
+    c.set("a", 1, 10, cs)
+    c.set("b", 2, 10, cs)
+    c.get("a")
+    c.set("c", 3, 10, cs)
+    assert list(c.entries) == ["a", "c"]
+
+    c.set("d", 4, 95, cs)
+    assert list(c.entries) == ["d"]
+    c.set("too big", 5, 101, cs)
+    assert "too big" not in c.entries
+
+
+def test_invalidate_by_tag():
+    c = ResponseCache(max_entries=10, max_bytes=1000)
+    c.set("a", 1, 10, CacheStrategy(ttl=60, swr=0, tags=["users"]))
+    c.set("b", 2, 10, CacheStrategy(ttl=60, swr=0, tags=["users", "pets"]))
+    c.set("c", 3, 10, CacheStrategy(ttl=60, swr=0))
+    assert c.invalidate(["pets"]) == 1
+    assert list(c.entries) == ["a", "c"]
+    assert c.invalidate(["users", "other"]) == 1
+    assert list(c.entries) == ["c"]
+    assert c.tagged == {} and c.size == 10
+
+
+def test_strategy_belongs_to_the_queryset(session):
+    def respond(body):
+        result = [] if body["action"] == "findMany" else {"_count": {"_all": 0}}
+        return {"data": {body["action"] + "User": result}}
+
+    session.respond = respond
+    cs = CacheStrategy(ttl=30, swr=90, tags=("users",))
+    cached = User.objects.with_cache(cs).filter(name="a")
+    uncached = User.objects.filter(name="a")
+    list(cached.order_by("email"))
+    list(uncached)
+    cached.count()
+
+    first, second, third = session.sent_headers
+    assert first == {"cache-control": "max-age=30,stale-while-revalidate=90", "accelerate-cache-tags": "users"}
+    assert second == {}
+    assert third == first
+    # Nothing is left behind on the shared manager
+    assert not hasattr(User.objects, "cache_strategy")
+
+
+def test_dependencies_of_compiled_reads():
+    def tables(queryset):
+        return queryset.query.get_compiler(connection=connection).executable().depends_on
+
+    assert tables(User.objects.all()) == {"User"}
+    assert tables(Pet.objects.filter(owner__name="a")) == {"Pet", "User"}
+    assert tables(Pet.objects.select_related("owner")) == {"Pet", "User"}
+    assert tables(User.objects.prefetch_related("pets")) == {"User"}
+
+
+def test_writes_evict_dependent_reads(session, monkeypatch):
+    response_cache = ResponseCache(max_entries=10, max_bytes=10_000)
+    monkeypatch.setattr(
+        connection,
+        "create_cursor",
+        lambda name=None: Cursor(session, Schema(b"", "schema"), response_cache, accelerate_invalidation=True),
+    )
+
+    def respond(body):
+        if "tags" in body:
+            return {}
+        if body["action"] == "updateMany":
+            return {"data": {"updateManyUser": {"count": 1}}}
+        return {"data": {f"findMany{body['modelName']}": []}}
+
+    session.respond = respond
+    cs = CacheStrategy(ttl=3600, swr=0)
+    users = User.objects.with_cache(cs).all()
+    pets = Pet.objects.with_cache(cs).filter(owner__name="a")
+    for queryset in (users, pets, users, pets):
+        list(queryset.all())
+    assert len(session.bodies) == 2
+    assert session.sent_headers[1][CACHE_TAGS_HEADER] == "model_Pet,model_User"
+
+    User.objects.filter(id=1).update(name="b")
+    assert session.bodies[-1] == {"tags": ["model_User"]}
+    assert response_cache.entries == {}
+    list(users.all())
+    list(pets.all())
+    assert len(session.bodies) == 6
+
+
+def test_reads_across_a_write_are_not_stored():
+    c = ResponseCache(max_entries=10, max_bytes=1000)
+    cs = CacheStrategy(ttl=60, swr=0)
+    version = c.version(frozenset({"User"}))
+    c.invalidate_models({"User"})
+    c.set("read before the write", 1, 10, cs, frozenset({"User"}), version)
+    c.set("other table", 2, 10, cs, frozenset({"Pet"}), c.version(frozenset({"Pet"})))
+    assert list(c.entries) == ["other table"]
+
+
+def test_cached_reads_are_encoded_once(session, monkeypatch):
+    response_cache = ResponseCache(max_entries=10, max_bytes=10_000)
+    monkeypatch.setattr(
+        connection, "create_cursor", lambda name=None: Cursor(session, Schema(b"", "schema"), response_cache)
+    )
+    encoded = []
+    monkeypatch.setattr(compiler, "dumps", lambda obj: encoded.append(obj) or decoding.dumps(obj))
+    session.respond = lambda body: {"data": {"findManyUser": []}}
+
+    list(User.objects.with_cache(CacheStrategy(ttl=3600, swr=0)).filter(name="a"))
+    assert len(encoded) == 1
+    list(User.objects.filter(name="b"))
+    assert len(encoded) == 2
@@ -0,0 +1,252 @@
+import datetime
+import decimal
+import uuid
+
+import pytest
+from django.db import NotSupportedError
+from django.db.models import Avg, Count, Max, Sum
+from django.db.models.constants import OnConflict
+from django.db.models.sql import InsertQuery
+
+from django_prisma import decoding
+from django_prisma.compiler import CreateManyStatement, InsertStatement, split_by_payload_size
+from testapp.models import Device, Event, Pet, User
+
+
+def compile_insert(model, objs, returning_fields=None, on_conflict=None):
+    fields = [f for f in model._meta.concrete_fields if f is not model._meta.pk]
+    query = InsertQuery(model, on_conflict=on_conflict)
+    query.insert_values(fields, objs)
+    compiler = query.get_compiler("default")
+    compiler.returning_fields = returning_fields
+    return compiler.executable()
+
+
+def test_single_insert_returns_pk():
+    (st,) = compile_insert(Pet, [Pet(name="rex", owner_id=3)], returning_fields=[Pet._meta.pk])
+    assert isinstance(st, InsertStatement)
+    assert st.statement["query"]["arguments"]["data"] == {"name": "rex", "ownerId": 3}
+    assert st.dict_to_tuple({"id": 7, "name": "rex", "ownerId": 3}) == [(7,)]
+
+
+def test_typed_values_are_tagged_and_the_pk_converted():
+    event = Event(
+        at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+        day=datetime.date(2024, 1, 2),
+        amount=decimal.Decimal("1.50"),
+        payload={"a": 1},
+        blob=b"hi",
+    )
+    (st,) = compile_insert(Event, [event], returning_fields=[Event._meta.pk])
+    assert st.statement["query"]["arguments"]["data"] == {
+        "at": "2024-01-01T00:00:00z",
+        "day": "2024-01-02T00:00:00z",
+        "amount": {"$type": "Decimal", "value": "1.50"},
+        "payload": {"$type": "Json", "value": '{"a": 1}'},
+        "blob": {"$type": "Bytes", "value": "aGk="},
+        "level": "LOW",
+    }
+    assert st.dict_to_tuple({"id": {"$type": "BigInt", "value": "7"}}) == [(7,)]
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_uuids_are_written_as_strings(fast, monkeypatch):
+    if not fast:
+        monkeypatch.setattr(decoding, "orjson", None)
+    token = uuid.UUID("12345678-1234-5678-1234-567812345678")
+    (st,) = compile_insert(Device, [Device(token=token)], returning_fields=[Device._meta.pk])
+    assert decoding.loads(st.body)["query"]["arguments"]["data"] == {"token": str(token)}
+
+
+def test_bulk_insert_uses_create_many():
+    objs = [User(email=f"{i}@x") for i in range(100)]
+    (st,) = compile_insert(User, objs, on_conflict=OnConflict.IGNORE)
+    assert isinstance(st, CreateManyStatement)
+    assert st.statement["action"] == "createMany"
+    assert st.statement["query"]["arguments"]["skipDuplicates"] is True
+    assert len(st.statement["query"]["arguments"]["data"]) == 100
+    assert st.dict_to_tuple({"count": 100}) == 100
+
+
+def test_split_by_payload_size():
+    rows = [{"email": f"{i:04}@example.com"} for i in range(100)]
+    chunks = split_by_payload_size(rows, 300)
+    assert [r for c in chunks for r in c] == rows
+    assert all(len(c) <= 10 for c in chunks)
+    assert split_by_payload_size(rows[:1], 1) == [rows[:1]]
+
+
+def test_iterator_pages_with_cursor(session):
+    def respond(body):
+        args = body["query"]["arguments"]
+        start = args["cursor"]["id"] + 1 if "cursor" in args else 1
+        ids = [i for i in range(start, start + args["take"]) if i <= 5]
+        return {"data": {"findManyUser": [{"id": i, "email": f"{i}@x", "name": None} for i in ids]}}
+
+    session.respond = respond
+    it = User.objects.iterator(chunk_size=2)
+    assert next(it).id == 1
+    assert len(session.bodies) == 1
+    assert [u.id for u in it] == [2, 3, 4, 5]
+    assert len(session.bodies) == 3
+    args = session.bodies[1]["query"]["arguments"]
+    assert args["cursor"] == {"id": 2}
+    assert args["skip"] == 1
+    assert args["orderBy"] == [{"id": "asc"}]
+
+
+def compile_select(qs):
+    return qs.query.get_compiler("default").executable().statement["query"]["arguments"]
+
+
+def test_ordering_and_slicing_are_pushed_down():
+    args = compile_select(User.objects.order_by("-id")[10:30])
+    assert args["orderBy"] == [{"id": "desc"}]
+    assert args["skip"] == 10
+    assert args["take"] == 20
+
+    args = compile_select(Pet.objects.order_by("owner__email", "name").distinct("owner_id"))
+    assert args["orderBy"] == [{"owner": {"email": "asc"}}, {"name": "asc"}]
+    assert args["distinct"] == ["ownerId"]
+    assert "take" not in args and "skip" not in args
+
+
+def compile_selection(qs):
+    return qs.query.get_compiler("default").executable().statement["query"]["selection"]
+
+
+def test_projection_follows_select_list():
+    assert compile_selection(User.objects.values_list("id", flat=True)) == {"id": True}
+    assert compile_selection(User.objects.only("email")) == {"id": True, "email": True}
+    assert compile_selection(Pet.objects.select_related("owner").only("name", "owner__email")) == {
+        "id": True,
+        "name": True,
+        "ownerId": True,
+        "owner": {"arguments": {}, "selection": {"id": True, "email": True}},
+    }
+
+
+def test_projected_rows_follow_select_order(session):
+    session.respond = lambda body: {
+        "data": {"findManyPet": [{"id": 1, "name": "rex", "ownerId": 2, "owner": {"id": 2, "email": "a@x"}}]}
+    }
+    (pet,) = Pet.objects.select_related("owner").only("name", "owner__email")
+    assert (pet.name, pet.owner.id, pet.owner.email) == ("rex", 2, "a@x")
+
+
+def test_plan_cache_reuses_compiled_shape():
+    from django.db import connection
+
+    plan_cache = connection.plan_cache
+    plan_cache.plans.clear()
+    hits, misses = plan_cache.hits, plan_cache.misses
+
+    first = compile_select(User.objects.filter(id=1)[:5])
+    second = compile_select(User.objects.filter(id=2)[5:20])
+    assert (plan_cache.hits - hits, plan_cache.misses - misses) == (1, 1)
+    assert first == {"where": {"id": 1}, "take": 5}
+    assert second == {"where": {"id": 2}, "take": 15, "skip": 5}
+
+    compile_select(User.objects.filter(id=2).order_by("-id"))
+    assert plan_cache.misses - misses == 2
+    assert len(plan_cache.plans) == 2
+
+
+def test_aggregates_are_pushed_down(session):
+    session.respond = lambda body: {
+        "data": {"aggregateUser": {"_count": {"_all": 3, "name": 2}, "_sum": {"id": 6}, "_max": {"id": 3}}}
+    }
+    result = User.objects.filter(id=1).aggregate(n=Count("*"), named=Count("name"), total=Sum("id"), top=Max("id"))
+    assert result == {"n": 3, "named": 2, "total": 6, "top": 3}
+    (body,) = session.bodies
+    assert body["query"]["arguments"] == {"where": {"id": 1}}
+    assert body["query"]["selection"] == {
+        "_count": {"arguments": {}, "selection": {"_all": True, "name": True}},
+        "_sum": {"arguments": {}, "selection": {"id": True}},
+        "_max": {"arguments": {}, "selection": {"id": True}},
+    }
+
+
+def test_typed_results_are_decoded(session):
+    at = {"$type": "DateTime", "value": "2024-05-06T07:08:09.000Z"}
+    session.respond = lambda body: {
+        "data": {
+            "findManyEvent": [
+                {"id": {"$type": "BigInt", "value": "1"}, "at": at, "amount": {"$type": "Decimal", "value": "2.5"}},
+                {"id": {"$type": "BigInt", "value": "2"}, "at": at, "amount": {"$type": "Decimal", "value": "3"}},
+            ],
+            "aggregateEvent": {"_max": {"at": at}, "_avg": {"amount": {"$type": "Decimal", "value": "2.75"}}},
+        }
+    }
+    rows = list(Event.objects.values_list("id", "at", "amount"))
+    when = datetime.datetime(2024, 5, 6, 7, 8, 9, tzinfo=datetime.timezone.utc)
+    assert rows == [(1, when, decimal.Decimal("2.5")), (2, when, decimal.Decimal("3"))]
+    assert Event.objects.aggregate(last=Max("at"), avg=Avg("amount")) == {"last": when, "avg": decimal.Decimal("2.75")}
+
+
+def test_sliced_count_uses_take(session):
+    session.respond = lambda body: {"data": {"aggregateUser": {"_count": {"_all": 2}}}}
+    assert User.objects.order_by("id")[3:5].count() == 2
+    assert session.bodies[0]["query"]["arguments"] == {"where": {}, "orderBy": [{"id": "asc"}], "take": 2, "skip": 3}
+
+
+def test_values_annotate_uses_group_by(session):
+    session.respond = lambda body: {
+        "data": {"groupByUser": [{"name": "a", "_count": {"id": 3}}, {"name": "b", "_count": {"id": 1}}]}
+    }
+    rows = list(User.objects.values("name").annotate(n=Count("id")).order_by("-n"))
+    assert rows == [{"name": "a", "n": 3}, {"name": "b", "n": 1}]
+    (body,) = session.bodies
+    assert body["action"] == "groupBy"
+    assert body["query"]["arguments"] == {"by": ["name"], "where": {}, "orderBy": [{"_count": {"id": "desc"}}]}
+
+
+def test_aggregate_across_relation_is_rejected():
+    with pytest.raises(NotSupportedError):
+        User.objects.aggregate(n=Sum("pets__id"))
+
+
+def test_filtering_on_a_relation_count_is_rejected():
+    with pytest.raises(NotSupportedError):
+        list(User.objects.annotate(n=Count("pets")).filter(n__gt=1))
+    with pytest.raises(NotSupportedError):
+        list(User.objects.values("name").annotate(n=Count("id")).filter(n__gt=1))
+
+
+def test_fast_delete_is_one_delete_many(session):
+    session.respond = lambda body: {"data": {"deleteManyPet": {"count": 42}}}
+    assert Pet.objects.filter(owner__email="a@x").delete() == (42, {"testapp.Pet": 42})
+    (body,) = session.bodies
+    assert body["action"] == "deleteMany"
+    assert body["query"]["arguments"] == {"where": {"owner": {"is": {"email": "a@x"}}}}
+
+
+def test_bulk_update_batches_update_many(session):
+    def respond(body):
+        return {"batchResult": [{"data": {"updateManyUser": {"count": 1}}} for _ in body["batch"]]}
+
+    session.respond = respond
+    users = [User(id=i, email=f"{i}@x", name="a" if i < 3 else "b") for i in range(1, 6)]
+    assert User.objects.bulk_update(users, ["name"]) == 2
+    (body,) = session.bodies
+    statements = [(st["query"]["arguments"]["where"], st["query"]["arguments"]["data"]) for st in body["batch"]]
+    assert statements == [({"id": {"in": [1, 2]}}, {"name": "a"}), ({"id": {"in": [3, 4, 5]}}, {"name": "b"})]
+
+
+def test_prefetch_related_is_nested_in_one_request(session):
+    session.respond = lambda body: {
+        "data": {
+            "findManyUser": [
+                {"id": 1, "email": "a@x", "name": "a", "pets": [{"id": 10, "name": "rex", "ownerId": 1}]},
+                {"id": 2, "email": "b@x", "name": "b", "pets": []},
+            ]
+        }
+    }
+    users = list(User.objects.order_by("id").prefetch_related("pets"))
+    assert [[p.name for p in u.pets.all()] for u in users] == [["rex"], []]
+    assert users[0].pets.all()[0].owner is users[0]
+    (body,) = session.bodies
+    assert body["query"]["selection"]["pets"] == {
+        "arguments": {"where": {}},
+        "selection": {"id": True, "name": True, "ownerId": True},
+    }
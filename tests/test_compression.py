@@ -0,0 +1,55 @@
+import gzip
+
+import pytest
+from conftest import FakeResponse
+from django.core.exceptions import ImproperlyConfigured
+
+from django_prisma.base import Cursor
+from django_prisma.compiler import CreateManyStatement
+from django_prisma.compression import Compression, compress_body
+from django_prisma.instrumentation import Instrumentation, Metrics
+from django_prisma.schema import Schema
+
+
+class RecordingTransport:
+    def __init__(self):
+        self.requests = []
+
+    def post(self, url, content, headers=None, timeout=None):
+        self.requests.append((content, headers))
+        return FakeResponse({"data": {"createManyUser": {"count": 1}}})
+
+
+def test_settings():
+    assert Compression.from_settings({}) is None
+    compression = Compression.from_settings({"COMPRESSION": "gzip", "COMPRESS_MIN_BYTES": 10})
+    assert (compression.encoding, compression.min_bytes) == ("gzip", 10)
+    with pytest.raises(ImproperlyConfigured):
+        Compression.from_settings({"COMPRESSION": "lzma"})
+
+
+def test_small_bodies_are_sent_as_they_are():
+    compression = Compression.from_settings({"COMPRESSION": "gzip", "COMPRESS_MIN_BYTES": 100})
+    assert compress_body(b"{}", compression) == (b"{}", {})
+    content, headers = compress_body(b"x" * 100, compression)
+    assert headers == {"Content-Encoding": "gzip"}
+    assert gzip.decompress(content) == b"x" * 100
+
+
+def test_cursor_compresses_and_reports_ratio():
+    transport = RecordingTransport()
+    metrics = Metrics()
+    cursor = Cursor(
+        transport,
+        Schema(b"", "schema"),
+        instrumentation=Instrumentation("default", metrics),
+        compression=Compression.from_settings({"COMPRESSION": "gzip"}),
+    )
+    rows = [{"email": f"{i}@example.com", "name": "ünïcode"} for i in range(100)]
+    assert cursor.execute(CreateManyStatement("User", rows)) == 1
+
+    ((content, headers),) = transport.requests
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(content).decode() == CreateManyStatement("User", rows).body
+    ratio = metrics.snapshot()[("User", "createMany")]["request_compression"]
+    assert ratio["count"] == 1 and ratio["p50"] <= 0.25
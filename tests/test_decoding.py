@@ -0,0 +1,126 @@
+import datetime
+import decimal
+import uuid
+
+from django_prisma.compiler import Constant
+from django_prisma.converters import NO_CONVERTERS, Converters, convert_columns, load_converters
+from django_prisma.decoding import column_extractor, dumps, loads, row_extractor
+from django_prisma.psl_parser import parse_prisma_schema
+
+
+def test_row_extractor_flattens_relations():
+    extract = row_extractor([("id",), ("owner", "email"), ("owner", "id"), Constant(1), ("name",)])
+    data = {"id": 3, "name": "rex", "owner": {"id": 7, "email": "a@x"}}
+    assert extract(data) == (3, "a@x", 7, 1, "rex")
+    assert extract(dict(data, owner=None)) == (3, None, None, 1, "rex")
+
+
+def test_row_extractor_single_column():
+    assert row_extractor([("id",)])({"id": 3}) == (3,)
+    assert row_extractor([])({"id": 3}) == ()
+
+
+def test_json_roundtrip():
+    assert loads(dumps({"a": [1, "b", None]})) == {"a": [1, "b", None]}
+    assert loads(b'{"a": 1}') == {"a": 1}
+
+
+def test_column_extractor_reads_whole_columns():
+    results = [{"id": 3, "owner": {"email": "a@x"}}, {"id": 4, "owner": None}]
+    extract = column_extractor([("id",), ("owner", "email"), Constant(1)])
+    ids, emails, ones = extract(results)
+    assert (ids, emails, list(ones)) == ([3, 4], ["a@x", None], [1, 1])
+
+
+def test_typed_columns_are_converted_whole():
+    schema = """
+    model Event {
+      id      BigInt    @id
+      at      DateTime
+      day     DateTime? @db.Date
+      opens   DateTime  @db.Time
+      amount  Decimal
+      code    String    @db.Uuid
+      payload Json?
+      blob    Bytes?
+      name    String
+    }
+    """
+    types = Converters(parse_prisma_schema(schema), use_tz=True)
+    assert types.column("Event", "name") is None
+    row = {
+        "id": {"$type": "BigInt", "value": "9007199254740993"},
+        "at": {"$type": "DateTime", "value": "2024-05-06T07:08:09.123Z"},
+        "day": {"$type": "DateTime", "value": "2024-05-06T00:00:00.000Z"},
+        "opens": {"$type": "DateTime", "value": "1970-01-01T09:30:00.000Z"},
+        "amount": {"$type": "Decimal", "value": "12.5"},
+        "code": "9c5b94b1-35ad-49bb-b118-8e8fc24abf80",
+        "payload": {"$type": "Json", "value": '{"a": 1}'},
+        "blob": {"$type": "Bytes", "value": "AP8="},
+    }
+    columns = list(row)
+    rows = convert_columns(
+        column_extractor([(c,) for c in columns])([row, dict(row, day=None, payload=None, blob=None)]),
+        [types.column("Event", c) for c in columns],
+    )
+    assert rows[0] == (
+        9007199254740993,
+        datetime.datetime(2024, 5, 6, 7, 8, 9, 123000, tzinfo=datetime.timezone.utc),
+        datetime.date(2024, 5, 6),
+        datetime.time(9, 30),
+        decimal.Decimal("12.5"),
+        uuid.UUID("9c5b94b1-35ad-49bb-b118-8e8fc24abf80"),
+        '{"a": 1}',
+        b"\x00\xff",
+    )
+    assert rows[1][2] is None and rows[1][6:] == (None, None)
+
+    naive = Converters(parse_prisma_schema(schema), use_tz=False).column("Event", "at")
+    assert naive([row["at"]]) == [datetime.datetime(2024, 5, 6, 7, 8, 9, 123000)]
+    # Untagged values, as older engines send them, are parsed all the same
+    assert types.column("Event", "amount")(["1.5"]) == [decimal.Decimal("1.5")]
+
+
+def test_aggregates_keep_the_column_type():
+    types = Converters(parse_prisma_schema("model M {\n  id Int @id\n  price Decimal\n  big BigInt\n}\n"), True)
+    assert types.aggregate("M", "_max", "price") is types.column("M", "price")
+    assert types.aggregate("M", "_avg", "price") is types.column("M", "price")
+    assert types.aggregate("M", "_avg", "big") is None
+    assert types.aggregate("M", "_count", "big") is None
+    assert types.aggregate("M", "_sum", "id") is None
+
+
+def test_schemas_with_indexes_and_referential_actions_are_converted(tmp_path):
+    path = tmp_path / "schema.prisma"
+    path.write_text(
+        """
+        model User {
+          id   String @id @default(dbgenerated("gen_random_uuid()")) @db.Uuid
+          pets Pet[]
+          @@map("users")
+        }
+
+        model Pet {
+          id      BigInt   @id @default(autoincrement())
+          born    DateTime @map("born_at")
+          ownerId String   @db.Uuid
+          owner   User     @relation(fields: [ownerId], references: [id], onDelete: Cascade)
+          @@index([ownerId])
+        }
+        """
+    )
+    types = load_converters(str(path))
+    assert types is not NO_CONVERTERS
+    assert types.column("Pet", "born")([{"$type": "DateTime", "value": "2024-05-06T07:08:09.000Z"}]) == [
+        datetime.datetime(2024, 5, 6, 7, 8, 9, tzinfo=datetime.timezone.utc)
+    ]
+    assert types.column("User", "id")(["12345678-1234-5678-1234-567812345678"]) == [
+        uuid.UUID("12345678-1234-5678-1234-567812345678")
+    ]
+
+
+def test_unparseable_schema_leaves_values_alone(tmp_path, caplog):
+    path = tmp_path / "schema.prisma"
+    path.write_text("model Broken {\n  id Int @id(\n}\n")
+    assert load_converters(str(path)) is NO_CONVERTERS
+    assert "values will not be converted" in caplog.text
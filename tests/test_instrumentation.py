@@ -0,0 +1,44 @@
+from django.db import connection
+from testapp.models import User
+
+from django_prisma.base import Cursor
+from django_prisma.instrumentation import Histogram, Instrumentation, Metrics, statement_executed
+from django_prisma.schema import Schema
+
+
+def test_histogram_percentiles():
+    h = Histogram((1, 2, 4, 8))
+    for value in (0.5, 1.5, 1.5, 3, 100):
+        h.observe(value)
+    assert h.counts == [1, 2, 1, 0, 1]
+    assert h.percentile(0.5) == 2
+    assert h.percentile(0.99) == float("inf")
+    assert Histogram((1,)).percentile(0.5) is None
+
+
+def test_events_are_sent_and_recorded(session, monkeypatch):
+    metrics = Metrics()
+    instrumentation = Instrumentation("default", metrics)
+    monkeypatch.setattr(
+        connection, "create_cursor", lambda name=None: Cursor(session, Schema(b"", "schema"), instrumentation=instrumentation)
+    )
+    session.headers = {"accelerate-info": '{"cacheStatus": "ttl", "region": "fra1"}'}
+    session.respond = lambda body: {"data": {"findManyUser": [{"id": 1, "email": "a@x", "name": None}]}}
+    events = []
+
+    def receiver(sender, alias, event, **kwargs):
+        events.append(event)
+
+    statement_executed.connect(receiver)
+    try:
+        list(User.objects.all())
+    finally:
+        statement_executed.disconnect(receiver)
+
+    (event,) = events
+    assert (event.model, event.action, event.rows, event.cache_status) == ("User", "findMany", 1, "hit")
+    assert event.response_bytes > 0
+    assert event.compile_time > 0 and event.network_time >= 0
+    snapshot = metrics.snapshot()[("User", "findMany")]
+    assert snapshot["network_time"]["count"] == 1
+    assert snapshot["cache_status"] == {"hit": 1}
@@ -1,3 +1,5 @@
+import json
+
 from django_prisma.psl_types import *
 from django_prisma.psl_parser import parse_prisma_schema
 
@@ -114,3 +116,172 @@ class Pet(models.Model):
 """
     assert res.models[0].to_django_model() == expected_user
     assert res.models[1].to_django_model() == expected_pet
+
+
+def test_parsed_schemas_are_memoized(tmp_path, monkeypatch):
+    from django_prisma import psl_parser
+
+    text = "model Memo {\n  id Int @id\n}\n"
+    psl = parse_prisma_schema(text, str(tmp_path))
+    assert parse_prisma_schema(text) is psl
+    (stored,) = tmp_path.glob("*.json")
+    # lark's pickled tables stay out of the shared temp dir
+    assert len(list(tmp_path.glob("lark-*.tables"))) == 1
+
+    # A new process finds it on disk, without parsing
+    monkeypatch.setattr(psl_parser, "_parsed", {})
+    monkeypatch.setattr(psl_parser, "_parse", None)
+    assert parse_prisma_schema(text, str(tmp_path)) == psl
+
+    monkeypatch.undo()
+    monkeypatch.setattr(psl_parser, "_parsed", {})
+    stored.write_bytes(b"truncated")
+    assert parse_prisma_schema(text, str(tmp_path)) == psl
+
+
+def test_stored_schemas_are_plain_json(tmp_path, monkeypatch):
+    from django_prisma import psl_parser
+
+    text = """
+    enum Level {
+      LOW
+    }
+    model Stored {
+      id    BigInt   @id @default(autoincrement())
+      at    DateTime @default(now()) @db.Timestamptz(3)
+      level Level    @default(LOW)
+      tags  String[]
+      @@unique([at, level])
+    }
+    """
+    psl = parse_prisma_schema(text, str(tmp_path))
+    (stored,) = tmp_path.glob("*.json")
+    assert json.loads(stored.read_text())["$type"] == "PSL"
+    monkeypatch.setattr(psl_parser, "_parsed", {})
+    monkeypatch.setattr(psl_parser, "_parse", None)
+    assert parse_prisma_schema(text, str(tmp_path)) == psl
+
+    # Classes from outside psl_types are refused, and the schema parsed again
+    monkeypatch.undo()
+    monkeypatch.setattr(psl_parser, "_parsed", {})
+    stored.write_text(json.dumps({"$type": "Popen", "args": ["true"]}))
+    assert parse_prisma_schema(text, str(tmp_path)) == psl
+
+
+def test_attributes_django_has_no_use_for_are_skipped():
+    data = """
+    generator client {
+      provider        = "prisma-client-js"
+      previewFeatures = ["fullTextSearch"]
+    }
+
+    datasource db {
+      provider = "postgresql"
+      url      = env("DATABASE_URL")
+    }
+
+    enum Role {
+      USER  @map("user")
+      ADMIN
+      @@map("roles")
+    }
+
+    model Account {
+      id      String   @id @default(dbgenerated("gen_random_uuid()")) @db.Uuid
+      email   String   @unique(map: "account_email_key")
+      role    Role     @default(USER)
+      created DateTime @default(now()) @map("created_at") @db.Timestamptz(3)
+      posts   Post[]   @relation("authored")
+      @@map("accounts")
+      @@index([created(sort: Desc)], type: BTree)
+    }
+
+    model Post {
+      id       Int     @id @default(autoincrement())
+      title    String  @db.VarChar(200)
+      authorId String  @db.Uuid
+      author   Account @relation("authored", fields: [authorId], references: [id], onDelete: Restrict, onUpdate: Cascade)
+      @@unique([authorId, title(sort: Asc)], name: "one_title")
+      @@index([authorId])
+    }
+    """
+    res = parse_prisma_schema(data)
+    assert res.enums == [PSLEnum(name="Role", values=["USER", "ADMIN"])]
+    account, post = res.models
+    columns = {c.name: c for c in account.columns}
+    assert columns["id"].props == [AttributePK(), AttributeDefaultFunction("dbgenerated"), AttributeNative("Uuid", [])]
+    assert columns["email"].props == [AttributeUnique()]
+    assert columns["created"].props == [AttributeDefaultNow(), AttributeNative("Timestamptz", ["3"])]
+    assert columns["posts"].props == []
+    assert account.compound_unique_constraints == []
+    assert post.columns[-1].props == [AttributeRelation(["authorId"], ["id"], "Restrict")]
+    assert post.compound_unique_constraints == [CompoundUniqueConstraint(["authorId", "title"])]
+
+    expected = """
+class Post(models.Model):
+    class Meta:
+        db_table = "Post"
+    id = models.AutoField(primary_key=True)
+    title = models.CharField(max_length=200)
+    author = models.ForeignKey(to=Account, on_delete=models.PROTECT, db_column="authorId")
+"""
+    assert post.to_django_model() == expected
+
+
+def test_scalars_enums_and_native_types():
+    data = """
+    // Comments are skipped
+    enum Level {
+      LOW
+      HIGH
+    }
+
+    model Event {
+      id      BigInt    @id @default(autoincrement())
+      at      DateTime  @default(now())
+      seen    DateTime  @updatedAt
+      day     DateTime? @db.Date
+      amount  Decimal   @db.Decimal(10, 2)
+      title   String    @db.VarChar(20)
+      body    String    @db.Text
+      code    String    @default(uuid()) @db.Uuid
+      payload Json?
+      blob    Bytes?
+      active  Boolean   @default(true)
+      ratio   Float     @default(1.5)
+      fee     Decimal   @default(0.25)
+      level   Level     @default(LOW)
+    }
+    """
+    res = parse_prisma_schema(data)
+    assert res.enums == [PSLEnum(name="Level", values=["LOW", "HIGH"])]
+    columns = {c.name: c for c in res.models[0].columns}
+    assert columns["day"] == PSLColumn(
+        name="day", type_=DateTime(), props=[AttributeNative("Date", [])], is_array=False, is_opt=True
+    )
+    assert columns["amount"].props == [AttributeNative("Decimal", ["10", "2"])]
+    assert columns["code"].props == [AttributeDefaultFunction("uuid"), AttributeNative("Uuid", [])]
+    assert columns["level"].type_ == EnumType("Level", ["LOW", "HIGH"])
+
+    expected = """
+class Event(models.Model):
+    class Meta:
+        db_table = "Event"
+    id = models.BigAutoField(primary_key=True)
+    at = models.DateTimeField(default=timezone.now)
+    seen = models.DateTimeField(auto_now=True)
+    day = models.DateField(null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    title = models.CharField(max_length=20)
+    body = models.TextField()
+    code = models.UUIDField()
+    payload = models.JSONField(null=True)
+    blob = models.BinaryField(null=True)
+    active = models.BooleanField(default=True)
+    ratio = models.FloatField(default=1.5)
+    fee = models.DecimalField(default=decimal.Decimal("0.25"))
+    level = models.CharField(choices=[("LOW", "LOW"), ("HIGH", "HIGH")], default="LOW")
+"""
+    assert res.models[0].to_django_model() == expected
+    header = "import decimal\n\nfrom django.db import models\nfrom django.utils import timezone\n\n"
+    assert res.to_django_models() == header + expected
@@ -0,0 +1,159 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+import requests
+from conftest import FakeResponse
+
+from django_prisma.base import Cursor, Error
+from django_prisma.compiler import CreateManyStatement, SelectStatement
+from django_prisma.retry import LatencyTracker, Retrier, RetryPolicy, shape
+from django_prisma.schema import Schema
+
+ROWS = {"data": {"findManyUser": [{"id": 1}]}}
+CREATED = {"data": {"createManyUser": {"count": 1}}}
+
+
+class FlakyTransport:
+    errors = (requests.ConnectionError,)
+
+    def __init__(self, responses):
+        # FakeResponses to return, or exceptions to raise, in order
+        self.responses = responses
+        self.timeouts = []
+
+    def post(self, url, content, headers=None, timeout=None):
+        self.timeouts.append(timeout)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def select():
+    return SelectStatement("User", [("id",)], {}, None, "id")
+
+
+def cursor(transport, **policy):
+    return Cursor(transport, Schema(b"", "schema"), retrier=Retrier(RetryPolicy(**{"backoff": 0, **policy})))
+
+
+def test_reads_are_retried():
+    transport = FlakyTransport([FakeResponse({}, status_code=503), requests.ConnectionError(), FakeResponse(ROWS)])
+    assert cursor(transport).execute(select()) == [[(1,)]]
+    assert transport.responses == []
+
+
+def test_reads_give_up_after_retries():
+    transport = FlakyTransport([FakeResponse({}, status_code=502)] * 3)
+    with pytest.raises(Error, match="502"):
+        cursor(transport, retries=2).execute(select())
+    assert transport.responses == []
+
+
+def test_writes_are_never_retried():
+    transport = FlakyTransport([requests.ConnectionError("reset"), FakeResponse(CREATED)])
+    with pytest.raises(Error, match="reset"):
+        cursor(transport).execute(CreateManyStatement("User", [{"email": "a@x"}], False))
+    assert len(transport.responses) == 1
+
+
+def test_deadline_caps_attempts():
+    transport = FlakyTransport([FakeResponse(ROWS)])
+    cursor(transport, deadline=5).execute(select())
+    (timeout,) = transport.timeouts
+    assert 4 < timeout <= 5
+    with pytest.raises(Error, match="deadline"):
+        cursor(FlakyTransport([FakeResponse({}, status_code=503)] * 3), deadline=0.01, backoff=1).execute(select())
+
+
+class SlowFirstTransport:
+    # The first request stalls, any later one answers at once
+    def __init__(self):
+        self.calls = 0
+
+    def post(self, url, content, headers=None, timeout=None):
+        self.calls += 1
+        if self.calls == 1:
+            time.sleep(0.5)
+        return FakeResponse(ROWS)
+
+
+def warm(retrier, statement):
+    for _ in range(retrier.latencies.min_samples):
+        retrier.latencies.record(shape([statement]), 0.001)
+
+
+def test_slow_reads_are_hedged():
+    transport = SlowFirstTransport()
+    retrier = Retrier(RetryPolicy(hedge_percentile=0.9), LatencyTracker())
+    statement = select()
+    warm(retrier, statement)
+    start = time.monotonic()
+    assert Cursor(transport, Schema(b"", "schema"), retrier=retrier).execute(statement) == [[(1,)]]
+    assert time.monotonic() - start < 0.4
+    assert transport.calls == 2
+
+
+def test_hedges_past_the_workers_go_out_unhedged():
+    retrier = Retrier(RetryPolicy(hedge_percentile=0.9, hedge_workers=1))
+    threads = []
+
+    def attempt(timeout):
+        threads.append(threading.current_thread())
+        if len(threads) == 1:
+            # Holds the only worker while another read is hedged
+            assert retrier.hedged(attempt, None, 0.001).body == ROWS
+        return FakeResponse(ROWS)
+
+    assert retrier.hedged(attempt, None, 1).body == ROWS
+    assert threads[0] is not threading.current_thread()
+    assert threads[1] is threads[0]
+
+
+def test_hedges_answer_if_either_copy_does(monkeypatch):
+    retrier = Retrier(RetryPolicy(hedge_percentile=0.9))
+    calls = []
+    release = threading.Event()
+
+    def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            release.wait()
+            raise requests.ConnectionError()
+        release.set()
+        return FakeResponse(ROWS)
+
+    # Both copies come back in the same wait()
+    wait = concurrent.futures.wait
+    monkeypatch.setattr(concurrent.futures, "wait", lambda fs, return_when: wait(fs))
+    assert retrier.hedged(attempt, None, 0.001).body == ROWS
+    assert len(calls) == 2
+
+
+def test_hedging_needs_history():
+    retrier = Retrier(RetryPolicy(hedge_percentile=0.9), LatencyTracker(min_samples=2))
+    assert retrier.hedge_delay([select()]) is None
+    warm(retrier, select())
+    assert retrier.hedge_delay([select()]) == 0.001
+
+
+def test_async_slow_reads_are_hedged():
+    calls = []
+
+    async def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            await asyncio.sleep(0.5)
+        return FakeResponse(ROWS)
+
+    retrier = Retrier(RetryPolicy(hedge_percentile=0.9))
+    statement = select()
+    warm(retrier, statement)
+    start = time.monotonic()
+    response = asyncio.run(retrier.acall(attempt, [statement], ()))
+    assert response.body == ROWS
+    assert time.monotonic() - start < 0.4
+    assert len(calls) == 2
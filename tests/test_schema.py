@@ -0,0 +1,61 @@
+from conftest import FakeResponse
+from django.db import connection
+
+from django_prisma.base import Cursor, PrismaDatabaseWrapper
+from django_prisma.compiler import CreateManyStatement
+from django_prisma.schema import Schema, SchemaRegistry, load_schema, registry
+
+
+class FakeTransport:
+    def __init__(self, responses):
+        self.responses = responses
+        self.puts = []
+
+    def post(self, url, content, headers=None, timeout=None):
+        return self.responses.pop(0)
+
+    def put(self, url, content):
+        self.puts.append(url)
+        return FakeResponse({})
+
+
+def test_schema_loaded_once(tmp_path):
+    path = tmp_path / "schema.prisma"
+    path.write_text("model A {\n  id Int @id\n}\n")
+    schema = load_schema(str(path))
+    path.write_text("changed")
+    assert load_schema(str(path)) is schema
+
+
+def test_registry_remembers_on_disk(tmp_path):
+    SchemaRegistry().mark_registered("abc", str(tmp_path))
+    fresh = SchemaRegistry()
+    assert not fresh.is_registered("abc")
+    assert fresh.is_registered("abc", str(tmp_path))
+    fresh.forget("abc", str(tmp_path))
+    assert not SchemaRegistry().is_registered("abc", str(tmp_path))
+
+
+def test_connect_skips_registered_schema(monkeypatch):
+    transport = FakeTransport([])
+    monkeypatch.setattr(PrismaDatabaseWrapper, "transport", transport)
+    settings = dict(connection.settings_dict, OPTIONS={"ENDPOINT": "http://localhost:8000/"})
+    wrapper = PrismaDatabaseWrapper(settings, "schema-test")
+    registry.forget(wrapper.schema.id)
+    wrapper.connect()
+    wrapper.connection = None
+    wrapper.connect()
+    assert transport.puts == [f"http://localhost:8000/{wrapper.schema.id}/schema"]
+    registry.forget(wrapper.schema.id)
+
+
+def test_reupload_on_schema_missing():
+    missing = FakeResponse({"EngineNotStarted": {"reason": "SchemaMissing"}}, status_code=404)
+    ok = FakeResponse({"data": {"createManyUser": {"count": 1}}})
+    transport = FakeTransport([missing, ok])
+    cursor = Cursor(transport, Schema(b"", "missing"))
+    statement = CreateManyStatement("User", [{"email": "a@x"}], False)
+    assert cursor.execute(statement) == 1
+    assert transport.puts == ["https://accelerate.prisma-data.net/5.1.1/missing/schema"]
+    assert registry.is_registered("missing")
+    registry.forget("missing")
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from conftest import FakeResponse
+
+from django_prisma.base import AsyncCursor, Cursor
+from django_prisma.compiler import CreateManyStatement, SelectStatement
+from django_prisma.instrumentation import Instrumentation, Metrics
+from django_prisma.schema import Schema, registry
+from django_prisma.singleflight import SingleFlight
+
+ROWS = {"data": {"findManyUser": [{"id": 1}]}}
+
+
+class BlockingTransport:
+    # Holds every request until released
+    def __init__(self, body):
+        self.body = body
+        self.release = threading.Event()
+        self.posts = 0
+
+    def post(self, url, content, headers=None, timeout=None):
+        self.posts += 1
+        self.release.wait(5)
+        return FakeResponse(self.body)
+
+
+def select():
+    return SelectStatement("User", [("id",)], {}, None, "id")
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_identical_reads_share_one_request():
+    transport = BlockingTransport(ROWS)
+    singleflight = SingleFlight()
+    metrics = Metrics()
+    cursor = Cursor(
+        transport, Schema(b"", "schema"), instrumentation=Instrumentation("default", metrics), singleflight=singleflight
+    )
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cursor.execute(select()))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: singleflight.collapsed == 4)
+    transport.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert transport.posts == 1
+    assert results == [[[(1,)]]] * 5
+    assert singleflight.snapshot() == {"requests": 1, "collapsed": 4}
+    assert metrics.snapshot()[("User", "findMany")]["cache_status"]["coalesced"] == 4
+    assert singleflight.flights == {}
+
+
+def test_errors_are_shared():
+    singleflight = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        wait_for(lambda: singleflight.collapsed == 1)
+        raise ValueError("boom")
+
+    def follower():
+        started.wait()
+        try:
+            singleflight.do("key", lambda: None)
+        except ValueError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    with pytest.raises(ValueError):
+        singleflight.do("key", fail)
+    thread.join()
+    assert [str(e) for e in errors] == ["boom"]
+
+
+def test_writes_are_not_coalesced():
+    transport = BlockingTransport({"data": {"createManyUser": {"count": 1}}})
+    transport.release.set()
+    singleflight = SingleFlight()
+    cursor = Cursor(transport, Schema(b"", "schema"), singleflight=singleflight)
+    statement = CreateManyStatement("User", [{"email": "a@x"}], False)
+    cursor.execute(statement)
+    cursor.execute(statement)
+    assert transport.posts == 2
+    assert singleflight.snapshot() == {"requests": 0, "collapsed": 0}
+
+
+def test_identical_async_reads_share_one_request():
+    posts = []
+
+    class Transport:
+        async def post(self, url, content, headers=None, timeout=None):
+            posts.append(content)
+            await asyncio.sleep(0.01)
+            return FakeResponse(ROWS)
+
+    registry.mark_registered("async-schema")
+    singleflight = SingleFlight()
+    cursor = AsyncCursor(Transport(), Schema(b"", "async-schema"), singleflight=singleflight)
+
+    async def main():
+        return await asyncio.gather(*(cursor.execute(select()) for _ in range(5)))
+
+    assert asyncio.run(main()) == [[[(1,)]]] * 5
+    assert len(posts) == 1
+    assert singleflight.snapshot() == {"requests": 1, "collapsed": 4}
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+import requests
+from django.db import connection
+
+from django_prisma.transport import HttpxTransport, RequestsTransport, TransportOptions, get_transport
+
+
+def test_options_from_settings():
+    options = TransportOptions.from_settings({"POOL_SIZE": 200, "CONNECT_TIMEOUT": 2, "HTTP2": True})
+    assert options.pool_size == 200
+    assert options.keepalive == 200
+    assert options.connect_timeout == 2
+    assert options.read_timeout is None
+    assert options.http2
+
+
+def test_requests_transport_pool():
+    transport = RequestsTransport.create("token", TransportOptions(pool_size=200, connect_timeout=1, read_timeout=5))
+    adapter = transport.session.get_adapter("https://accelerate.prisma-data.net")
+    assert adapter._pool_maxsize == 200
+    assert adapter._pool_block
+    assert transport.timeout == (1, 5)
+    assert transport.session.headers["Authorization"] == "Bearer token"
+
+
+@pytest.mark.parametrize(
+    "options,deadline",
+    [
+        (TransportOptions(pool_size=1, connect_timeout=0.05), None),
+        (TransportOptions(pool_size=1, connect_timeout=None), 0.05),
+    ],
+)
+def test_requests_transport_waits_for_a_connection_up_to_the_connect_timeout(options, deadline):
+    transport = RequestsTransport.create("token", options)
+    url = "http://accelerate.prisma-data.net/"
+    request = requests.Request("POST", url).prepare()
+    pool = transport.session.get_adapter(url).get_connection_with_tls_context(request, verify=False)
+    # Holds the only connection
+    pool._get_conn()
+    start = time.monotonic()
+    with pytest.raises(requests.ConnectTimeout):
+        transport.post(url, b"", timeout=deadline)
+    assert time.monotonic() - start < 1
+    transport.close()
+
+
+def test_requests_transport_warns_about_keepalive():
+    with pytest.warns(UserWarning, match="MAX_KEEPALIVE"):
+        RequestsTransport.create("token", TransportOptions(pool_size=10, max_keepalive=5)).close()
+
+
+def test_http2_uses_httpx():
+    transport = get_transport("http2-test", "token", TransportOptions(http2=True))
+    assert isinstance(transport, HttpxTransport)
+    assert transport.client.timeout.pool == 10
+    transport.close()
+
+
+def test_wrappers_in_each_thread_share_transport():
+    transports = []
+
+    def use_connection():
+        # every thread gets its own wrapper from django.db.connections
+        transports.append(connection.transport)
+
+    threads = [threading.Thread(target=use_connection) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(t is connection.transport for t in transports)
@@ -0,0 +1,62 @@
+import datetime
+import decimal
+
+import pytest
+from django.db import NotSupportedError
+from django.db.models import F, Q
+
+from django_prisma.where import cast_to_prisma, where_to_dict
+from testapp.models import Pet, User
+
+
+def where(qs):
+    return where_to_dict(qs.query.where, qs.query)
+
+
+def test_scalar_lookups():
+    assert where(User.objects.filter(id__gte=2, id__lt=5)) == {"AND": [{"id": {"gte": 2}}, {"id": {"lt": 5}}]}
+    assert where(User.objects.filter(id__range=(1, 3))) == {"id": {"gte": 1, "lte": 3}}
+    assert where(User.objects.filter(id__in=[1, None])) == {"id": {"in": [1]}}
+    assert where(User.objects.filter(name__isnull=True)) == {"name": None}
+    assert where(User.objects.filter(email__icontains="x")) == {"email": {"contains": "x", "mode": "insensitive"}}
+    assert where(User.objects.filter(email__startswith="a")) == {"email": {"startsWith": "a"}}
+
+
+def test_datetimes_are_sent_in_utc():
+    tz = datetime.timezone(datetime.timedelta(hours=2))
+    assert cast_to_prisma(datetime.datetime(2024, 1, 1, 12, tzinfo=tz)) == "2024-01-01T10:00:00z"
+    assert cast_to_prisma(datetime.date(2024, 1, 1)) == "2024-01-01T00:00:00z"
+
+
+def test_typed_values_are_tagged():
+    assert cast_to_prisma(decimal.Decimal("1.10")) == {"$type": "Decimal", "value": "1.10"}
+    assert cast_to_prisma(b"\x00\xff") == {"$type": "Bytes", "value": "AP8="}
+    assert cast_to_prisma(datetime.time(9, 30)) == "1970-01-01T09:30:00z"
+
+
+def test_connectors_and_negation():
+    assert where(User.objects.filter(Q(id=1) | ~Q(email="a"))) == {"OR": [{"id": 1}, {"NOT": [{"email": "a"}]}]}
+    assert where(User.objects.none()) == {"OR": []}
+
+
+def test_relation_filters():
+    assert where(Pet.objects.filter(owner__email="a")) == {"owner": {"is": {"email": "a"}}}
+    # both conditions must hold for the same pet
+    assert where(User.objects.filter(pets__name="rex", pets__id=3)) == {"pets": {"some": {"id": 3, "name": "rex"}}}
+    assert where(User.objects.exclude(pets__name="rex")) == {"NOT": [{"pets": {"some": {"name": "rex"}}}]}
+    assert where(User.objects.filter(pets__isnull=True)) == {"pets": {"none": {}}}
+    # the LEFT JOIN keeps users without pets
+    assert where(User.objects.filter(pets__name__isnull=True)) == {
+        "OR": [{"pets": {"some": {"name": None}}}, {"pets": {"none": {}}}]
+    }
+    assert where(User.objects.filter(pets__name__isnull=True, pets__id=3)) == {
+        "pets": {"some": {"id": 3, "name": None}}
+    }
+    assert where(User.objects.filter(pets__name__isnull=False)) == {"pets": {"some": {"name": {"not": None}}}}
+
+
+def test_unsupported_lookups_raise():
+    with pytest.raises(NotSupportedError):
+        where(User.objects.filter(email__regex="^a"))
+    with pytest.raises(NotSupportedError):
+        where(User.objects.filter(id=F("id")))
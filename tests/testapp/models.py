@@ -0,0 +1,42 @@
+from django.db import models
+
+from django_prisma.manager import CacheableManager
+
+
+class User(models.Model):
+    class Meta:
+        db_table = "User"
+    objects = CacheableManager()
+    id = models.AutoField(primary_key=True)
+    email = models.CharField(unique=True)
+    name = models.CharField(null=True)
+
+
+class Pet(models.Model):
+    class Meta:
+        db_table = "Pet"
+    objects = CacheableManager()
+    id = models.AutoField(primary_key=True)
+    name = models.CharField()
+    owner = models.ForeignKey(to=User, on_delete=models.CASCADE, db_column="ownerId", related_name="pets")
+
+
+class Event(models.Model):
+    class Meta:
+        db_table = "Event"
+    objects = CacheableManager()
+    id = models.BigAutoField(primary_key=True)
+    at = models.DateTimeField()
+    day = models.DateField(null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payload = models.JSONField(null=True)
+    blob = models.BinaryField(null=True)
+    level = models.CharField(choices=[("LOW", "LOW"), ("HIGH", "HIGH")], default="LOW")
+
+
+class Device(models.Model):
+    class Meta:
+        db_table = "Device"
+    objects = CacheableManager()
+    id = models.AutoField(primary_key=True)
+    token = models.UUIDField()